@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Клиент агентов test_fio_7.py (режим --agent).
+Отправляет задание всем агентам одновременно с общим временем старта,
+транслирует ход выполнения и сохраняет results_sheet в структуре каталогов run_tests.sh.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import urllib.request
+import urllib.error
+
+DEFAULT_AGENT_PORT = 8765
+DEFAULT_START_DELAY = 5
+
+def parse_agents(agents):
+    """Разбирает список "host[:port],..." в список (host, port)"""
+    parsed = []
+    for agent in agents.split(','):
+        agent = agent.strip()
+        if not agent:
+            continue
+        host, _, port = agent.rpartition(':') if ':' in agent else (agent, '', '')
+        parsed.append((host, int(port) if port else DEFAULT_AGENT_PORT))
+    return parsed
+
+def agent_label(host, port):
+    """Метка агента для имен файлов: IP, а для нестандартного порта - IP_порт"""
+    return host if port == DEFAULT_AGENT_PORT else f"{host}_{port}"
+
+def agent_request(host, port, path, token=None, payload=None, timeout=None):
+    """Открывает запрос к агенту; для payload выполняется POST с JSON"""
+    data = json.dumps(payload).encode() if payload is not None else None
+    request = urllib.request.Request(f"http://{host}:{port}{path}", data=data)
+    if data is not None:
+        request.add_header("Content-Type", "application/json")
+    if token:
+        request.add_header("X-Agent-Token", token)
+    return urllib.request.urlopen(request, timeout=timeout)
+
+def request_error(error):
+    """Текст ошибки запроса к агенту"""
+    if isinstance(error, urllib.error.HTTPError):
+        try:
+            return f"HTTP {error.code}: {json.loads(error.read()).get('error')}"
+        except ValueError:
+            return f"HTTP {error.code}"
+    return str(getattr(error, 'reason', error))
+
+def show_status(agents, token=None):
+    """Выводит состояние агентов; возвращает True, если все доступны"""
+    all_ok = True
+    for host, port in agents:
+        try:
+            with agent_request(host, port, "/status", token, timeout=10) as response:
+                status = json.load(response)
+        except (urllib.error.URLError, OSError) as e:
+            print(f"❌ {host}:{port}: {request_error(e)}")
+            all_ok = False
+            continue
+        state = f"занят: {status['job']}" if status['busy'] else "свободен"
+        print(f"✅ {host}:{port} ({status['host']}): {state}, "
+              f"выполнено заданий {status['jobs_completed']}, "
+              f"тестовый файл {status['testfile_bytes'] / 1024 ** 3:.1f} GiB")
+    return all_ok
+
+def run_on_agent(host, port, job, results_dir, iteration, token, verbose, outcome):
+    """Выполняет задание на одном агенте, сохраняя лог и results_sheet; итог записывается в outcome"""
+    label = agent_label(host, port)
+    log_path = os.path.join(results_dir, f"iter{iteration}_log_{label}.log")
+    result = None
+    try:
+        with agent_request(host, port, "/run", token, payload=job) as response, open(log_path, 'w') as log:
+            for raw_line in response:
+                record = json.loads(raw_line)
+                if record['type'] == 'progress':
+                    log.write(record['line'] + "\n")
+                    if verbose:
+                        print(f"[{label}] {record['line']}")
+                elif record['type'] == 'started':
+                    skew = record['time'] - job['start_at']
+                    print(f"  → {label}: старт (отклонение от общего времени {skew * 1000:+.0f} мс)")
+                elif record['type'] == 'result':
+                    result = record
+    except (urllib.error.URLError, OSError, ValueError) as e:
+        print(f"  ❌ {label}: {request_error(e)}")
+        outcome[label] = False
+        return
+
+    if result is None:
+        print(f"  ❌ {label}: соединение прервано до получения результата (см. {log_path})")
+        outcome[label] = False
+        return
+
+    sheets_dir = os.path.join(results_dir, f"iter{iteration}_results_{label}")
+    os.makedirs(sheets_dir, exist_ok=True)
+    for name, content in result['results_sheets'].items():
+        with open(os.path.join(sheets_dir, name), 'w') as f:
+            f.write(content)
+
+    outcome[label] = result['returncode'] == 0 and bool(result['results_sheets'])
+    if outcome[label]:
+        print(f"  ✅ {label}: завершено за {result['elapsed']:.0f} сек, "
+              f"результатов: {len(result['results_sheets'])}")
+    else:
+        print(f"  ❌ {label}: код возврата {result['returncode']}, итоговый отчет не сформирован (см. {log_path})")
+
+def run_iteration(agents, job_args, results_dir, iteration, token=None, start_delay=DEFAULT_START_DELAY,
+                  verbose=False):
+    """Запускает одну итерацию на всех агентах с общим временем старта; возвращает True при успехе на всех"""
+    job = {
+        "args": [arg.replace("{iter}", str(iteration)) for arg in job_args],
+        "start_at": time.time() + start_delay
+    }
+    outcome = {}
+    threads = [
+        threading.Thread(target=run_on_agent,
+                         args=(host, port, job, results_dir, iteration, token, verbose, outcome))
+        for host, port in agents
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(outcome) == len(agents) and all(outcome.values())
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Клиент агентов test_fio_7.py",
+        epilog="Параметры test_fio_7.py передаются после '--'; {iter} в них заменяется номером итерации"
+    )
+    parser.add_argument('command', choices=['status', 'run'], help="status - состояние агентов, run - запуск задания")
+    parser.add_argument('--agents', required=True, help="Агенты через запятую: host[:port]")
+    parser.add_argument('--token', default=None, help="Токен агентов (X-Agent-Token)")
+    parser.add_argument('--results-dir', default="results", help="Каталог для логов и results_sheet")
+    parser.add_argument('--iteration', type=int, default=1, help="Номер первой итерации (по умолчанию 1)")
+    parser.add_argument('--iterations', type=int, default=1, help="Количество итераций (по умолчанию 1)")
+    parser.add_argument('--start-delay', type=float, default=DEFAULT_START_DELAY,
+                        help=f"Запас до общего времени старта, сек (по умолчанию {DEFAULT_START_DELAY})")
+    parser.add_argument('--verbose', action='store_true', help="Транслировать вывод заданий в консоль")
+
+    # Все после '--' - параметры задания, они передаются агенту без разбора
+    argv = sys.argv[1:]
+    job_args = argv[argv.index('--') + 1:] if '--' in argv else []
+    args = parser.parse_args(argv[:argv.index('--')] if '--' in argv else argv)
+
+    agents = parse_agents(args.agents)
+    if args.command == 'status':
+        sys.exit(0 if show_status(agents, args.token) else 1)
+
+    os.makedirs(args.results_dir, exist_ok=True)
+    all_ok = True
+    for iteration in range(args.iteration, args.iteration + args.iterations):
+        print(f"\n🔄 Итерация {iteration}: {len(agents)} агентов")
+        all_ok = run_iteration(agents, job_args, args.results_dir, iteration, args.token,
+                               args.start_delay, args.verbose) and all_ok
+    sys.exit(0 if all_ok else 1)
+
+if __name__ == "__main__":
+    main()
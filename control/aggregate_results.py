@@ -12,6 +12,77 @@ from pathlib import Path
 from statistics import mean, stdev
 from datetime import datetime
 
+# Точность результатов: 95% доверительный интервал среднего по итерациям (t-распределение Стьюдента).
+# Квантили t(0.975) по числу степеней свободы; для отсутствующих в таблице берется ближайшее меньшее
+# число степеней свободы (интервал получается чуть шире, т.е. оценка консервативная)
+CI_CONFIDENCE = 95
+T_QUANTILES_975 = {1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365, 8: 2.306,
+                   9: 2.262, 10: 2.228, 12: 2.179, 15: 2.131, 20: 2.086, 30: 2.042}
+PRECISION_FILE = "precision.json"
+
+def section_between(content, start_marker, end_markers):
+    """Возвращает часть отчета от start_marker до ближайшего из end_markers (или до конца)"""
+    start = content.find(start_marker)
+    if start == -1:
+        return ""
+    end = len(content)
+    for marker in end_markers:
+        pos = content.find(marker, start + len(start_marker))
+        if pos != -1:
+            end = min(end, pos)
+    return content[start:end]
+
+def ci_summary(values):
+    """Среднее и полуширина доверительного интервала в % от среднего (None при одном значении)"""
+    value_mean = mean(values)
+    ci_pct = None
+    if len(values) > 1 and value_mean:
+        df = len(values) - 1
+        t = T_QUANTILES_975[max(key for key in T_QUANTILES_975 if key <= df)]
+        ci_pct = t * stdev(values) / len(values) ** 0.5 / abs(value_mean) * 100
+    return {'iterations': len(values), 'mean': value_mean, 'ci_pct': ci_pct}
+
+def iteration_means(iterations_data, extract):
+    """Значения показателя по итерациям: среднее по ВМ за итерацию (ВМ одной итерации не независимы)"""
+    means = []
+    for iter_num in sorted(iterations_data):
+        values = [value for value in map(extract, iterations_data[iter_num]) if value is not None]
+        if values:
+            means.append(mean(values))
+    return means
+
+def is_search_row(name, vm_result):
+    """Строка основной таблицы - шаг поиска по SLO или ступень открытой нагрузки (не рабочая точка)"""
+    if re.search(r' \[SLO (?:target|\d+)\]', name):
+        return True
+    level = re.search(r' @(\S+)', name)
+    return bool(level) and level.group(1) in vm_result.get('openloop', {})
+
+def precision_by_iteration(iterations_data):
+    """Точность ключевых показателей по итерациям: IOPS и p99 этапов fio (для open-loop - пиковая
+    строка, для поиска по SLO - найденная рабочая точка), TPS pgbench"""
+    series = {}
+    vm_results = [vm_result for iter_results in iterations_data.values() for vm_result in iter_results]
+    search_rows = {name for vm_result in vm_results for name in vm_result['fio'] if is_search_row(name, vm_result)}
+    tests = sorted({name for vm_result in vm_results for name in vm_result['fio']} - search_rows)
+    for name in tests:
+        for metric, label in (('IOPS', 'IOPS'), ('P99', 'p99')):
+            series[f"{name}: {label}"] = iteration_means(
+                iterations_data, lambda vm_result: vm_result['fio'].get(name, {}).get(metric))
+    for slo_name in sorted({name for vm_result in vm_results for name in vm_result.get('slo', {})}):
+        series[f"SLO {slo_name}: Max IOPS"] = iteration_means(
+            iterations_data, lambda vm_result: vm_result.get('slo', {}).get(slo_name, {}).get('Max_IOPS'))
+    series["pgbench: TPS"] = iteration_means(
+        iterations_data, lambda vm_result: (vm_result['pgbench'] or {}).get('TPS'))
+    return {metric: ci_summary(values) for metric, values in series.items() if values}
+
+def size_bytes(size):
+    """Переводит размер в формате fio ("512M", "10G") в байты для сортировки"""
+    match = re.match(r'^([\d.]+)([KMGT]?)', size, re.IGNORECASE)
+    if not match:
+        return 0
+    return float(match.group(1)) * 1024 ** " KMGT".index(match.group(2).upper() or " ")
+
 def parse_results_sheet(file_path):
     """Парсит файл results_sheet и извлекает метрики"""
     try:
@@ -20,24 +91,194 @@ def parse_results_sheet(file_path):
         
         results = {
             'fio': {},
-            'pgbench': {}
+            'pgbench': {},
+            'sync': {},
+            'openloop': {},
+            'slo': {},
+            'scaling': {},
+            'interference': {},
+            'precondition': {},
+            'sweep': {},
+            'page_cache': {},
+            'soak': {}
         }
         
-        # Парсинг FIO результатов
-        fio_pattern = r'(\d+)\s+(.+?)\s+([\d.]+)\s+([\d.]+)\s+([\d.]+)'
-        for match in re.finditer(fio_pattern, content):
+        # Шаблон данных: результаты с разными шаблонами не смешиваются, имя теста помечается шаблоном
+        pattern_match = re.search(r'Шаблон данных:\s*(\S+)', content)
+        results['data_pattern'] = pattern_match.group(1) if pattern_match else 'random'
+        pattern_tag = f" [{results['data_pattern']}]" if results['data_pattern'] != 'random' else ""
+        
+        # Режим ввода-вывода: буферизованные результаты не смешиваются с direct, имя теста помечается режимом
+        io_mode_match = re.search(r'Режим ввода-вывода:\s*(\w+)(?:\s*\(([^)]*)\))?', content)
+        if io_mode_match and io_mode_match.group(1) != 'direct':
+            pattern_tag += f" [{' '.join(filter(None, io_mode_match.groups()))}]"
+        
+        # Пропущенные этапы частичного прогона
+        missing_block = section_between(content, 'Пропущенные этапы', ['\n\n'])
+        results['missing_phases'] = [phase.strip() for phase in re.findall(r'•\s*(.+)', missing_block)]
+        
+        # Парсинг FIO результатов (только основная таблица, без таблицы задержек)
+        main_table = section_between(content, 'Основные результаты тестов', ['Детализированная информация о задержках'])
+        fio_pattern = r'^(\d+)[ \t]+(.+?)[ \t]+([\d.]+)[ \t]+([\d.]+)[ \t]+([\d.]+)'
+        for match in re.finditer(fio_pattern, main_table, re.MULTILINE):
             test_num, test_name, iops, bandwidth, latency = match.groups()
-            results['fio'][test_name.strip()] = {
+            results['fio'][test_name.strip() + pattern_tag] = {
                 'IOPS': float(iops),
                 'Bandwidth': float(bandwidth),
                 'Latency': float(latency)
             }
         
+        # p99 задержки из таблицы задержек (N/A в остальных столбцах допускается)
+        latency_table = section_between(content, 'Детализированная информация о задержках', ['\n\n'])
+        latency_pattern = r'^\d+[ \t]+(.+?)(?:[ \t]+(?:[\d.]+|N/A)){4}[ \t]+([\d.]+)[ \t]*$'
+        for match in re.finditer(latency_pattern, latency_table, re.MULTILINE):
+            test_name = match.group(1).strip() + pattern_tag
+            if test_name in results['fio']:
+                results['fio'][test_name]['P99'] = float(match.group(2))
+        
+        # Парсинг задержки синхронной записи
+        sync_table = section_between(content, 'Задержка синхронной записи', ['\n\n', 'pgbench'])
+        sync_pattern = r'^(fdatasync|fsync|dsync)\s+(\S+)\s+([\d.]+)\s+([\d.]+)\s+([\d.]+)\s+([\d.]+)\s+([\d.]+)\s+([\d.]+)'
+        for match in re.finditer(sync_pattern, sync_table, re.MULTILINE):
+            method, bs, syncs, lat_avg, p50, p99, p99_9, lat_max = match.groups()
+            results['sync'][f"{method} {bs}"] = {
+                'Syncs': float(syncs),
+                'Latency_Avg': float(lat_avg),
+                'P50': float(p50),
+                'P99': float(p99),
+                'P99_9': float(p99_9),
+                'Max': float(lat_max)
+            }
+        
+        # Парсинг открытой нагрузки (ступени по предлагаемым IOPS)
+        openloop_table = section_between(content, 'Задержка при фиксированной нагрузке', ['\n\n', 'pgbench'])
+        openloop_pattern = r'^(\S+)\s+(\d+)\s+([\d.]+)\s+([\d.]+)\s+([\d.]+)\s+([\d.]+)\s+(yes|no)'
+        for match in re.finditer(openloop_pattern, openloop_table, re.MULTILINE):
+            level, target, achieved, p50, p99, p99_9, met = match.groups()
+            results['openloop'][level] = {
+                'Target': float(target),
+                'Achieved': float(achieved),
+                'P50': float(p50),
+                'P99': float(p99),
+                'P99_9': float(p99_9),
+                'Met': met == 'yes'
+            }
+        
+        # Парсинг результата поиска по SLO
+        slo_block = section_between(content, 'Максимальные IOPS при ограничении задержки', ['\n\n', 'pgbench'])
+        slo_name = re.search(r'• SLO:\s*(.+)', slo_block)
+        slo_iops = re.search(r'• Max IOPS:\s*([\d.]+)', slo_block)
+        if slo_name and slo_iops:
+            slo_depth = re.search(r'• Queue Depth:\s*(\d+)', slo_block)
+            slo_latency = re.search(r'• Measured p[\d.]+ \(ms\):\s*([\d.]+)', slo_block)
+            slo_precision = re.search(r'• Search Precision \(%\):\s*([\d.]+)', slo_block)
+            results['slo'][slo_name.group(1).strip()] = {
+                'Max_IOPS': float(slo_iops.group(1)),
+                'Queue_Depth': int(slo_depth.group(1)) if slo_depth else None,
+                'Latency': float(slo_latency.group(1)) if slo_latency else None,
+                'Precision': float(slo_precision.group(1)) if slo_precision else None
+            }
+        
+        # Парсинг кривой масштабирования по числу заданий
+        scaling_table = section_between(content, 'Масштабирование по числу заданий', ['\n\n', 'pgbench'])
+        # Эффективность N/A - в прогоне нет результата ступени numjobs=1
+        scaling_pattern = r'^(\d+)\s+(\d+)\s+(\d+)\s+([\d.]+|N/A)\s+([\d.]+)'
+        for match in re.finditer(scaling_pattern, scaling_table, re.MULTILINE):
+            jobs, iops, iops_per_job, efficiency, imbalance = match.groups()
+            results['scaling'][int(jobs)] = {
+                'IOPS': float(iops),
+                'IOPS_per_job': float(iops_per_job),
+                'Efficiency': float(efficiency) if efficiency != 'N/A' else None,
+                'Imbalance': float(imbalance)
+            }
+        
+        # Парсинг предкондиционирования
+        precondition_block = section_between(content, 'Предкондиционирование', ['\n\n', 'pgbench'])
+        precondition_pattern = r'• (.+?): Rounds=(\d+), Steady State=(yes|no), Steady IOPS=([\d.]+)'
+        for match in re.finditer(precondition_pattern, precondition_block):
+            label, rounds, steady, steady_iops = match.groups()
+            results['precondition'][label] = {
+                'Rounds': int(rounds),
+                'Steady': steady == 'yes',
+                'Steady_IOPS': float(steady_iops)
+            }
+        
+        # Парсинг зависимости от размера рабочего набора
+        sweep_table = section_between(content, 'Зависимость от размера рабочего набора', ['\n\n', 'pgbench'])
+        sweep_pattern = r'^(\S+)\s+(\S+)\s+([\d.]+)\s+([\d.]+|N/A)\s+\S+[ \t]*(CLIFF)?[ \t]*$'
+        for match in re.finditer(sweep_pattern, sweep_table, re.MULTILINE):
+            size, phase, iops, p99, cliff = match.groups()
+            results['sweep'].setdefault(phase, {})[size] = {
+                'IOPS': float(iops),
+                'P99': float(p99) if p99 != 'N/A' else None,
+                'Cliff': cliff is not None
+            }
+        
+        # Парсинг показателей кэша страниц (буферизованный режим)
+        cache_table = section_between(content, 'Кэш страниц (буферизованный ввод-вывод', ['\n\n', 'pgbench'])
+        cache_pattern = (r'^(.+?)\s+(cold|as-is|warm \d+%)\s+([\d.]+)\s+([\d.]+)\s+([\d.]+|N/A)'
+                         r'\s+([\d.]+)\s+([\d.]+)\s+([\d.]+)\s+([\d.]+)')
+        for match in re.finditer(cache_pattern, cache_table, re.MULTILINE):
+            (test_name, cache, read, disk_read, hit, written, disk_write,
+             dirty_peak, writeback_peak) = match.groups()
+            results['page_cache'][test_name.strip() + pattern_tag] = {
+                'Read': float(read),
+                'Disk_Read': float(disk_read),
+                'Hit': float(hit) if hit != 'N/A' else None,
+                'Written': float(written),
+                'Disk_Write': float(disk_write),
+                'Dirty_Peak': float(dirty_peak),
+                'Writeback_Peak': float(writeback_peak)
+            }
+        
+        # Парсинг длительной нагрузки (итог прогона и изменение за прогон)
+        soak_block = section_between(content, 'Длительная нагрузка (soak', ['\n\n', 'pgbench'])
+        soak_phase = re.search(r'soak, (\w+),', soak_block)
+        soak_run = re.search(r'^whole run\s+(\S+)\s+(\S+)\s+(\S+)\s+(\S+)\s+(\S+)', soak_block, re.MULTILINE)
+        if soak_phase and soak_run:
+            def soak_value(value):
+                return float(value) if value != 'N/A' else None
+            
+            def soak_drift(metric):
+                match = re.search(rf'{metric} ([+-][\d.]+)%', soak_block)
+                return float(match.group(1)) if match else None
+            
+            iops, p50, p99, p99_9, worst_window = soak_run.groups()
+            results['soak'][soak_phase.group(1) + pattern_tag] = {
+                'IOPS': soak_value(iops),
+                'P50': soak_value(p50),
+                'P99': soak_value(p99),
+                'P99_9': soak_value(p99_9),
+                'Worst_Window_P99': soak_value(worst_window),
+                'IOPS_Drift': soak_drift('IOPS'),
+                'P99_Drift': soak_drift(r'99th \(ms\)')
+            }
+        
+        # Парсинг влияния фоновой нагрузки на pgbench
+        interference_block = section_between(content, 'Влияние фоновой нагрузки на pgbench', ['Результаты pgbench'])
+        if interference_block:
+            def interference_value(key):
+                match = re.search(rf'^{re.escape(key)}:\s*([+-]?[\d.]+)', interference_block, re.MULTILINE)
+                return float(match.group(1)) if match else None
+            
+            load_match = re.search(r'^Background Load:\s*(.+)$', interference_block, re.MULTILINE)
+            results['interference'] = {
+                'Background_Load': load_match.group(1).strip() if load_match else None,
+                'Background_IOPS': interference_value('Background IOPS'),
+                'Baseline_TPS': interference_value('Baseline TPS'),
+                'Loaded_TPS': interference_value('Loaded TPS'),
+                'TPS_Change': interference_value('TPS Change (%)'),
+                'Baseline_Latency': interference_value('Baseline Latency (ms)'),
+                'Loaded_Latency': interference_value('Loaded Latency (ms)'),
+                'Latency_Change': interference_value('Latency Change (%)')
+            }
+        
         # Парсинг pgbench результатов
-        tps_match = re.search(r'TPS.*?:\s*([\d.]+)', content)
-        lat_avg_match = re.search(r'Средняя задержка:\s*([\d.]+)', content)
-        lat_std_match = re.search(r'Стандартное отклонение задержки:\s*([\d.]+)', content)
-        transactions_match = re.search(r'Обработано транзакций:\s*(\d+)', content)
+        pgbench_block = section_between(content, 'Результаты pgbench', [])
+        tps_match = re.search(r'TPS.*?:\s*([\d.]+)', pgbench_block)
+        lat_avg_match = re.search(r'Средняя задержка:\s*([\d.]+)', pgbench_block)
+        lat_std_match = re.search(r'Стандартное отклонение задержки:\s*([\d.]+)', pgbench_block)
+        transactions_match = re.search(r'Обработано транзакций:\s*(\d+)', pgbench_block)
         
         if tps_match:
             results['pgbench'] = {
@@ -46,6 +287,12 @@ def parse_results_sheet(file_path):
                 'Latency_Stddev': float(lat_std_match.group(1)) if lat_std_match else None,
                 'Transactions': int(transactions_match.group(1)) if transactions_match else None
             }
+            # Производные показатели pg_stat_* за прогон (N/A - нет данных или выключен track_*_io_timing)
+            internals_block = section_between(pgbench_block, 'Внутренние показатели PostgreSQL', ['\n\n'])
+            results['pgbench']['Internals'] = {
+                metric: float(value)
+                for metric, value in re.findall(r'^  (.+?): ([\d.]+)$', internals_block, re.MULTILINE)
+            }
         
         return results
     except Exception as e:
@@ -102,6 +349,7 @@ def aggregate_results(results_dir):
         
         parsed = parse_results_sheet(file)
         if parsed:
+            parsed['source'] = str(file.relative_to(results_dir))
             if iter_num not in iterations_data:
                 iterations_data[iter_num] = []
             iterations_data[iter_num].append(parsed)
@@ -118,6 +366,37 @@ def aggregate_results(results_dir):
         'num_vms': len(iterations_data[list(iterations_data.keys())[0]])
     }
     
+    aggregated['data_patterns'] = sorted({
+        vm_result.get('data_pattern', 'random')
+        for iter_results in iterations_data.values()
+        for vm_result in iter_results
+    })
+    
+    # Пробелы в результатах: пропущенные этапы из results_sheet и незавершенные единицы кампании
+    gaps = [
+        f"{vm_result['source']}: пропущено {', '.join(vm_result['missing_phases'])}"
+        for iter_results in iterations_data.values()
+        for vm_result in iter_results
+        if vm_result['missing_phases']
+    ]
+    state_path = results_dir / "campaign_state.json"
+    if state_path.exists():
+        with open(state_path) as f:
+            units = json.load(f).get("units", {})
+        gaps.extend(
+            f"{key}: {unit['status']}, попыток {unit['attempts']} (results_sheet нет)"
+            for key, unit in sorted(units.items())
+            if unit['status'] == 'failed'
+        )
+    aggregated['gaps'] = sorted(gaps)
+    
+    # Точность ключевых показателей; цель и итог адаптивного режима - из precision.json (precision.py)
+    aggregated['precision'] = precision_by_iteration(iterations_data)
+    precision_path = results_dir / PRECISION_FILE
+    if precision_path.exists():
+        with open(precision_path) as f:
+            aggregated['precision_target'] = json.load(f)
+    
     # Агрегация FIO
     all_fio_tests = set()
     for iter_results in iterations_data.values():
@@ -143,6 +422,206 @@ def aggregate_results(results_dir):
             'samples': len(metrics['IOPS'])
         }
     
+    # Агрегация задержки синхронной записи
+    aggregated['sync'] = {}
+    all_sync_tests = set()
+    for iter_results in iterations_data.values():
+        for vm_result in iter_results:
+            all_sync_tests.update(vm_result.get('sync', {}).keys())
+    
+    for test_name in all_sync_tests:
+        metrics = {'Syncs': [], 'Latency_Avg': [], 'P50': [], 'P99': [], 'P99_9': [], 'Max': []}
+        
+        for iter_results in iterations_data.values():
+            for vm_result in iter_results:
+                if test_name in vm_result.get('sync', {}):
+                    for metric in metrics.keys():
+                        metrics[metric].append(vm_result['sync'][test_name][metric])
+        
+        aggregated['sync'][test_name] = {
+            f'{metric}_mean': mean(values) for metric, values in metrics.items()
+        }
+        aggregated['sync'][test_name].update({
+            'Syncs_stdev': stdev(metrics['Syncs']) if len(metrics['Syncs']) > 1 else 0,
+            'P99_stdev': stdev(metrics['P99']) if len(metrics['P99']) > 1 else 0,
+            'Max_max': max(metrics['Max']),
+            'samples': len(metrics['Syncs'])
+        })
+    
+    # Агрегация открытой нагрузки
+    aggregated['openloop'] = {}
+    all_levels = set()
+    for iter_results in iterations_data.values():
+        for vm_result in iter_results:
+            all_levels.update(vm_result.get('openloop', {}).keys())
+    
+    for level in all_levels:
+        metrics = {'Target': [], 'Achieved': [], 'P50': [], 'P99': [], 'P99_9': [], 'Met': []}
+        
+        for iter_results in iterations_data.values():
+            for vm_result in iter_results:
+                if level in vm_result.get('openloop', {}):
+                    for metric in metrics.keys():
+                        metrics[metric].append(vm_result['openloop'][level][metric])
+        
+        aggregated['openloop'][level] = {
+            'Target_mean': mean(metrics['Target']),
+            'Achieved_mean': mean(metrics['Achieved']),
+            'Achieved_stdev': stdev(metrics['Achieved']) if len(metrics['Achieved']) > 1 else 0,
+            'P50_mean': mean(metrics['P50']),
+            'P99_mean': mean(metrics['P99']),
+            'P99_stdev': stdev(metrics['P99']) if len(metrics['P99']) > 1 else 0,
+            'P99_9_mean': mean(metrics['P99_9']),
+            'Met_ratio': sum(metrics['Met']) / len(metrics['Met']),
+            'samples': len(metrics['Achieved'])
+        }
+    
+    # Агрегация поиска по SLO
+    aggregated['slo'] = {}
+    all_slos = set()
+    for iter_results in iterations_data.values():
+        for vm_result in iter_results:
+            all_slos.update(vm_result.get('slo', {}).keys())
+    
+    for slo_name in all_slos:
+        points = [vm_result['slo'][slo_name]
+                  for iter_results in iterations_data.values()
+                  for vm_result in iter_results
+                  if slo_name in vm_result.get('slo', {})]
+        max_iops = [point['Max_IOPS'] for point in points]
+        depths = [point['Queue_Depth'] for point in points if point['Queue_Depth'] is not None]
+        latencies = [point['Latency'] for point in points if point['Latency'] is not None]
+        precisions = [point['Precision'] for point in points if point['Precision'] is not None]
+        
+        aggregated['slo'][slo_name] = {
+            'Max_IOPS_mean': mean(max_iops),
+            'Max_IOPS_stdev': stdev(max_iops) if len(max_iops) > 1 else 0,
+            'Max_IOPS_min': min(max_iops),
+            'Queue_Depth_median': sorted(depths)[len(depths) // 2] if depths else None,
+            'Latency_mean': mean(latencies) if latencies else None,
+            # Худшая (наибольшая) ширина интервала поиска среди всех прогонов
+            'Precision_worst': max(precisions) if precisions else None,
+            'samples': len(max_iops)
+        }
+    
+    # Агрегация кривой масштабирования
+    aggregated['scaling'] = {}
+    all_job_counts = set()
+    for iter_results in iterations_data.values():
+        for vm_result in iter_results:
+            all_job_counts.update(vm_result.get('scaling', {}).keys())
+    
+    for jobs in sorted(all_job_counts):
+        metrics = {'IOPS': [], 'IOPS_per_job': [], 'Efficiency': [], 'Imbalance': []}
+        
+        for iter_results in iterations_data.values():
+            for vm_result in iter_results:
+                if jobs in vm_result.get('scaling', {}):
+                    for metric in metrics.keys():
+                        if vm_result['scaling'][jobs][metric] is not None:
+                            metrics[metric].append(vm_result['scaling'][jobs][metric])
+        
+        aggregated['scaling'][jobs] = {
+            'IOPS_mean': mean(metrics['IOPS']),
+            'IOPS_stdev': stdev(metrics['IOPS']) if len(metrics['IOPS']) > 1 else 0,
+            'IOPS_per_job_mean': mean(metrics['IOPS_per_job']),
+            'Efficiency_mean': mean(metrics['Efficiency']) if metrics['Efficiency'] else None,
+            'Imbalance_mean': mean(metrics['Imbalance']),
+            'samples': len(metrics['IOPS'])
+        }
+    
+    # Агрегация предкондиционирования
+    aggregated['precondition'] = {}
+    for iter_results in iterations_data.values():
+        for vm_result in iter_results:
+            for label, run in vm_result.get('precondition', {}).items():
+                entry = aggregated['precondition'].setdefault(label, {'Rounds': [], 'Steady_IOPS': [], 'steady_runs': 0})
+                entry['Rounds'].append(run['Rounds'])
+                entry['Steady_IOPS'].append(run['Steady_IOPS'])
+                entry['steady_runs'] += run['Steady']
+    for label, entry in aggregated['precondition'].items():
+        aggregated['precondition'][label] = {
+            'Rounds_mean': mean(entry['Rounds']),
+            'Steady_IOPS_mean': mean(entry['Steady_IOPS']),
+            'Steady_IOPS_stdev': stdev(entry['Steady_IOPS']) if len(entry['Steady_IOPS']) > 1 else 0,
+            'steady_runs': entry['steady_runs'],
+            'samples': len(entry['Rounds'])
+        }
+    
+    # Агрегация зависимости от размера рабочего набора
+    aggregated['sweep'] = {}
+    for iter_results in iterations_data.values():
+        for vm_result in iter_results:
+            for phase, sizes in vm_result.get('sweep', {}).items():
+                for size, step in sizes.items():
+                    entry = aggregated['sweep'].setdefault(phase, {}).setdefault(
+                        size, {'IOPS': [], 'P99': [], 'cliff_runs': 0})
+                    entry['IOPS'].append(step['IOPS'])
+                    if step['P99'] is not None:
+                        entry['P99'].append(step['P99'])
+                    entry['cliff_runs'] += step['Cliff']
+    for phase, sizes in aggregated['sweep'].items():
+        for size, entry in sizes.items():
+            sizes[size] = {
+                'IOPS_mean': mean(entry['IOPS']),
+                'IOPS_stdev': stdev(entry['IOPS']) if len(entry['IOPS']) > 1 else 0,
+                'P99_mean': mean(entry['P99']) if entry['P99'] else None,
+                'cliff_runs': entry['cliff_runs'],
+                'samples': len(entry['IOPS'])
+            }
+    
+    # Агрегация показателей кэша страниц
+    aggregated['page_cache'] = {}
+    for iter_results in iterations_data.values():
+        for vm_result in iter_results:
+            for test_name, stats in vm_result.get('page_cache', {}).items():
+                entry = aggregated['page_cache'].setdefault(test_name, {})
+                for metric, value in stats.items():
+                    if value is not None:
+                        entry.setdefault(metric, []).append(value)
+    for test_name, entry in aggregated['page_cache'].items():
+        aggregated['page_cache'][test_name] = {
+            **{f"{metric}_mean": mean(values) for metric, values in entry.items()},
+            'Hit_stdev': stdev(entry['Hit']) if len(entry.get('Hit', [])) > 1 else 0,
+            'samples': len(entry['Read'])
+        }
+    
+    # Агрегация длительной нагрузки
+    aggregated['soak'] = {}
+    for iter_results in iterations_data.values():
+        for vm_result in iter_results:
+            for phase, run in vm_result.get('soak', {}).items():
+                entry = aggregated['soak'].setdefault(phase, {})
+                for metric, value in run.items():
+                    if value is not None:
+                        entry.setdefault(metric, []).append(value)
+    for phase, entry in aggregated['soak'].items():
+        aggregated['soak'][phase] = {
+            **{f"{metric}_mean": mean(values) for metric, values in entry.items()},
+            'P99_stdev': stdev(entry['P99']) if len(entry.get('P99', [])) > 1 else 0,
+            # Худший случай деградации среди ВМ и итераций
+            **({'P99_Drift_max': max(entry['P99_Drift'])} if entry.get('P99_Drift') else {}),
+            'samples': len(entry.get('IOPS', []))
+        }
+    
+    # Агрегация влияния фоновой нагрузки
+    interference_runs = [vm_result['interference']
+                         for iter_results in iterations_data.values()
+                         for vm_result in iter_results
+                         if vm_result.get('interference')]
+    aggregated['interference'] = {}
+    if interference_runs:
+        for metric in ['Background_IOPS', 'Baseline_TPS', 'Loaded_TPS', 'TPS_Change',
+                       'Baseline_Latency', 'Loaded_Latency', 'Latency_Change']:
+            values = [run[metric] for run in interference_runs if run[metric] is not None]
+            if values:
+                aggregated['interference'][f'{metric}_mean'] = mean(values)
+                aggregated['interference'][f'{metric}_stdev'] = stdev(values) if len(values) > 1 else 0
+        aggregated['interference']['Background_Load'] = sorted(
+            {run['Background_Load'] for run in interference_runs if run['Background_Load']}
+        )
+        aggregated['interference']['samples'] = len(interference_runs)
+    
     # Агрегация pgbench
     pgbench_metrics = {'TPS': [], 'Latency_Avg': [], 'Latency_Stddev': [], 'Transactions': []}
     
@@ -162,6 +641,15 @@ def aggregate_results(results_dir):
             'Latency_Avg_stdev': stdev(pgbench_metrics['Latency_Avg']) if len(pgbench_metrics['Latency_Avg']) > 1 else 0,
             'samples': len(pgbench_metrics['TPS'])
         }
+        internals = {}
+        for iter_results in iterations_data.values():
+            for vm_result in iter_results:
+                for metric, value in (vm_result['pgbench'] or {}).get('Internals', {}).items():
+                    internals.setdefault(metric, []).append(value)
+        aggregated['pgbench']['Internals'] = {
+            metric: {'mean': mean(values), 'stdev': stdev(values) if len(values) > 1 else 0, 'samples': len(values)}
+            for metric, values in internals.items()
+        }
     else:
         print("⚠️  Нет результатов pgbench для агрегации")
     
@@ -176,8 +664,20 @@ def generate_report(aggregated, output_file):
     report.append(f"Дата создания отчета: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     report.append(f"Количество итераций: {len(aggregated['iterations'])}")
     report.append(f"Количество ВМ: {aggregated['num_vms']}")
+    report.append(f"Шаблоны данных: {', '.join(aggregated.get('data_patterns', ['random']))}")
     report.append("")
     
+    # Пробелы в результатах
+    if aggregated.get('gaps'):
+        report.append("="*80)
+        report.append("⚠️  Пробелы в результатах (средние значения посчитаны без них)")
+        report.append("="*80)
+        report.append("")
+        for gap in aggregated['gaps']:
+            report.append(f"  • {gap}")
+        report.append("Продолжить кампанию: ./run_tests.sh --resume <каталог_результатов>")
+        report.append("")
+    
     # FIO результаты
     if aggregated['fio']:
         report.append("="*80)
@@ -196,6 +696,191 @@ def generate_report(aggregated, output_file):
             )
         report.append("")
     
+    # Предкондиционирование
+    if aggregated.get('precondition'):
+        report.append("="*80)
+        report.append("Предкондиционирование (случайная перезапись до установившегося режима)")
+        report.append("="*80)
+        report.append("")
+        for label, metrics in sorted(aggregated['precondition'].items()):
+            report.append(
+                f"{label}: {metrics['Steady_IOPS_mean']:.0f} ± {metrics['Steady_IOPS_stdev']:.0f} IOPS, "
+                f"раундов в среднем {metrics['Rounds_mean']:.1f}, "
+                f"установившийся режим в {metrics['steady_runs']} из {metrics['samples']} прогонов"
+            )
+        report.append("")
+    
+    # Зависимость от размера рабочего набора
+    if aggregated.get('sweep'):
+        report.append("="*80)
+        report.append("Зависимость от размера рабочего набора (средние значения)")
+        report.append("="*80)
+        report.append("")
+        report.append(f"{'Phase':<12} {'Size':<8} {'IOPS':<20} {'99th (ms)':<10} {'Change (%)':<11} {'Cliff runs':<10}")
+        report.append("-"*80)
+        for phase, sizes in sorted(aggregated['sweep'].items()):
+            previous = None
+            for size in sorted(sizes, key=size_bytes):
+                metrics = sizes[size]
+                change = (f"{(metrics['IOPS_mean'] - previous) / previous * 100:+.1f}"
+                          if previous else "N/A")
+                p99 = f"{metrics['P99_mean']:.2f}" if metrics['P99_mean'] is not None else "N/A"
+                report.append(
+                    f"{phase:<12} {size:<8} "
+                    f"{metrics['IOPS_mean']:>10.0f} ±{metrics['IOPS_stdev']:>6.0f}  "
+                    f"{p99:>10} {change:>11} "
+                    f"{metrics['cliff_runs']:>4}/{metrics['samples']}"
+                )
+                previous = metrics['IOPS_mean']
+        report.append("")
+    
+    # Кэш страниц
+    if aggregated.get('page_cache'):
+        report.append("="*80)
+        report.append("Кэш страниц при буферизованном вводе-выводе (средние значения)")
+        report.append("="*80)
+        report.append("")
+        report.append(f"{'Test Name':<40} {'Hit (%)':<16} {'Disk Read (MiB)':<16} {'Disk Write (MiB)':<17} {'Dirty Peak (MiB)':<16}")
+        report.append("-"*110)
+        for test_name, metrics in sorted(aggregated['page_cache'].items()):
+            hit = (f"{metrics['Hit_mean']:>6.1f} ±{metrics['Hit_stdev']:>5.1f}"
+                   if 'Hit_mean' in metrics else f"{'N/A':>6}")
+            report.append(
+                f"{test_name:<40} {hit:<16} {metrics['Disk_Read_mean']:>15.0f} "
+                f"{metrics['Disk_Write_mean']:>16.0f} {metrics['Dirty_Peak_mean']:>16.0f}"
+            )
+        report.append("")
+    
+    # Длительная нагрузка
+    if aggregated.get('soak'):
+        report.append("="*80)
+        report.append("Длительная нагрузка (soak, средние значения по прогонам)")
+        report.append("="*80)
+        report.append("")
+        for phase, metrics in sorted(aggregated['soak'].items()):
+            def soak_metric(key, fmt, suffix=""):
+                return f"{metrics[key]:{fmt}}{suffix}" if key in metrics else "N/A"
+            report.append(f"{phase}:")
+            report.append(f"  IOPS: {soak_metric('IOPS_mean', '.0f')}")
+            report.append(f"  Задержка 50/99/99.9: {soak_metric('P50_mean', '.3f')} / "
+                          f"{soak_metric('P99_mean', '.3f')} ± {metrics['P99_stdev']:.3f} / "
+                          f"{soak_metric('P99_9_mean', '.3f')} ms")
+            report.append(f"  Худшее окно p99: {soak_metric('Worst_Window_P99_mean', '.3f', ' ms')}")
+            report.append(f"  Изменение за прогон: IOPS {soak_metric('IOPS_Drift_mean', '+.1f', '%')}, "
+                          f"p99 {soak_metric('P99_Drift_mean', '+.1f', '%')} "
+                          f"(худший прогон {soak_metric('P99_Drift_max', '+.1f', '%')})")
+            report.append(f"  Количество измерений: {metrics['samples']}")
+        report.append("")
+    
+    # Масштабирование по числу заданий
+    if aggregated.get('scaling'):
+        report.append("="*80)
+        report.append("Масштабирование по числу заданий (средние значения)")
+        report.append("="*80)
+        report.append("")
+        report.append(f"{'Jobs':<6} {'IOPS':<20} {'IOPS/job':<12} {'Efficiency (%)':<16} {'Imbalance (%)':<14}")
+        report.append("-"*72)
+        for jobs, metrics in sorted(aggregated['scaling'].items()):
+            efficiency = f"{metrics['Efficiency_mean']:.1f}" if metrics['Efficiency_mean'] is not None else "N/A"
+            report.append(
+                f"{jobs:<6} "
+                f"{metrics['IOPS_mean']:>10.0f} ±{metrics['IOPS_stdev']:>6.0f}  "
+                f"{metrics['IOPS_per_job_mean']:>10.0f}  "
+                f"{efficiency:>14}  "
+                f"{metrics['Imbalance_mean']:>12.1f}"
+            )
+        report.append("")
+    
+    # Максимальные IOPS при ограничении задержки
+    if aggregated.get('slo'):
+        report.append("="*80)
+        report.append("Максимальные IOPS при ограничении задержки (SLO)")
+        report.append("="*80)
+        report.append("")
+        for slo_name, metrics in sorted(aggregated['slo'].items()):
+            report.append(f"{slo_name}:")
+            report.append(f"  Максимальные IOPS: {metrics['Max_IOPS_mean']:.0f} ± {metrics['Max_IOPS_stdev']:.0f} "
+                          f"(минимум {metrics['Max_IOPS_min']:.0f})")
+            if metrics['Queue_Depth_median'] is not None:
+                report.append(f"  Глубина очереди (медиана): {metrics['Queue_Depth_median']}")
+            if metrics['Latency_mean'] is not None:
+                report.append(f"  Измеренная задержка в рабочей точке: {metrics['Latency_mean']:.3f} ms")
+            if metrics['Precision_worst'] is not None:
+                report.append(f"  Точность поиска (худшая): ±{metrics['Precision_worst']:.1f}%")
+            report.append(f"  Количество измерений: {metrics['samples']}")
+        report.append("")
+    
+    # Открытая нагрузка
+    if aggregated.get('openloop'):
+        report.append("="*80)
+        report.append("Задержка при фиксированной нагрузке (open-loop, средние значения)")
+        report.append("="*80)
+        report.append("")
+        report.append(f"{'Level':<10} {'Target IOPS':<12} {'Achieved IOPS':<20} {'50th (ms)':<10} {'99th (ms)':<18} {'99.9th (ms)':<12} {'Met':<6}")
+        report.append("-"*92)
+        
+        for level, metrics in sorted(aggregated['openloop'].items(), key=lambda item: item[1]['Target_mean']):
+            report.append(
+                f"{level:<10} "
+                f"{metrics['Target_mean']:>11.0f} "
+                f"{metrics['Achieved_mean']:>10.0f} ±{metrics['Achieved_stdev']:>6.0f}  "
+                f"{metrics['P50_mean']:>8.3f}  "
+                f"{metrics['P99_mean']:>8.3f} ±{metrics['P99_stdev']:>6.3f}  "
+                f"{metrics['P99_9_mean']:>10.3f}  "
+                f"{metrics['Met_ratio'] * 100:>4.0f}%"
+            )
+        report.append("")
+    
+    # Задержка синхронной записи
+    if aggregated.get('sync'):
+        report.append("="*80)
+        report.append("Задержка синхронной записи (QD=1, средние значения)")
+        report.append("="*80)
+        report.append("")
+        report.append(f"{'Test':<16} {'Syncs/s':<18} {'Avg (ms)':<10} {'50th (ms)':<10} {'99th (ms)':<18} {'99.9th (ms)':<12} {'Max (ms)':<10}")
+        report.append("-"*100)
+        
+        def sync_sort_key(name):
+            method, bs = name.split(' ', 1)
+            size = re.match(r'([\d.]+)', bs)
+            return (method, float(size.group(1)) if size else 0)
+        
+        for test_name in sorted(aggregated['sync'], key=sync_sort_key):
+            metrics = aggregated['sync'][test_name]
+            report.append(
+                f"{test_name:<16} "
+                f"{metrics['Syncs_mean']:>8.0f} ±{metrics['Syncs_stdev']:>6.0f}  "
+                f"{metrics['Latency_Avg_mean']:>8.3f}  "
+                f"{metrics['P50_mean']:>8.3f}  "
+                f"{metrics['P99_mean']:>8.3f} ±{metrics['P99_stdev']:>6.3f}  "
+                f"{metrics['P99_9_mean']:>10.3f}  "
+                f"{metrics['Max_max']:>8.3f}"
+            )
+        report.append("")
+    
+    # Влияние фоновой нагрузки на pgbench
+    if aggregated.get('interference'):
+        inter = aggregated['interference']
+        report.append("="*80)
+        report.append("Влияние фоновой нагрузки на pgbench (средние значения)")
+        report.append("="*80)
+        report.append("")
+        report.append(f"Фоновая нагрузка: {'; '.join(inter['Background_Load']) or 'N/A'}")
+        
+        def inter_line(title, metric, fmt, suffix=""):
+            if f'{metric}_mean' in inter:
+                report.append(f"{title}: {inter[f'{metric}_mean']:{fmt}} ± {inter[f'{metric}_stdev']:{fmt.lstrip('+')}}{suffix}")
+        
+        inter_line("Фоновые IOPS", 'Background_IOPS', '.0f')
+        inter_line("TPS изолированно", 'Baseline_TPS', '.2f')
+        inter_line("TPS под нагрузкой", 'Loaded_TPS', '.2f')
+        inter_line("Изменение TPS", 'TPS_Change', '+.1f', '%')
+        inter_line("Задержка изолированно", 'Baseline_Latency', '.3f', ' ms')
+        inter_line("Задержка под нагрузкой", 'Loaded_Latency', '.3f', ' ms')
+        inter_line("Изменение задержки", 'Latency_Change', '+.1f', '%')
+        report.append(f"Количество измерений: {inter['samples']}")
+        report.append("")
+    
     # pgbench результаты
     if aggregated['pgbench']:
         report.append("="*80)
@@ -206,6 +891,11 @@ def generate_report(aggregated, output_file):
         report.append(f"TPS (Transactions Per Second): {pg['TPS_mean']:.2f} ± {pg['TPS_stdev']:.2f}")
         report.append(f"Средняя задержка: {pg['Latency_Avg_mean']:.3f} ± {pg['Latency_Avg_stdev']:.3f} ms")
         report.append(f"Количество измерений: {pg['samples']}")
+        if pg.get('Internals'):
+            report.append("")
+            report.append("Внутренние показатели PostgreSQL за прогон (pg_stat_*):")
+            for metric, stats in pg['Internals'].items():
+                report.append(f"  {metric:<32} {stats['mean']:>12.3f} ± {stats['stdev']:.3f}  (n={stats['samples']})")
         report.append("")
     else:
         report.append("="*80)
@@ -215,6 +905,28 @@ def generate_report(aggregated, output_file):
         report.append("⚠️  Результаты pgbench отсутствуют (тест не запускался или не был включен)")
         report.append("")
     
+    # Точность ключевых показателей
+    if aggregated.get('precision'):
+        target = aggregated.get('precision_target')
+        report.append("="*80)
+        report.append(f"Точность результатов: {CI_CONFIDENCE}% доверительный интервал среднего по итерациям")
+        report.append("="*80)
+        report.append("")
+        if target:
+            outcome = "достигнута" if target['reached'] else "не достигнута"
+            report.append(f"Адаптивный режим: цель ±{target['target_pct']:g}%, точность {outcome} "
+                          f"за {target['iterations']} итераций")
+            report.append("")
+        report.append(f"{'Metric':<44} {'Iterations':>10} {'Mean':>12} {'CI (±%)':>9}")
+        report.append("-"*80)
+        for metric, stats in sorted(aggregated['precision'].items()):
+            ci = f"{stats['ci_pct']:.1f}" if stats['ci_pct'] is not None else "N/A"
+            mark = ""
+            if target:
+                mark = " ✓" if stats['ci_pct'] is not None and stats['ci_pct'] <= target['target_pct'] else " ✗"
+            report.append(f"{metric:<44} {stats['iterations']:>10} {stats['mean']:>12.2f} {ci:>9}{mark}")
+        report.append("")
+    
     report.append("="*80)
     report.append("Примечание: Значения указаны в формате 'среднее ± стандартное отклонение'")
     report.append("="*80)
@@ -0,0 +1,452 @@
+#!/usr/bin/env python3
+"""
+Планировщик кампании тестирования по файлу описания (TOML).
+Разворачивает этапы и переборы параметров в упорядоченный план запусков test_fio_7.py,
+оценивает общее время кампании и сохраняет разрешенный план (campaign_plan.json) вместе
+с копией описания в каталоге результатов. План выполняет run_tests.sh --spec.
+
+Пример описания:
+
+    name = "raid10"
+    targets = ["10.0.0.11", "10.0.0.12"]
+    iterations = 3
+
+    [defaults]              # параметры test_fio_7.py для всех этапов (имена без "--", "_" вместо "-")
+    size = "10G"
+    runtime = 60
+
+    [pgbench]
+    scale = 100
+    duration = 600
+
+    [[phases]]
+    name = "baseline"
+    pgbench = true          # после fio запускается pgbench
+
+    [[phases]]
+    name = "qd"
+    mode = "suite"
+    [phases.sweep]          # перебор: по этапу плана на каждое сочетание значений
+    io_depth = [1, 8, 32, 64]
+
+Вместо iterations можно задать адаптивное число итераций: итерации этапа повторяются,
+пока 95% доверительный интервал IOPS, p99 и TPS шире цели (см. precision.py):
+
+    [adaptive]
+    target_pct = 5          # полуширина интервала, % от среднего
+    min_iterations = 2
+    max_iterations = 10
+"""
+
+import os
+import re
+import sys
+import json
+import shlex
+import hashlib
+import argparse
+import itertools
+import contextlib
+import io
+from datetime import datetime
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts")
+sys.path.insert(0, SCRIPTS_DIR)
+
+import test_fio_7
+
+PLAN_FILE = "campaign_plan.json"
+SPEC_COPY = "campaign_spec.toml"
+
+# Параметры оценки времени (переопределяются в таблице [estimate] описания)
+DEFAULT_LAYOUT_MIB_S = 500
+DEFAULT_PGBENCH_INIT_SEC_PER_SCALE = 0.5
+DEFAULT_VCPUS = 8
+STEP_OVERHEAD_SEC = 30
+ITERATION_PAUSE_SEC = 30
+
+# Ключи этапа, которые не являются параметрами test_fio_7.py
+PHASE_KEYS = {"name", "kind", "pgbench", "sweep"}
+PHASE_KINDS = ["fio", "pgbench"]
+PGBENCH_KEYS = {"scale", "clients", "jobs", "duration"}
+STANDARD_SUITE_PHASES = 5
+ADAPTIVE_KEYS = {"target_pct", "min_iterations", "max_iterations"}
+DEFAULT_MIN_ITERATIONS = 2
+
+def load_spec(path):
+    """Читает описание кампании и проверяет обязательные поля"""
+    if tomllib is None:
+        raise ValueError("для чтения TOML нужен Python 3.11+ или пакет tomli (pip install tomli)")
+    with open(path, 'rb') as f:
+        spec = tomllib.load(f)
+
+    for key in ("name", "targets", "phases"):
+        if key not in spec:
+            raise ValueError(f"в описании нет обязательного поля {key}")
+    if not re.match(r'^[\w.-]+$', spec["name"]):
+        raise ValueError(f"name может содержать только буквы, цифры, '_', '.', '-': {spec['name']}")
+    for target in spec["targets"]:
+        if not re.match(r'^\d+\.\d+\.\d+\.\d+$', target):
+            raise ValueError(f"некорректный IP в targets: {target}")
+    if not isinstance(spec.get("iterations", 1), int) or spec.get("iterations", 1) < 1:
+        raise ValueError("iterations должно быть целым числом ≥ 1")
+    adaptive = spec.get("adaptive")
+    if adaptive is not None:
+        unknown = set(adaptive) - ADAPTIVE_KEYS
+        if unknown:
+            raise ValueError(f"неизвестные параметры [adaptive]: {', '.join(sorted(unknown))}")
+        if not isinstance(adaptive.get("target_pct"), (int, float)) or adaptive["target_pct"] <= 0:
+            raise ValueError("[adaptive] target_pct должно быть числом > 0")
+        if not isinstance(adaptive.get("max_iterations"), int) or \
+                not 2 <= adaptive.get("min_iterations", DEFAULT_MIN_ITERATIONS) <= adaptive["max_iterations"]:
+            raise ValueError("[adaptive] нужно 2 ≤ min_iterations ≤ max_iterations (целые числа)")
+    unknown = set(spec.get("pgbench", {})) - PGBENCH_KEYS
+    if unknown:
+        raise ValueError(f"неизвестные параметры [pgbench]: {', '.join(sorted(unknown))}")
+    names = [phase.get("name") for phase in spec["phases"]]
+    if None in names or len(set(names)) != len(names):
+        raise ValueError("у каждого этапа должно быть уникальное поле name")
+    for phase in spec["phases"]:
+        if phase.get("kind", "fio") not in PHASE_KINDS:
+            raise ValueError(f"этап {phase['name']}: kind должен быть одним из {', '.join(PHASE_KINDS)}")
+    return spec
+
+def option_args(options):
+    """Параметры test_fio_7.py из словаря: io_depth = 64 → --io-depth 64, sync_latency = true → --sync-latency,
+    target = {data = "/mnt/pgdata", wal = "/dev/sdc"} → --target data=/mnt/pgdata --target wal=/dev/sdc"""
+    args = []
+    for key, value in options.items():
+        flag = "--" + key.replace("_", "-")
+        if value is True:
+            args.append(flag)
+        elif value is False or value is None:
+            continue
+        elif isinstance(value, dict):
+            for name, item in value.items():
+                args += [flag, f"{name}={item}"]
+        else:
+            args += [flag, ",".join(map(str, value)) if isinstance(value, list) else str(value)]
+    return args
+
+def parse_step_args(args, step_name):
+    """Разбирает параметры этапа парсером test_fio_7.py (те же типы, варианты и значения по умолчанию)"""
+    errors = io.StringIO()
+    try:
+        with contextlib.redirect_stderr(errors):
+            return test_fio_7.build_arg_parser().parse_args(args)
+    except SystemExit:
+        message = errors.getvalue().strip().splitlines()
+        raise ValueError(f"этап {step_name}: {message[-1] if message else 'неверные параметры'}")
+
+def slug(value):
+    return re.sub(r'[^\w.-]+', '-', str(value)).strip('-')
+
+def expand_phases(spec):
+    """Этапы описания с перебором параметров → список этапов плана в порядке описания"""
+    steps = []
+    for phase in spec["phases"]:
+        base = {**spec.get("defaults", {}), **{k: v for k, v in phase.items() if k not in PHASE_KEYS}}
+        sweep = phase.get("sweep", {})
+        keys = list(sweep)
+        for values in itertools.product(*(sweep[key] if isinstance(sweep[key], list) else [sweep[key]]
+                                          for key in keys)):
+            combo = dict(zip(keys, values))
+            name = "_".join([phase["name"]] + [f"{key.replace('_', '-')}-{slug(value)}"
+                                               for key, value in combo.items()])
+            steps.append({
+                "name": name,
+                "phase": phase["name"],
+                "kind": phase.get("kind", "fio"),
+                "pgbench": phase.get("kind", "fio") == "pgbench" or bool(phase.get("pgbench")),
+                "options": {**base, **combo}
+            })
+    return steps
+
+def resolve_step(spec, step):
+    """Параметры запуска этапа: аргументы test_fio_7.py, ключ раскладки тестового файла, настройки pgbench"""
+    pgbench = {key: spec.get("pgbench", {}).get(key, getattr(test_fio_7, f"DEFAULT_PGBENCH_{key.upper()}"))
+               for key in sorted(PGBENCH_KEYS)}
+    options = dict(step["options"])
+    if step["kind"] == "fio":
+        if step["pgbench"] and options.get("mode", "suite") != "interference":
+            options["run_pgbench"] = True
+        if step["pgbench"] or options.get("mode") == "interference":
+            options.update({f"pgbench_{key}": value for key, value in pgbench.items()})
+    args = option_args(options)
+    parsed = parse_step_args(["--test-name", "plan"] + args, step["name"])
+    interference = parsed.mode == "interference"
+    if interference:
+        step["pgbench"] = True
+    # Тестовый файл раскладывается заново при смене размера, шаблона данных или целей
+    layout = None if step["kind"] == "pgbench" or interference or parsed.mode == "capture" else \
+        " ".join([parsed.size, parsed.data_pattern, *(parsed.target or [])])
+    return parsed, args, layout, pgbench
+
+def fio_phase_seconds(parsed, spec_estimate):
+    """Время fio-части этапа: число прогонов fio × время прогона, плюс предкондиционирование и прогрев кэша"""
+    layout_mib_s = spec_estimate.get("layout_mib_s", DEFAULT_LAYOUT_MIB_S)
+    size_mib = test_fio_7.parse_size(parsed.size) / 1024 ** 2
+    # Без --runtime fio проходит весь файл: время оценивается по скорости раскладки
+    run_seconds = parsed.runtime or size_mib / layout_mib_s
+
+    def count(values):
+        return len([value for value in str(values).split(',') if value.strip()])
+
+    if parsed.mode == 'soak':
+        return parsed.soak_hours * 3600
+    if parsed.mode == 'capture':
+        return parsed.capture_seconds
+    if parsed.mode == 'replay':
+        # Длительность трассы известна только на ВМ: оценивается по времени записи по умолчанию
+        seconds = parsed.runtime or test_fio_7.DEFAULT_CAPTURE_SECONDS
+        return seconds if parsed.replay_speed == 'max' else seconds / float(parsed.replay_speed)
+    if parsed.mode == 'interference':
+        return 0
+    if parsed.mode == 'suite':
+        runs = 1 if parsed.profile == 'postgres' else STANDARD_SUITE_PHASES
+        if parsed.profile == 'postgres':
+            run_seconds = parsed.runtime or test_fio_7.DEFAULT_PG_RUNTIME
+    elif parsed.mode == 'engines':
+        runs = count(parsed.compare_engines)
+    elif parsed.mode == 'openloop':
+        runs = count(parsed.openloop_rates) if parsed.openloop_rates else count(parsed.openloop_levels) + 1
+        run_seconds = parsed.runtime or test_fio_7.DEFAULT_OPENLOOP_RUNTIME
+    elif parsed.mode == 'slo':
+        runs = parsed.slo_steps + 1
+        run_seconds = parsed.runtime or test_fio_7.DEFAULT_SLO_RUNTIME
+    elif parsed.mode == 'scaling':
+        runs = count(parsed.scaling_jobs) if parsed.scaling_jobs else spec_estimate.get("vcpus", DEFAULT_VCPUS)
+    else:  # sweep
+        runs = count(parsed.sweep_sizes) * count(parsed.sweep_phases)
+
+    seconds = runs * run_seconds
+    # Предкондиционирование оценивается сверху: до max_rounds раундов (остановка раньше при стабилизации)
+    precondition = parsed.precondition_round * parsed.precondition_max_rounds
+    if parsed.precondition == 'once':
+        seconds += precondition * (count(parsed.sweep_sizes) if parsed.mode == 'sweep' else 1)
+    elif parsed.precondition == 'each':
+        seconds += precondition * runs
+    if parsed.io_mode == 'buffered' and parsed.cache_state == 'warm':
+        seconds += runs * size_mib * parsed.prewarm_pct / 100 / layout_mib_s
+    if parsed.sync_latency:
+        seconds += count(parsed.sync_sizes) * test_fio_7.DEFAULT_SYNC_RUNTIME
+    return seconds
+
+def step_estimate(step, parsed, spec_estimate):
+    """Оценка времени этапа плана, сек"""
+    seconds = STEP_OVERHEAD_SEC
+    pgbench = step["pgbench_settings"]
+    if step["kind"] == "fio":
+        seconds += fio_phase_seconds(parsed, spec_estimate)
+        if step["layout"] and not step["reuse_layout"]:
+            sizes = parsed.sweep_sizes.split(',') if parsed.mode == 'sweep' else [parsed.size]
+            largest = max(test_fio_7.parse_size(size.strip()) for size in sizes if size.strip())
+            seconds += largest / 1024 ** 2 / spec_estimate.get("layout_mib_s", DEFAULT_LAYOUT_MIB_S)
+    if step["pgbench"]:
+        if not step["reuse_pgbench"]:
+            seconds += pgbench["scale"] * spec_estimate.get("pgbench_init_sec_per_scale",
+                                                            DEFAULT_PGBENCH_INIT_SEC_PER_SCALE)
+        runs = 2 if parsed is not None and parsed.mode == 'interference' else 1
+        seconds += runs * pgbench["duration"]
+        if runs == 2:
+            seconds += test_fio_7.DEFAULT_BG_WARMUP
+    return round(seconds)
+
+def build_plan(spec, spec_path):
+    """Упорядоченный план кампании с оценкой времени"""
+    steps = expand_phases(spec)
+    resolved = []
+    for step in steps:
+        parsed, args, layout, pgbench = resolve_step(spec, step)
+        resolved.append((step, parsed, args, layout, pgbench))
+    # Агенты принимают только разрешенные параметры заданий (см. test_fio_7.agent_job_options)
+    if spec.get("agent"):
+        allowed = test_fio_7.agent_job_options()
+        for step, _, args, _, _ in resolved:
+            problem = test_fio_7.agent_job_problem(args, allowed) if step["kind"] == "fio" else None
+            if problem:
+                raise ValueError(f"этап {step['name']}: {problem} (agent = true)")
+
+    # Порядок: этапы с одинаковой раскладкой тестового файла подряд (в порядке первого появления),
+    # внутри группы - сначала без pgbench, затем с pgbench по масштабу базы, чтобы база
+    # инициализировалась один раз на масштаб; при равенстве сохраняется порядок описания
+    layout_order = {}
+    for _, _, _, layout, _ in resolved:
+        layout_order.setdefault(layout, len(layout_order))
+    order = sorted(range(len(resolved)), key=lambda i: (
+        layout_order[resolved[i][3]], resolved[i][0]["pgbench"],
+        resolved[i][4]["scale"] if resolved[i][0]["pgbench"] else 0, i))
+
+    plan_steps = []
+    previous_layout = None
+    initialized_scales = set()
+    spec_estimate = spec.get("estimate", {})
+    for number, i in enumerate(order, start=1):
+        step, parsed, args, layout, pgbench = resolved[i]
+        reuse_pgbench = step["pgbench"] and pgbench["scale"] in initialized_scales
+        if step["pgbench"]:
+            initialized_scales.add(pgbench["scale"])
+        if reuse_pgbench and step["kind"] == "fio":
+            args = args + ["--reuse-pgbench"]
+        test_name = f"{spec['name']}_{step['name']}_iter{{iter}}"
+        plan_step = {
+            "index": number,
+            "name": step["name"],
+            "phase": step["phase"],
+            "kind": step["kind"],
+            "dir": f"{number:02d}_{step['name']}",
+            "args": ["--test-name", test_name] + args if step["kind"] == "fio" else [],
+            "pgbench": step["pgbench"],
+            "pgbench_settings": pgbench,
+            "layout": layout,
+            "reuse_layout": layout is not None and layout == previous_layout,
+            "reuse_pgbench": reuse_pgbench
+        }
+        plan_step["estimate_sec"] = step_estimate(plan_step, parsed if step["kind"] == "fio" else None,
+                                                  spec_estimate)
+        plan_steps.append(plan_step)
+        previous_layout = layout if layout is not None else previous_layout
+
+    # В адаптивном режиме оценка - верхняя граница (все этапы до max_iterations)
+    adaptive = spec.get("adaptive")
+    if adaptive is not None:
+        adaptive = {"target_pct": adaptive["target_pct"],
+                    "min_iterations": adaptive.get("min_iterations", DEFAULT_MIN_ITERATIONS),
+                    "max_iterations": adaptive["max_iterations"]}
+    iterations = adaptive["max_iterations"] if adaptive else spec.get("iterations", 1)
+    per_iteration = sum(step["estimate_sec"] for step in plan_steps)
+    with open(spec_path, 'rb') as f:
+        spec_sha256 = hashlib.sha256(f.read()).hexdigest()
+    with open(test_fio_7.__file__, 'rb') as f:
+        script_sha256 = hashlib.sha256(f.read()).hexdigest()
+    return {
+        "name": spec["name"],
+        "created": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        "spec_sha256": spec_sha256,
+        "script_sha256": script_sha256,
+        "targets": spec["targets"],
+        "iterations": iterations,
+        "adaptive": adaptive,
+        "agent": bool(spec.get("agent", False)),
+        "fetch_raw": bool(spec.get("fetch_raw", False)),
+        "spec": spec,
+        "steps": plan_steps,
+        "estimate_sec": {
+            "per_iteration": per_iteration,
+            "total": per_iteration * iterations + ITERATION_PAUSE_SEC * (iterations - 1)
+        }
+    }
+
+def format_duration(seconds):
+    hours, rest = divmod(int(seconds), 3600)
+    return f"{hours}:{rest // 60:02d}"
+
+def print_plan(plan):
+    """Выводит план кампании и оценку времени"""
+    adaptive = plan.get("adaptive")
+    iterations = (f"итераций от {adaptive['min_iterations']} до {plan['iterations']} "
+                  f"(адаптивно, цель ±{adaptive['target_pct']:g}%)" if adaptive else f"итераций {plan['iterations']}")
+    print(f"План кампании {plan['name']}: {len(plan['targets'])} ВМ ({', '.join(plan['targets'])}), {iterations}")
+    row_format = "{:<4} {:<40} {:<8} {:<22} {:<10} {:>8}"
+    columns = row_format.format("No.", "Step", "Kind", "Layout", "Reuse", "Time")
+    print("=" * len(columns))
+    print(columns)
+    print("_" * len(columns))
+    for step in plan["steps"]:
+        reuse = ",".join(filter(None, ["file" if step["reuse_layout"] else "",
+                                       "db" if step["reuse_pgbench"] else ""])) or "-"
+        kind = step["kind"] + ("+pg" if step["kind"] == "fio" and step["pgbench"] else "")
+        print(row_format.format(step["index"], step["name"], kind, step["layout"] or "-", reuse,
+                                format_duration(step["estimate_sec"])))
+    estimate = plan["estimate_sec"]
+    print(f"\n⏱️  Оценка: {format_duration(estimate['per_iteration'])} на итерацию, "
+          f"всего {'не более ' if adaptive else ''}{format_duration(estimate['total'])} (ч:мм)")
+    print("   Предкондиционирование оценивается сверху (все раунды), раскладка файла и инициализация базы - "
+          "по параметрам [estimate]")
+
+def shell_assignments(values):
+    """Присваивания bash для eval в run_tests.sh"""
+    lines = []
+    for key, value in values.items():
+        if isinstance(value, list):
+            lines.append(f"{key}=({' '.join(shlex.quote(str(item)) for item in value)})")
+        else:
+            lines.append(f"{key}={shlex.quote(str(value).lower() if isinstance(value, bool) else str(value))}")
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Планировщик кампании тестирования по файлу описания (TOML)")
+    parser.add_argument('command', choices=['plan', 'env', 'step'],
+                        help="plan - развернуть описание, оценить время и (с --out) сохранить план; "
+                             "env - параметры кампании для run_tests.sh; step - параметры этапа для run_tests.sh")
+    parser.add_argument('--spec', help="plan: файл описания кампании (TOML)")
+    parser.add_argument('--out', help="plan: каталог результатов для campaign_plan.json и копии описания")
+    parser.add_argument('--plan', help=f"env, step: путь к {PLAN_FILE}")
+    parser.add_argument('--step', type=int, help="step: номер этапа плана")
+    args = parser.parse_args()
+
+    if args.command == 'plan':
+        if not args.spec:
+            parser.error("для plan нужен --spec")
+        try:
+            spec = load_spec(args.spec)
+            plan = build_plan(spec, args.spec)
+        except (OSError, ValueError) as e:
+            print(f"❌ {args.spec}: {e}")
+            sys.exit(1)
+        print_plan(plan)
+        if args.out:
+            os.makedirs(args.out, exist_ok=True)
+            with open(os.path.join(args.out, PLAN_FILE), 'w') as f:
+                json.dump(plan, f, indent=2, ensure_ascii=False)
+            with open(args.spec, 'rb') as src, open(os.path.join(args.out, SPEC_COPY), 'wb') as dst:
+                dst.write(src.read())
+            print(f"📝 План сохранен: {os.path.join(args.out, PLAN_FILE)}")
+        return
+
+    if not args.plan:
+        parser.error("для env и step нужен --plan")
+    with open(args.plan, 'r') as f:
+        plan = json.load(f)
+
+    if args.command == 'env':
+        print(shell_assignments({
+            "VMS": plan["targets"],
+            "ITERATIONS": plan["iterations"],
+            "TEST_NAME": plan["name"],
+            "USE_AGENT": plan["agent"],
+            "FETCH_RAW": "y" if plan["fetch_raw"] else "N",
+            "PLAN_STEPS": len(plan["steps"]),
+            "ADAPTIVE_PCT": (plan.get("adaptive") or {}).get("target_pct", ""),
+            "MIN_ITERATIONS": (plan.get("adaptive") or {}).get("min_iterations", "")
+        }))
+        return
+
+    step = next((step for step in plan["steps"] if step["index"] == args.step), None)
+    if step is None:
+        parser.error(f"в плане нет этапа {args.step}")
+    pgbench = step["pgbench_settings"]
+    print(shell_assignments({
+        "STEP_NAME": step["name"],
+        "STEP_DIR": step["dir"],
+        "STEP_ARGS": shlex.join(step["args"]),
+        "RUN_FIO": step["kind"] == "fio",
+        "RUN_PG": step["pgbench"],
+        "KEEP_TESTFILE": step["reuse_layout"],
+        "PGBENCH_REUSE": step["reuse_pgbench"],
+        "PGBENCH_SCALE": pgbench["scale"],
+        "PGBENCH_CLIENTS": pgbench["clients"],
+        "PGBENCH_JOBS": pgbench["jobs"],
+        "PGBENCH_DURATION": pgbench["duration"]
+    }))
+
+if __name__ == "__main__":
+    main()
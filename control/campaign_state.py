@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Файл состояния кампании тестирования (campaign_state.json в каталоге результатов).
+Хранит статус каждой единицы (итерация, ВМ) и пропущенные в ней этапы, чтобы
+повторный запуск run_tests.sh --resume выполнял только незавершенные единицы.
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+from pathlib import Path
+from datetime import datetime
+
+STATE_FILE = "campaign_state.json"
+
+def load_state(path):
+    """Загружает состояние кампании (пустое, если файла еще нет)"""
+    if not os.path.exists(path):
+        return {"units": {}}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def save_state(path, state):
+    """Сохраняет состояние атомарно (через временный файл)"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def unit_key(iteration, vm):
+    return f"iter{iteration}/{vm}"
+
+def sheet_missing_phases(sheet_path):
+    """Пропущенные этапы, отмеченные в results_sheet"""
+    with open(sheet_path, 'r') as f:
+        content = f.read()
+    start = content.find("Пропущенные этапы")
+    if start == -1:
+        return []
+    block = content[start:].split("\n\n", 1)[0]
+    return [phase.strip() for phase in re.findall(r'•\s*(.+)', block)]
+
+def unit_status(results_dir=None, pgbench_file=None):
+    """Статус единицы по собранным результатам: done, partial или failed"""
+    if pgbench_file is not None:
+        if os.path.exists(pgbench_file) and "tps =" in Path(pgbench_file).read_text(errors='replace'):
+            return {"status": "done", "missing_phases": [], "result": os.path.basename(pgbench_file)}
+        return {"status": "failed", "missing_phases": ["pgbench"], "result": None}
+
+    sheets = list(Path(results_dir).glob('results_sheet_*.txt')) if results_dir else []
+    if not sheets:
+        return {"status": "failed", "missing_phases": ["all"], "result": None}
+    latest = max(sheets, key=lambda sheet: sheet.stat().st_mtime)
+    missing = sheet_missing_phases(latest)
+    return {"status": "partial" if missing else "done", "missing_phases": missing, "result": latest.name}
+
+def record_unit(state, iteration, vm, results_dir=None, pgbench_file=None):
+    """Записывает результат попытки выполнения единицы; возвращает ее новый статус"""
+    unit = state["units"].setdefault(unit_key(iteration, vm), {"iteration": iteration, "vm": vm, "attempts": 0})
+    unit.update(unit_status(results_dir, pgbench_file))
+    unit["attempts"] += 1
+    unit["updated"] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    return unit["status"]
+
+def print_summary(state):
+    """Выводит статусы всех единиц кампании"""
+    icons = {"done": "✅", "partial": "⚠️ ", "failed": "❌"}
+    for key, unit in sorted(state["units"].items()):
+        line = f"{icons.get(unit['status'], '•')} {key}: {unit['status']}, попыток {unit['attempts']}"
+        if unit["missing_phases"]:
+            line += f", пропущено: {', '.join(unit['missing_phases'])}"
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description="Состояние кампании тестирования")
+    parser.add_argument('command', choices=['record', 'pending', 'status'],
+                        help="record - записать результат единицы, pending - статус единицы "
+                             "(код возврата 0, если ее нужно выполнить), status - сводка")
+    parser.add_argument('--state', required=True, help=f"Путь к {STATE_FILE}")
+    parser.add_argument('--iteration', type=int, help="Номер итерации")
+    parser.add_argument('--vm', help="IP ВМ")
+    parser.add_argument('--results', help="record: каталог собранных результатов единицы")
+    parser.add_argument('--pgbench-file', help="record: файл вывода pgbench (режим без fio)")
+    args = parser.parse_args()
+
+    state = load_state(args.state)
+    if args.command == 'status':
+        print_summary(state)
+        return
+
+    if args.iteration is None or not args.vm:
+        parser.error("для record и pending нужны --iteration и --vm")
+
+    if args.command == 'pending':
+        unit = state["units"].get(unit_key(args.iteration, args.vm))
+        status = unit["status"] if unit else "missing"
+        print(status)
+        sys.exit(1 if status == "done" else 0)
+
+    status = record_unit(state, args.iteration, args.vm, args.results, args.pgbench_file)
+    save_state(args.state, state)
+    print(f"  📝 {unit_key(args.iteration, args.vm)}: {status}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Сбор результатов с ВМ одним потоковым соединением.
+ВМ формирует архив tar.gz (test_fio_7.py --pack-results или GET /collect агента):
+results_sheet, выводы fio, сводку журналов задержки и контрольные суммы SHA256SUMS.
+Сырые журналы задержки загружаются только с --raw.
+"""
+
+import os
+import sys
+import json
+import shlex
+import hashlib
+import tarfile
+import argparse
+import subprocess
+import urllib.request
+import urllib.parse
+
+DEFAULT_AGENT_PORT = 8765
+SSH_OPTIONS = ["-o", "StrictHostKeyChecking=no", "-o", "UserKnownHostsFile=/dev/null"]
+
+def fetch_via_ssh(target, archive_path, remote_dir=None, raw=False, since=None):
+    """Получает архив по ssh (вывод --pack-results); без remote_dir скрипт ищется в домашнем каталоге"""
+    remote_cmd = "python3 ./test_fio_7.py --pack-results"
+    if remote_dir:
+        remote_cmd = f"cd {shlex.quote(remote_dir)} && {remote_cmd}"
+    if raw:
+        remote_cmd += " --pack-raw"
+    if since is not None:
+        remote_cmd += f" --pack-since {since}"
+    with open(archive_path, 'wb') as archive:
+        result = subprocess.run(["ssh", *SSH_OPTIONS, target, remote_cmd],
+                                stdout=archive, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        print(f"  ❌ {target}: ssh завершился с кодом {result.returncode}: {result.stderr.decode().strip()}")
+        return False
+    return True
+
+def fetch_via_agent(agent, archive_path, token=None, raw=False, since=None):
+    """Получает архив у агента (GET /collect); возвращает True при успехе"""
+    host, _, port = agent.rpartition(':') if ':' in agent else (agent, '', '')
+    query = urllib.parse.urlencode({**({"raw": 1} if raw else {}), **({"since": since} if since is not None else {})})
+    request = urllib.request.Request(f"http://{host}:{port or DEFAULT_AGENT_PORT}/collect?{query}")
+    if token:
+        request.add_header("X-Agent-Token", token)
+    try:
+        with urllib.request.urlopen(request) as response, open(archive_path, 'wb') as archive:
+            while True:
+                chunk = response.read(1024 * 1024)
+                if not chunk:
+                    break
+                archive.write(chunk)
+    except OSError as e:
+        print(f"  ❌ {agent}: {getattr(e, 'reason', e)}")
+        return False
+    return True
+
+def extract_and_verify(archive_path, dest):
+    """Распаковывает архив в dest и сверяет контрольные суммы; возвращает (успех, число файлов)"""
+    os.makedirs(dest, exist_ok=True)
+    dest_root = os.path.realpath(dest)
+    try:
+        with tarfile.open(archive_path, 'r:gz') as tar:
+            for member in tar.getmembers():
+                target = os.path.realpath(os.path.join(dest, member.name))
+                if not member.isfile() or os.path.commonpath([target, dest_root]) != dest_root:
+                    print(f"  ⚠️ Пропущен недопустимый элемент архива: {member.name}")
+                    continue
+                # Фильтр "data" (Python 3.12+) дополнительно запрещает ссылки и спецфайлы
+                tar.extract(member, dest, **({'filter': 'data'} if hasattr(tarfile, 'data_filter') else {}))
+    except (tarfile.TarError, EOFError, OSError) as e:
+        print(f"  ❌ Архив поврежден: {e}")
+        return False, 0
+
+    manifest_path = os.path.join(dest, "SHA256SUMS")
+    if not os.path.exists(manifest_path):
+        print("  ❌ В архиве нет SHA256SUMS")
+        return False, 0
+    with open(manifest_path) as f:
+        entries = [line.rstrip("\n").split("  ", 1) for line in f if line.strip()]
+
+    mismatched = []
+    for expected, name in entries:
+        digest = hashlib.sha256()
+        try:
+            with open(os.path.join(dest, name), 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(chunk)
+        except OSError:
+            mismatched.append(name)
+            continue
+        if digest.hexdigest() != expected:
+            mismatched.append(name)
+    if mismatched:
+        print(f"  ❌ Контрольные суммы не совпали: {', '.join(mismatched)}")
+        return False, len(entries)
+    os.remove(manifest_path)
+    return True, len(entries)
+
+def collect(source, dest, token=None, remote_dir=None, raw=False, since=None, via_agent=False):
+    """Собирает результаты с одной ВМ в каталог dest; возвращает True при успехе"""
+    os.makedirs(dest, exist_ok=True)
+    archive_path = os.path.join(dest, "results.tar.gz")
+    if via_agent:
+        fetched = fetch_via_agent(source, archive_path, token, raw, since)
+    else:
+        fetched = fetch_via_ssh(source, archive_path, remote_dir, raw, since)
+    if not fetched:
+        return False
+
+    archive_size = os.path.getsize(archive_path)
+    ok, files = extract_and_verify(archive_path, dest)
+    if ok:
+        os.remove(archive_path)
+    else:
+        print(f"  ⚠️ Архив сохранен для анализа: {archive_path}")
+        return False
+
+    message = f"  ← {source}: {files} файлов, архив {archive_size / 1024 ** 2:.1f} MiB"
+    summary_path = os.path.join(dest, "latency_summary.json")
+    if os.path.exists(summary_path) and not raw:
+        with open(summary_path) as f:
+            logs = json.load(f)["logs"]
+        raw_bytes = sum(log["bytes"] for log in logs.values())
+        message += f", сырые журналы не загружены ({len(logs)} файлов, {raw_bytes / 1024 ** 2:.1f} MiB)"
+    print(message)
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description="Сбор результатов с ВМ одним сжатым потоком с контрольными суммами")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--ssh', help="ВМ по ssh: user@ip")
+    source.add_argument('--agent', help="Агент test_fio_7.py: host[:port]")
+    parser.add_argument('--dest', required=True, help="Каталог для результатов")
+    parser.add_argument('--token', default=None, help="Токен агента (X-Agent-Token)")
+    parser.add_argument('--remote-dir', default=None,
+                        help="Каталог test_fio_7.py на ВМ (по умолчанию домашний каталог)")
+    parser.add_argument('--raw', action='store_true', help="Загрузить также сырые журналы задержки")
+    parser.add_argument('--since', type=float, default=None,
+                        help="Только файлы, измененные не раньше указанного unix-времени")
+    args = parser.parse_args()
+
+    ok = collect(args.agent or args.ssh, args.dest, token=args.token, remote_dir=args.remote_dir,
+                 raw=args.raw, since=args.since, via_agent=bool(args.agent))
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Проверка точности результатов для адаптивного числа итераций (run_tests.sh).
+По собранным итерациям каталога результатов (кампании или этапа плана) считает
+95% доверительный интервал среднего ключевых показателей: IOPS и p99 этапов fio,
+TPS pgbench. Шаги поиска по SLO и ступени открытой нагрузки отдельными тестами не
+считаются: учитываются найденная рабочая точка (Max IOPS) и пиковая строка. Точность достигнута, если полуширина интервала каждого показателя
+не больше цели (в % от среднего). Итог записывается в precision.json и попадает
+в отчет aggregate_results.py.
+
+Код возврата 0 - точность достигнута (дальнейшие итерации не нужны), 1 - нет.
+"""
+
+import os
+import re
+import sys
+import io
+import json
+import argparse
+import contextlib
+from pathlib import Path
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+import test_fio_7
+import aggregate_results
+
+DEFAULT_TARGET_PCT = 5.0
+DEFAULT_MIN_ITERATIONS = 2
+
+def raw_pgbench_precision(results_dir):
+    """TPS по итерациям из выводов pgbench без results_sheet (режим только pgbench)"""
+    iterations_data = {}
+    for path in sorted(Path(results_dir).glob('iter*_pgbench_*.txt')):
+        iter_num = int(re.match(r'iter(\d+)_', path.name).group(1))
+        parsed = test_fio_7.parse_pgbench_output(path.read_text(errors='replace'))
+        if parsed and parsed["TPS"] != "N/A":
+            iterations_data.setdefault(iter_num, []).append({'fio': {}, 'pgbench': {'TPS': float(parsed["TPS"])}})
+    return aggregate_results.precision_by_iteration(iterations_data) if iterations_data else {}
+
+def check_precision(results_dir, target_pct=DEFAULT_TARGET_PCT, min_iterations=DEFAULT_MIN_ITERATIONS):
+    """Точность ключевых показателей каталога результатов; возвращает итог для precision.json"""
+    # aggregate_results выводит ход разбора - здесь нужна только сводка
+    with contextlib.redirect_stdout(io.StringIO()):
+        aggregated = aggregate_results.aggregate_results(results_dir)
+    metrics = dict(aggregated['precision']) if aggregated else {}
+    if "pgbench: TPS" not in metrics:
+        metrics.update(raw_pgbench_precision(results_dir))
+
+    iterations = max((stats['iterations'] for stats in metrics.values()), default=0)
+    reached = bool(metrics) and iterations >= min_iterations and all(
+        stats['ci_pct'] is not None and stats['ci_pct'] <= target_pct for stats in metrics.values())
+    return {
+        "target_pct": target_pct,
+        "min_iterations": min_iterations,
+        "iterations": iterations,
+        "reached": reached,
+        "checked": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        "metrics": metrics
+    }
+
+def print_precision(result):
+    """Показатели, не достигшие цели (или все, если цель достигнута)"""
+    if not result["metrics"]:
+        print("  ⚠️  Нет ключевых показателей (IOPS, p99, TPS) для оценки точности")
+        return
+    for metric, stats in sorted(result["metrics"].items()):
+        ok = stats['ci_pct'] is not None and stats['ci_pct'] <= result["target_pct"]
+        if ok and not result["reached"]:
+            continue
+        ci = f"±{stats['ci_pct']:.1f}%" if stats['ci_pct'] is not None else "N/A"
+        print(f"  {'✓' if ok else '✗'} {metric}: {stats['mean']:.2f} {ci} (итераций: {stats['iterations']})")
+    outcome = "достигнута" if result["reached"] else "не достигнута"
+    print(f"🎯 Точность ±{result['target_pct']:g}% {outcome} за {result['iterations']} итераций")
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка точности результатов по доверительным интервалам")
+    parser.add_argument('--results', required=True, help="Каталог результатов кампании или этапа плана")
+    parser.add_argument('--target-pct', type=float, default=DEFAULT_TARGET_PCT,
+                        help=f"Допустимая полуширина 95%% доверительного интервала, %% от среднего "
+                             f"(по умолчанию {DEFAULT_TARGET_PCT:g})")
+    parser.add_argument('--min-iterations', type=int, default=DEFAULT_MIN_ITERATIONS,
+                        help=f"Минимальное число итераций (по умолчанию {DEFAULT_MIN_ITERATIONS})")
+    args = parser.parse_args()
+
+    result = check_precision(args.results, args.target_pct, args.min_iterations)
+    with open(os.path.join(args.results, aggregate_results.PRECISION_FILE), 'w') as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+    print_precision(result)
+    sys.exit(0 if result["reached"] else 1)
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,31 @@ ask_with_default() {
 USER="testuser"
 REMOTE_DIR="/home/$USER"
 LOCAL_SCRIPT="../scripts/test_fio_7.py"
+AGENT_CLIENT="./agent_client.py"
+COLLECT_RESULTS="./collect_results.py"
+CAMPAIGN_STATE="./campaign_state.py"
+CAMPAIGN_PLAN="./campaign_plan.py"
+PRECISION="./precision.py"
+AGENT_PORT=8765
+
+# === Продолжение прерванной кампании: ./run_tests.sh --resume <каталог результатов> ===
+# === Кампания по файлу описания: ./run_tests.sh --spec <campaign.toml> (см. campaign_plan.py) ===
+RESUME_DIR=""
+SPEC_FILE=""
+PLAN_FILE=""
+if [ "$1" = "--resume" ]; then
+    RESUME_DIR="${2%/}"
+    if [ ! -f "$RESUME_DIR/campaign.env" ]; then
+        echo "❌ Ошибка: в $RESUME_DIR нет campaign.env (параметры кампании)"
+        exit 1
+    fi
+elif [ "$1" = "--spec" ]; then
+    SPEC_FILE="$2"
+    if [ ! -f "$SPEC_FILE" ]; then
+        echo "❌ Ошибка: не найден файл описания кампании $SPEC_FILE"
+        exit 1
+    fi
+fi
 
 # === Проверка скрипта ===
 if [ ! -f "$LOCAL_SCRIPT" ]; then
@@ -19,71 +44,148 @@ if [ ! -f "$LOCAL_SCRIPT" ]; then
     exit 1
 fi
 
-# === 1. Запрос количества ВМ и IP ===
-read -p "Сколько ВМ будут участвовать в тесте? (например, 1, 2, 4): " VM_COUNT
-if ! [[ "$VM_COUNT" =~ ^[1-9][0-9]*$ ]]; then
-    echo "❌ Ошибка: введите целое число ≥ 1"
-    exit 1
-fi
+# === Параметры кампании (запрашиваются у пользователя) ===
+ask_campaign_settings() {
+    # === 1. Запрос количества ВМ и IP ===
+    read -p "Сколько ВМ будут участвовать в тесте? (например, 1, 2, 4): " VM_COUNT
+    if ! [[ "$VM_COUNT" =~ ^[1-9][0-9]*$ ]]; then
+        echo "❌ Ошибка: введите целое число ≥ 1"
+        exit 1
+    fi
+
+    VMS=()
+    for ((i=1; i<=VM_COUNT; i++)); do
+        read -p "Введите IP-адрес ВМ #$i: " ip
+        if [[ ! $ip =~ ^[0-9]+\.[0-9]+\.[0-9]+\.[0-9]+$ ]]; then
+            echo "❌ Некорректный IP: $ip"
+            exit 1
+        fi
+        VMS+=("$ip")
+    done
+
+    # === 2. Выбор типа теста ===
+    echo
+    echo "Выберите тип теста:"
+    echo "  1) Только fio"
+    echo "  2) Только pgbench"
+    echo "  3) fio + pgbench (рекомендуется)"
+    echo "  4) pgbench под фоновой нагрузкой fio (interference)"
+    read -p "Ваш выбор (1/2/3/4): " TEST_MODE
+    INTERFERENCE=false
+    case $TEST_MODE in
+        1) RUN_FIO=true;   RUN_PG=false;  ;;
+        2) RUN_FIO=false;  RUN_PG=true;   ;;
+        3) RUN_FIO=true;   RUN_PG=true;   ;;
+        4) RUN_FIO=true;   RUN_PG=true;   INTERFERENCE=true ;;
+        *) echo "❌ Неверный выбор. Выход."; exit 1 ;;
+    esac
 
-declare -a VMS
-for ((i=1; i<=VM_COUNT; i++)); do
-    read -p "Введите IP-адрес ВМ #$i: " ip
-    if [[ ! $ip =~ ^[0-9]+\.[0-9]+\.[0-9]+\.[0-9]+$ ]]; then
-        echo "❌ Некорректный IP: $ip"
+    # === 3. Количество итераций (auto - пока доверительный интервал ключевых показателей шире цели) ===
+    echo
+    ITERATIONS=$(ask_with_default "Количество итераций тестов (число или auto)" "3")
+    if [ "$ITERATIONS" = "auto" ]; then
+        ADAPTIVE_PCT=$(ask_with_default "Цель точности: полуширина 95% доверительного интервала IOPS, p99 и TPS, % от среднего" "5")
+        MIN_ITERATIONS=$(ask_with_default "Минимум итераций" "2")
+        ITERATIONS=$(ask_with_default "Максимум итераций" "10")
+        if ! [[ "$ADAPTIVE_PCT" =~ ^[0-9]+([.][0-9]+)?$ && "$MIN_ITERATIONS" =~ ^[0-9]+$ && "$ITERATIONS" =~ ^[0-9]+$ ]] \
+            || [ "$MIN_ITERATIONS" -lt 2 ] || [ "$ITERATIONS" -lt "$MIN_ITERATIONS" ]; then
+            echo "❌ Ошибка: нужны цель > 0 и целые 2 ≤ минимум ≤ максимум"
+            exit 1
+        fi
+    elif ! [[ "$ITERATIONS" =~ ^[1-9][0-9]*$ ]]; then
+        echo "❌ Ошибка: введите целое число ≥ 1 или auto"
         exit 1
     fi
-    VMS+=("$ip")
-done
 
-# === 2. Выбор типа теста ===
-echo
-echo "Выберите тип теста:"
-echo "  1) Только fio"
-echo "  2) Только pgbench"
-echo "  3) fio + pgbench (рекомендуется)"
-read -p "Ваш выбор (1/2/3): " TEST_MODE
-case $TEST_MODE in
-    1) RUN_FIO=true;   RUN_PG=false;  ;;
-    2) RUN_FIO=false;  RUN_PG=true;   ;;
-    3) RUN_FIO=true;   RUN_PG=true;   ;;
-    *) echo "❌ Неверный выбор. Выход."; exit 1 ;;
-esac
-
-# === 3. Количество итераций ===
-echo
-ITERATIONS=$(ask_with_default "Количество итераций тестов" "3")
-if ! [[ "$ITERATIONS" =~ ^[1-9][0-9]*$ ]]; then
-    echo "❌ Ошибка: введите целое число ≥ 1"
-    exit 1
-fi
+    # === 4. Параметры fio (если нужен) ===
+    USE_AGENT=false
+    if [ "$RUN_FIO" = true ]; then
+        AGENT_ANSWER=$(ask_with_default "Запускать через агентов на ВМ (тестовый файл и база pgbench сохраняются между итерациями)? (y/N)" "N")
+        [[ $AGENT_ANSWER =~ ^[Yy]$ ]] && USE_AGENT=true
+        echo
+        echo "=== Настройка fio (оставьте пустым для значений по умолчанию) ==="
+        TEST_NAME=$(ask_with_default "Название теста" "interactive_run")
+        SIZE=$(ask_with_default "Размер файла" "10G")
+        BS=$(ask_with_default "Размер блока" "4k")
+        MIX=$(ask_with_default "Процент записи в RW" "60")
+        IO_DEPTH=$(ask_with_default "Глубина очереди" "64")
+        RUNTIME=$(ask_with_default "Время выполнения (сек)" "60")
+        PROFILE=$(ask_with_default "Профиль нагрузки (standard/postgres)" "standard")
+        if [[ "$PROFILE" != "standard" && "$PROFILE" != "postgres" ]]; then
+            echo "❌ Ошибка: профиль должен быть standard или postgres"
+            exit 1
+        fi
+        NUMJOBS=$(ask_with_default "Количество заданий fio (numjobs)" "4")
+        CPU_PINNING=$(ask_with_default "Привязка к CPU (none/spread/compact/numa)" "none")
+        DATA_PATTERN=$(ask_with_default "Шаблон данных (random/zero/compress50/compress75/dedupe50/reducible/postgres)" "random")
+        IOENGINE=$(ask_with_default "Движок ввода-вывода (libaio, io_uring, io_uring-fixedbufs, io_uring-registerfiles, io_uring-sqpoll, io_uring-hipri, psync, pvsync2)" "libaio")
+        SYNC_LATENCY=$(ask_with_default "Измерять задержку fsync/fdatasync? (y/N)" "N")
+        PRECONDITION=$(ask_with_default "Предкондиционирование (none/once/each)" "none")
+        IO_MODE=$(ask_with_default "Режим ввода-вывода fio (direct/buffered)" "direct")
+        if [ "$IO_MODE" = "buffered" ]; then
+            CACHE_STATE=$(ask_with_default "Состояние кэша страниц перед этапом (cold / warm / warm:<доля файла, %>)" "cold")
+        fi
+        LATENCY_LOG=$(ask_with_default "Журналы задержки fio (off/avg/raw)" "off")
+        FETCH_RAW=$(ask_with_default "Загружать сырые журналы задержки на контрольный хост? (y/N)" "N")
+    fi
+
+    if [ "$INTERFERENCE" = true ]; then
+        echo
+        echo "=== Настройка фоновой нагрузки fio ==="
+        BG_RW=$(ask_with_default "Тип фоновой нагрузки (randread/randwrite/randrw/read/write)" "randread")
+        BG_RATE=$(ask_with_default "Интенсивность фоновой нагрузки, IOPS (0 - без ограничения)" "5000")
+        BG_HOST=$(ask_with_default "ВМ для фоновой нагрузки (user@ip, пусто - та же ВМ)" "")
+        if [ "$USE_AGENT" = true ] && [ -n "$BG_HOST" ]; then
+            echo "❌ Ошибка: фоновая нагрузка на другой ВМ недоступна при запуске через агентов"
+            exit 1
+        fi
+    fi
 
-# === 4. Параметры fio (если нужен) ===
-if [ "$RUN_FIO" = true ]; then
+    # === 5. Подтверждение ===
     echo
-    echo "=== Настройка fio (оставьте пустым для значений по умолчанию) ==="
-    TEST_NAME=$(ask_with_default "Название теста" "interactive_run")
-    SIZE=$(ask_with_default "Размер файла" "10G")
-    BS=$(ask_with_default "Размер блока" "4k")
-    MIX=$(ask_with_default "Процент записи в RW" "60")
-    IO_DEPTH=$(ask_with_default "Глубина очереди" "64")
-    RUNTIME=$(ask_with_default "Время выполнения (сек)" "60")
-fi
+    echo "=== Подтверждение запуска ==="
+    echo "• ВМ: ${VMS[*]}"
+    if [ -n "$ADAPTIVE_PCT" ]; then
+        echo "• Количество итераций: от $MIN_ITERATIONS до $ITERATIONS, пока точность хуже ±${ADAPTIVE_PCT}%"
+    else
+        echo "• Количество итераций: $ITERATIONS"
+    fi
+    echo "• Тесты: $( [ "$RUN_FIO" = true ] && echo "fio " )$( [ "$RUN_PG" = true ] && echo "pgbench" )"
+    if [ "$RUN_FIO" = true ]; then
+        echo "• fio: ${SIZE}, блок=${BS}, время=${RUNTIME} сек, профиль=${PROFILE}, движок=${IOENGINE}"
+    fi
+    echo
+    read -p "Запустить тесты? (y/N): " confirm
+    if [[ ! $confirm =~ ^[Yy]$ ]]; then
+        echo "Отмена."
+        exit 0
+    fi
+}
 
-# === 5. Подтверждение ===
-echo
-echo "=== Подтверждение запуска ==="
-echo "• ВМ: ${VMS[*]}"
-echo "• Количество итераций: $ITERATIONS"
-echo "• Тесты: $( [ "$RUN_FIO" = true ] && echo "fio " )$( [ "$RUN_PG" = true ] && echo "pgbench" )"
-if [ "$RUN_FIO" = true ]; then
-    echo "• fio: ${SIZE}, блок=${BS}, время=${RUNTIME} сек"
-fi
-echo
-read -p "Запустить тесты? (y/N): " confirm
-if [[ ! $confirm =~ ^[Yy]$ ]]; then
-    echo "Отмена."
-    exit 0
+# === Параметры кампании из файла описания: план, оценка времени и подтверждение ===
+plan_campaign_settings() {
+    # План записывается во временный каталог и переносится в каталог результатов без изменений
+    PLAN_TMP=$(mktemp -d)
+    python3 "$CAMPAIGN_PLAN" plan --spec "$SPEC_FILE" --out "$PLAN_TMP" || exit 1
+    eval "$(python3 "$CAMPAIGN_PLAN" env --plan "$PLAN_TMP/campaign_plan.json")"
+    echo
+    read -p "Запустить кампанию по плану? (y/N): " confirm
+    if [[ ! $confirm =~ ^[Yy]$ ]]; then
+        echo "Отмена."
+        exit 0
+    fi
+}
+
+if [ -n "$RESUME_DIR" ]; then
+    source "$RESUME_DIR/campaign.env"
+    echo "🔁 Продолжение кампании: $RESUME_DIR"
+    if [ ! -f "$RESUME_DIR/campaign_plan.json" ]; then
+        python3 "$CAMPAIGN_STATE" status --state "$RESUME_DIR/campaign_state.json"
+    fi
+elif [ -n "$SPEC_FILE" ]; then
+    plan_campaign_settings
+else
+    ask_campaign_settings
 fi
 
 # === 6. Копирование скрипта на ВМ ===
@@ -97,36 +199,104 @@ for ip in "${VMS[@]}"; do
     fi
 done
 
+# === 6a. Запуск агентов (одно ssh-подключение на ВМ за всю кампанию) ===
+if [ "$USE_AGENT" = true ]; then
+    AGENT_TOKEN=$(head -c 16 /dev/urandom | od -An -tx1 | tr -d ' \n')
+    AGENTS=""
+    echo -e "\n🤖 Запуск агентов на ВМ..."
+    # Токен передается через stdin ssh в файл с правами 600, а не в командной строке (виден в ps)
+    for ip in "${VMS[@]}"; do
+        ssh -o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null \
+            "$USER@$ip" "cd $REMOTE_DIR && (umask 077 && cat > .agent_token) && pkill -f '^[^ ]*python3 ./test_fio_7.py --agent' ; nohup setsid python3 ./test_fio_7.py --agent --agent-bind 0.0.0.0 --agent-port $AGENT_PORT --agent-token-file .agent_token > agent.log 2>&1 < /dev/null &" <<< "$AGENT_TOKEN"
+        AGENTS="${AGENTS:+$AGENTS,}$ip:$AGENT_PORT"
+    done
+    sleep 3
+    if ! python3 "$AGENT_CLIENT" status --agents "$AGENTS" --token "$AGENT_TOKEN"; then
+        echo "❌ Не все агенты доступны (порт $AGENT_PORT, см. $REMOTE_DIR/agent.log на ВМ)"
+        exit 1
+    fi
+fi
+
 # === 7. Создание директории для результатов ===
-TIMESTAMP=$(date +%Y%m%d_%H%M)
-RESULTS_DIR="results/${TIMESTAMP}_${TEST_NAME}_${#VMS[@]}VMs_${ITERATIONS}iter"
-mkdir -p "$RESULTS_DIR"
+if [ -n "$RESUME_DIR" ]; then
+    RESULTS_DIR="$RESUME_DIR"
+else
+    TIMESTAMP=$(date +%Y%m%d_%H%M)
+    RESULTS_DIR="results/${TIMESTAMP}_${TEST_NAME}_${#VMS[@]}VMs_${ITERATIONS}iter"
+    mkdir -p "$RESULTS_DIR"
+    # Параметры кампании сохраняются для продолжения через --resume
+    declare -p VMS RUN_FIO RUN_PG INTERFERENCE ITERATIONS USE_AGENT TEST_NAME SIZE BS MIX IO_DEPTH RUNTIME \
+        PROFILE NUMJOBS CPU_PINNING DATA_PATTERN IOENGINE SYNC_LATENCY PRECONDITION IO_MODE CACHE_STATE LATENCY_LOG FETCH_RAW \
+        BG_RW BG_RATE BG_HOST PLAN_STEPS ADAPTIVE_PCT MIN_ITERATIONS > "$RESULTS_DIR/campaign.env" 2>/dev/null
+    # План кампании по описанию хранится вместе с результатами (повтор: ./run_tests.sh --spec <каталог>/campaign_spec.toml)
+    [ -n "$SPEC_FILE" ] && mv "$PLAN_TMP"/* "$RESULTS_DIR/" && rmdir "$PLAN_TMP"
+fi
+# В режиме плана у каждого этапа свой каталог (свои итерации и campaign_state.json)
+CAMPAIGN_DIR="$RESULTS_DIR"
+[ -f "$CAMPAIGN_DIR/campaign_plan.json" ] && PLAN_FILE="$CAMPAIGN_DIR/campaign_plan.json"
+STATE_FILE="$RESULTS_DIR/campaign_state.json"
 echo "📁 Результаты будут сохранены в: ./$RESULTS_DIR/"
 
-# === 8. Цикл по итерациям ===
-for ((iter=1; iter<=ITERATIONS; iter++)); do
-    echo -e "\n$('=' printf '%.0s' {1..60})"
-    echo "🔄 ИТЕРАЦИЯ $iter из $ITERATIONS"
-    echo "$('=' printf '%.0s' {1..60})"
-    
-    # Очистка старых результатов на ВМ перед каждой итерацией
-    echo -e "\n🧹 Очистка предыдущих результатов на ВМ..."
+# === 8. Одна итерация на всех ВМ (в режиме плана - один этап плана) ===
+run_iteration() {
+    local iter=$1
+
+    # Единицы (итерация, ВМ), еще не выполненные полностью; незавершенные продолжаются с --resume
+    RUN_VMS=()
+    FRESH_VMS=()
     for ip in "${VMS[@]}"; do
-        ssh -o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null \
-            "$USER@$ip" "rm -rf $REMOTE_DIR/results/* $REMOTE_DIR/testfile* 2>/dev/null || true"
+        UNIT_STATUS=$(python3 "$CAMPAIGN_STATE" pending --state "$STATE_FILE" --iteration $iter --vm "$ip")
+        case "$UNIT_STATUS" in
+            done)    echo "  ✓ $ip: итерация уже выполнена" ;;
+            missing) RUN_VMS+=("$ip"); FRESH_VMS+=("$ip") ;;
+            *)       RUN_VMS+=("$ip"); echo "  ↻ $ip: продолжение ($UNIT_STATUS)" ;;
+        esac
+    done
+    if [ ${#RUN_VMS[@]} -eq 0 ]; then
+        echo "✅ Итерация $iter выполнена на всех ВМ, пропуск"
+        return
+    fi
+    for ip in "${RUN_VMS[@]}"; do
+        rm -f "$RESULTS_DIR/iter${iter}_results_$ip"/results_sheet_*
     done
 
+    # Перед новой единицей результаты на ВМ удаляются, чтобы выводы прошлых кампаний с тем же
+    # названием теста не попали в отчет; результаты незавершенных единиц остаются для --resume.
+    # Тестовый файл удаляется перед каждой итерацией (агенты сохраняют его между итерациями,
+    # этапы плана с той же раскладкой файла - между этапами итерации)
+    if [ ${#FRESH_VMS[@]} -gt 0 ]; then
+        echo -e "\n🧹 Очистка результатов на ВМ..."
+        CLEANUP="$REMOTE_DIR/results/*"
+        [ "$USE_AGENT" = false ] && [ "$KEEP_TESTFILE" != true ] && CLEANUP="$CLEANUP $REMOTE_DIR/testfile*"
+        for ip in "${FRESH_VMS[@]}"; do
+            ssh -o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null \
+                "$USER@$ip" "rm -rf $CLEANUP 2>/dev/null || true"
+        done
+    fi
+    # Продолжение прерванных этапов на ВМ - только при ./run_tests.sh --resume
+    RESUME_ARG=""
+    [ -n "$RESUME_DIR" ] && RESUME_ARG=" --resume"
+    ITER_START=$(date +%s)
+
     # === 9. Формирование команды ===
     CMD=""
 
     # Случай 1: Только pgbench (без fio)
     if [ "$RUN_FIO" = false ] && [ "$RUN_PG" = true ]; then
         echo "Режим: только pgbench"
-        CMD="mkdir -p $REMOTE_DIR/results && cd $REMOTE_DIR && sudo -u postgres pgbench -i -s100 postgres && sudo -u postgres pgbench -c32 -j4 -T600 -P30 postgres > results/pgbench_iter${iter}_output.txt 2>&1"
+        PGBENCH_INIT="sudo -u postgres pgbench -i -s${PGBENCH_SCALE:-100} postgres && "
+        [ "$PGBENCH_REUSE" = true ] && PGBENCH_INIT=""
+        CMD="mkdir -p $REMOTE_DIR/results && cd $REMOTE_DIR && ${PGBENCH_INIT}sudo -u postgres pgbench -c${PGBENCH_CLIENTS:-32} -j${PGBENCH_JOBS:-4} -T${PGBENCH_DURATION:-600} -P30 postgres > results/pgbench_iter${iter}_output.txt 2>&1"
+    fi
+
+    # Этап плана кампании: параметры test_fio_7.py сформированы campaign_plan.py
+    if [ "$RUN_FIO" = true ] && [ -n "$STEP_ARGS" ]; then
+        echo "Режим: этап плана $STEP_NAME"
+        CMD="cd $REMOTE_DIR && python3 ./test_fio_7.py ${STEP_ARGS//\{iter\}/$iter}$RESUME_ARG"
     fi
 
     # Случай 2: Только fio (без pgbench)
-    if [ "$RUN_FIO" = true ] && [ "$RUN_PG" = false ]; then
+    if [ "$RUN_FIO" = true ] && [ "$RUN_PG" = false ] && [ -z "$STEP_ARGS" ]; then
         echo "Режим: только fio"
         CMD="cd $REMOTE_DIR && python3 ./test_fio_7.py"
         CMD="$CMD --test-name '${TEST_NAME}_iter${iter}'"
@@ -135,10 +305,22 @@ for ((iter=1; iter<=ITERATIONS; iter++)); do
         CMD="$CMD --mix '$MIX'"
         CMD="$CMD --io-depth $IO_DEPTH"
         CMD="$CMD --runtime $RUNTIME"
+        CMD="$CMD --profile $PROFILE"
+        CMD="$CMD --ioengine $IOENGINE"
+        CMD="$CMD --numjobs $NUMJOBS"
+        CMD="$CMD --cpu-pinning $CPU_PINNING"
+        CMD="$CMD --data-pattern $DATA_PATTERN"
+        [[ $SYNC_LATENCY =~ ^[Yy]$ ]] && CMD="$CMD --sync-latency"
+        CMD="$CMD --precondition $PRECONDITION"
+        CMD="$CMD --latency-log $LATENCY_LOG"
+        CMD="$CMD --io-mode ${IO_MODE:-direct}"
+        [[ ${CACHE_STATE:-cold} == warm* ]] && CMD="$CMD --cache-state warm"
+        [[ ${CACHE_STATE:-cold} == warm:* ]] && CMD="$CMD --prewarm-pct ${CACHE_STATE#warm:}"
+        CMD="$CMD$RESUME_ARG"
     fi
 
     # Случай 3: fio + pgbench (оба теста)
-    if [ "$RUN_FIO" = true ] && [ "$RUN_PG" = true ]; then
+    if [ "$RUN_FIO" = true ] && [ "$RUN_PG" = true ] && [ -z "$STEP_ARGS" ]; then
         echo "Режим: fio + pgbench"
         CMD="cd $REMOTE_DIR && python3 ./test_fio_7.py"
         CMD="$CMD --test-name '${TEST_NAME}_iter${iter}'"
@@ -147,7 +329,24 @@ for ((iter=1; iter<=ITERATIONS; iter++)); do
         CMD="$CMD --mix '$MIX'"
         CMD="$CMD --io-depth $IO_DEPTH"
         CMD="$CMD --runtime $RUNTIME"
-        CMD="$CMD --run-pgbench"
+        CMD="$CMD --profile $PROFILE"
+        CMD="$CMD --ioengine $IOENGINE"
+        CMD="$CMD --numjobs $NUMJOBS"
+        CMD="$CMD --cpu-pinning $CPU_PINNING"
+        CMD="$CMD --data-pattern $DATA_PATTERN"
+        [[ $SYNC_LATENCY =~ ^[Yy]$ ]] && CMD="$CMD --sync-latency"
+        CMD="$CMD --precondition $PRECONDITION"
+        CMD="$CMD --latency-log $LATENCY_LOG"
+        CMD="$CMD --io-mode ${IO_MODE:-direct}"
+        [[ ${CACHE_STATE:-cold} == warm* ]] && CMD="$CMD --cache-state warm"
+        [[ ${CACHE_STATE:-cold} == warm:* ]] && CMD="$CMD --prewarm-pct ${CACHE_STATE#warm:}"
+        CMD="$CMD$RESUME_ARG"
+        if [ "$INTERFERENCE" = true ]; then
+            CMD="$CMD --mode interference --bg-rw $BG_RW --bg-rate $BG_RATE"
+            [ -n "$BG_HOST" ] && CMD="$CMD --bg-host $BG_HOST"
+        else
+            CMD="$CMD --run-pgbench"
+        fi
     fi
 
     # Проверка, что команда сформирована
@@ -158,62 +357,163 @@ for ((iter=1; iter<=ITERATIONS; iter++)); do
 
     echo "Команда для выполнения: $CMD"
 
-    # === 10. Запуск с прогресс-баром ===
-    echo -e "\n🚀 Запуск тестов на ${#VMS[@]} ВМ (итерация $iter)..."
-    PIDS=()
-    for ip in "${VMS[@]}"; do
-        echo "  → Запуск на $ip"
-        ssh -o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null \
-            "$USER@$ip" "$CMD" > "${RESULTS_DIR}/iter${iter}_log_$ip.log" 2>&1 &
-        PIDS+=($!)
-    done
+    # === 10a. Запуск через агентов: общее время старта, результаты сохраняются клиентом ===
+    # Агент запускает только test_fio_7.py: этапы "только pgbench" выполняются через ssh
+    if [ "$USE_AGENT" = true ] && [ "$RUN_FIO" = true ]; then
+        echo -e "\n🚀 Запуск тестов через агентов на ${#RUN_VMS[@]} ВМ (итерация $iter)..."
+        RUN_AGENTS=$(printf "%s:$AGENT_PORT," "${RUN_VMS[@]}")
+        RUN_AGENTS="${RUN_AGENTS%,}"
+        eval "python3 \"$AGENT_CLIENT\" run --agents \"$RUN_AGENTS\" --token \"$AGENT_TOKEN\" --results-dir \"$RESULTS_DIR\" --iteration $iter -- ${CMD#*test_fio_7.py}" \
+            || echo "⚠️ Итерация $iter завершилась с ошибками на части ВМ"
+        # Выводы fio и сводки журналов задержки этой итерации (results_sheet уже сохранен клиентом)
+        for ip in "${RUN_VMS[@]}"; do
+            python3 "$COLLECT_RESULTS" --agent "$ip:$AGENT_PORT" --token "$AGENT_TOKEN" --since "$ITER_START" \
+                --dest "$RESULTS_DIR/iter${iter}_results_$ip" $( [[ $FETCH_RAW =~ ^[Yy]$ ]] && echo "--raw" ) \
+                || echo "  ⚠️ Не удалось собрать результаты с $ip"
+        done
+    else
+        # === 10. Запуск с прогресс-баром ===
+        echo -e "\n🚀 Запуск тестов на ${#RUN_VMS[@]} ВМ (итерация $iter)..."
+        PIDS=()
+        for ip in "${RUN_VMS[@]}"; do
+            echo "  → Запуск на $ip"
+            ssh -o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null \
+                "$USER@$ip" "$CMD" > "${RESULTS_DIR}/iter${iter}_log_$ip.log" 2>&1 &
+            PIDS+=($!)
+        done
 
-    # Простой прогресс-бар (каждые 10 секунд точка)
-    echo -n "Прогресс: "
-    while kill -0 ${PIDS[0]} 2>/dev/null; do
-        echo -n "."
-        sleep 10
-    done
-    wait
-    echo " ✅ Завершено."
+        # Простой прогресс-бар (каждые 10 секунд точка)
+        echo -n "Прогресс: "
+        while kill -0 ${PIDS[0]} 2>/dev/null; do
+            echo -n "."
+            sleep 10
+        done
+        wait
+        echo " ✅ Завершено."
 
-    # === 11. Сбор результатов текущей итерации ===
-    echo -e "\n⬇️ Сбор результатов итерации $iter..."
+        # === 11. Сбор результатов текущей итерации ===
+        echo -e "\n⬇️ Сбор результатов итерации $iter..."
 
-    # Сбор результатов fio
-    if [ "$RUN_FIO" = true ]; then
-        echo "📥 Сбор результатов fio..."
-        for ip in "${VMS[@]}"; do
-            echo "  ← $ip"
-            scp -o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null \
-                -r "$USER@$ip:$REMOTE_DIR/results/" "$RESULTS_DIR/iter${iter}_results_$ip/" 2>/dev/null || echo "  ⚠️ Не удалось скопировать с $ip"
-        done
-    fi
+        # Сбор результатов fio
+        if [ "$RUN_FIO" = true ]; then
+            echo "📥 Сбор результатов fio..."
+            for ip in "${RUN_VMS[@]}"; do
+                python3 "$COLLECT_RESULTS" --ssh "$USER@$ip" --remote-dir "$REMOTE_DIR" --since "$ITER_START" \
+                    --dest "$RESULTS_DIR/iter${iter}_results_$ip" $( [[ $FETCH_RAW =~ ^[Yy]$ ]] && echo "--raw" ) \
+                    || echo "  ⚠️ Не удалось собрать результаты с $ip"
+            done
+        fi
 
-    # Сбор результатов pgbench
-    if [ "$RUN_PG" = true ]; then
-        echo "📥 Сбор результатов pgbench..."
-        for ip in "${VMS[@]}"; do
-            # Если pgbench запускался отдельно
-            if [ "$RUN_FIO" = false ]; then
-                if ssh -o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null \
-                    "$USER@$ip" "[ -f $REMOTE_DIR/results/pgbench_iter${iter}_output.txt ]" 2>/dev/null; then
-                    scp -o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null \
-                        "$USER@$ip:$REMOTE_DIR/results/pgbench_iter${iter}_output.txt" "$RESULTS_DIR/iter${iter}_pgbench_$ip.txt" 2>/dev/null
-                    echo "  ← pgbench_iter${iter}_$ip.txt"
+        # Сбор результатов pgbench
+        if [ "$RUN_PG" = true ]; then
+            echo "📥 Сбор результатов pgbench..."
+            for ip in "${RUN_VMS[@]}"; do
+                # Если pgbench запускался отдельно
+                if [ "$RUN_FIO" = false ]; then
+                    if ssh -o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null \
+                        "$USER@$ip" "[ -f $REMOTE_DIR/results/pgbench_iter${iter}_output.txt ]" 2>/dev/null; then
+                        scp -o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null \
+                            "$USER@$ip:$REMOTE_DIR/results/pgbench_iter${iter}_output.txt" "$RESULTS_DIR/iter${iter}_pgbench_$ip.txt" 2>/dev/null
+                        echo "  ← pgbench_iter${iter}_$ip.txt"
+                    else
+                        echo "  ⚠️ Файл pgbench не найден на $ip"
+                    fi
                 else
-                    echo "  ⚠️ Файл pgbench не найден на $ip"
+                    # Если pgbench был частью python скрипта, результаты уже в results_sheet
+                    echo "  → Результаты pgbench включены в results_sheet_*.txt"
                 fi
-            else
-                # Если pgbench был частью python скрипта, результаты уже в results_sheet
-                echo "  → Результаты pgbench включены в results_sheet_*.txt"
+            done
+        fi
+    fi
+
+    # Статус единиц итерации в файле состояния кампании
+    for ip in "${RUN_VMS[@]}"; do
+        if [ "$RUN_FIO" = true ]; then
+            python3 "$CAMPAIGN_STATE" record --state "$STATE_FILE" --iteration $iter --vm "$ip" \
+                --results "$RESULTS_DIR/iter${iter}_results_$ip"
+        else
+            python3 "$CAMPAIGN_STATE" record --state "$STATE_FILE" --iteration $iter --vm "$ip" \
+                --pgbench-file "$RESULTS_DIR/iter${iter}_pgbench_$ip.txt"
+        fi
+    done
+}
+
+# === Адаптивный режим: достигнута ли точность по итерациям каталога $RESULTS_DIR ===
+precision_reached() {
+    [ -n "$ADAPTIVE_PCT" ] && [ "$iter" -ge "$MIN_ITERATIONS" ] && \
+        python3 "$PRECISION" --results "$RESULTS_DIR" --target-pct "$ADAPTIVE_PCT" --min-iterations "$MIN_ITERATIONS"
+}
+
+# === Цикл по итерациям (в режиме плана - по этапам плана внутри итерации) ===
+# В адаптивном режиме этап, достигший точности, в следующих итерациях не выполняется
+declare -A PRECISE_STEPS=()
+for ((iter=1; iter<=ITERATIONS; iter++)); do
+    echo -e "\n$('=' printf '%.0s' {1..60})"
+    echo "🔄 ИТЕРАЦИЯ $iter из $( [ -n "$ADAPTIVE_PCT" ] && echo "не более " )$ITERATIONS"
+    echo "$('=' printf '%.0s' {1..60})"
+
+    if [ -n "$PLAN_FILE" ]; then
+        STEP_SKIPPED=false
+        for ((step=1; step<=PLAN_STEPS; step++)); do
+            eval "$(python3 "$CAMPAIGN_PLAN" step --plan "$PLAN_FILE" --step $step)"
+            if [ -n "${PRECISE_STEPS[$step]}" ]; then
+                STEP_SKIPPED=true
+                continue
+            fi
+            # После пропущенного этапа тестовый файл и база pgbench могли остаться от другого этапа
+            if [ "$STEP_SKIPPED" = true ]; then
+                KEEP_TESTFILE=false
+                PGBENCH_REUSE=false
+                STEP_SKIPPED=false
             fi
+            RESULTS_DIR="$CAMPAIGN_DIR/$STEP_DIR"
+            STATE_FILE="$RESULTS_DIR/campaign_state.json"
+            mkdir -p "$RESULTS_DIR"
+            echo -e "\n▶️  Этап $step из $PLAN_STEPS: $STEP_NAME"
+            run_iteration $iter
+            precision_reached && PRECISE_STEPS[$step]=$iter
         done
+        if [ -n "$ADAPTIVE_PCT" ] && [ ${#PRECISE_STEPS[@]} -eq "$PLAN_STEPS" ]; then
+            echo -e "\n🎯 Все этапы плана достигли точности ±${ADAPTIVE_PCT}%"
+            break
+        fi
+    else
+        run_iteration $iter
+        if precision_reached; then
+            echo -e "\n🎯 Точность ±${ADAPTIVE_PCT}% достигнута за $iter итераций"
+            break
+        fi
     fi
-    
+
     # Пауза между итерациями (кроме последней)
     if [ $iter -lt $ITERATIONS ]; then
         echo -e "\n⏸️  Пауза 30 секунд перед следующей итерацией..."
         sleep 30
     fi
-done
\ No newline at end of file
+done
+
+# === Итог кампании ===
+if [ -n "$ADAPTIVE_PCT" ] && [ $iter -gt $ITERATIONS ]; then
+    echo -e "\n⚠️  Достигнут максимум итераций ($ITERATIONS), точность ±${ADAPTIVE_PCT}% достигнута не везде (см. precision.json)"
+fi
+echo -e "\n📋 Состояние кампании:"
+if [ -n "$PLAN_FILE" ]; then
+    for STEP_STATE in "$CAMPAIGN_DIR"/*/campaign_state.json; do
+        echo "▶️  $(basename "$(dirname "$STEP_STATE")")"
+        python3 "$CAMPAIGN_STATE" status --state "$STEP_STATE"
+    done
+    echo "Отчеты строятся по каждому этапу: python3 aggregate_results.py $CAMPAIGN_DIR/<этап>"
+else
+    python3 "$CAMPAIGN_STATE" status --state "$STATE_FILE"
+    echo "Отчет можно построить и по частичным результатам: python3 aggregate_results.py $RESULTS_DIR"
+fi
+echo "Продолжение незавершенных единиц: ./run_tests.sh --resume $CAMPAIGN_DIR"
+
+# === 12. Остановка агентов (тестовый файл и база pgbench остаются на ВМ) ===
+if [ "$USE_AGENT" = true ]; then
+    echo -e "\n🤖 Остановка агентов..."
+    for ip in "${VMS[@]}"; do
+        ssh -o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null \
+            "$USER@$ip" "pkill -f '^[^ ]*python3 ./test_fio_7.py --agent' || true"
+    done
+fi
@@ -2,145 +2,90 @@
 """
 Скрипт для визуализации результатов тестирования.
 Создает графики для сравнения результатов между разными конфигурациями.
+
+Каждый график строится только по нужной ему части данных. Отпечаток этой части
+(вместе с параметрами вывода и версией скрипта) хранится в кэше каталога графиков,
+поэтому при повторном запуске перерисовываются только графики с изменившимися
+данными. Оставшиеся графики строятся параллельно в отдельных процессах.
 """
 
 import json
 import sys
 import os
+import time
+import hashlib
 import argparse
 from pathlib import Path
-import matplotlib.pyplot as plt
-import matplotlib
-matplotlib.use('Agg')  # Для работы без GUI
+from concurrent.futures import ProcessPoolExecutor
+
+DEFAULT_OUTPUT_DIR = "visualization_output"
+RENDER_CACHE_FILE = ".render_cache.json"
+
+# Режимы вывода: быстрый просмотр и публикация
+RENDER_MODES = {
+    'preview': {'dpi': 100, 'format': 'png'},
+    'publication': {'dpi': 300, 'format': 'png'},
+}
+
+FIO_METRICS = [
+    # (метрика, файл, подпись оси, заголовок)
+    ('IOPS', 'fio_iops_comparison', 'IOPS (тысячи)', 'Сравнение IOPS между конфигурациями'),
+    ('Bandwidth', 'fio_bandwidth_comparison', 'Bandwidth (MiB/s)', 'Сравнение Bandwidth между конфигурациями'),
+    ('Latency', 'fio_latency_comparison', 'Latency (ms)', 'Сравнение задержки между конфигурациями'),
+]
+
+# Ключевые тесты для анализа масштабируемости
+SCALABILITY_TESTS = ['Sequential Read', 'Sequential Write', 'Random Read', 'Random Write']
 
 def load_aggregated_data(json_file):
     """Загружает агрегированные данные из JSON"""
     with open(json_file, 'r') as f:
         return json.load(f)
 
-def plot_fio_comparison(datasets, output_dir):
-    """Создает графики сравнения FIO тестов"""
-    
-    # Получаем все уникальные имена тестов
-    all_tests = set()
-    for data in datasets.values():
-        if 'fio' in data:
-            all_tests.update(data['fio'].keys())
-    
-    all_tests = sorted(all_tests)
+def pyplot():
+    """matplotlib загружается только в процессе, который действительно рисует"""
+    import matplotlib
+    matplotlib.use('Agg')  # Для работы без GUI
+    import matplotlib.pyplot as plt
+    return plt
+
+def plot_fio_metric(data, output_path, dpi):
+    """Создает график сравнения одной метрики FIO тестов"""
+    plt = pyplot()
+    all_tests = data['tests']
+    series = data['series']
     
-    # График IOPS
     fig, ax = plt.subplots(figsize=(14, 8))
     x = range(len(all_tests))
-    width = 0.8 / len(datasets)
-    
-    for idx, (label, data) in enumerate(datasets.items()):
-        iops_values = []
-        iops_errors = []
-        for test in all_tests:
-            if test in data.get('fio', {}):
-                iops_values.append(data['fio'][test]['IOPS_mean'])
-                iops_errors.append(data['fio'][test]['IOPS_stdev'])
-            else:
-                iops_values.append(0)
-                iops_errors.append(0)
-        
-        offset = width * idx - width * (len(datasets) - 1) / 2
-        ax.bar([i + offset for i in x], iops_values, width, 
-               label=label, yerr=iops_errors, capsize=5, alpha=0.8)
-    
-    ax.set_xlabel('Тип теста', fontsize=12)
-    ax.set_ylabel('IOPS (тысячи)', fontsize=12)
-    ax.set_title('Сравнение IOPS между конфигурациями', fontsize=14, fontweight='bold')
-    ax.set_xticks(x)
-    ax.set_xticklabels([t.replace(' ', '\n') for t in all_tests], rotation=0, ha='center')
-    ax.legend()
-    ax.grid(axis='y', alpha=0.3)
-    
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, 'fio_iops_comparison.png'), dpi=300)
-    plt.close()
-    
-    # График Bandwidth
-    fig, ax = plt.subplots(figsize=(14, 8))
+    width = 0.8 / len(series)
     
-    for idx, (label, data) in enumerate(datasets.items()):
-        bw_values = []
-        bw_errors = []
-        for test in all_tests:
-            if test in data.get('fio', {}):
-                bw_values.append(data['fio'][test]['Bandwidth_mean'])
-                bw_errors.append(data['fio'][test]['Bandwidth_stdev'])
-            else:
-                bw_values.append(0)
-                bw_errors.append(0)
-        
-        offset = width * idx - width * (len(datasets) - 1) / 2
-        ax.bar([i + offset for i in x], bw_values, width,
-               label=label, yerr=bw_errors, capsize=5, alpha=0.8)
+    for idx, (label, values) in enumerate(series):
+        offset = width * idx - width * (len(series) - 1) / 2
+        ax.bar([i + offset for i in x], [mean for mean, _ in values], width,
+               label=label, yerr=[stdev for _, stdev in values], capsize=5, alpha=0.8)
     
     ax.set_xlabel('Тип теста', fontsize=12)
-    ax.set_ylabel('Bandwidth (MiB/s)', fontsize=12)
-    ax.set_title('Сравнение Bandwidth между конфигурациями', fontsize=14, fontweight='bold')
+    ax.set_ylabel(data['ylabel'], fontsize=12)
+    ax.set_title(data['title'], fontsize=14, fontweight='bold')
     ax.set_xticks(x)
     ax.set_xticklabels([t.replace(' ', '\n') for t in all_tests], rotation=0, ha='center')
     ax.legend()
     ax.grid(axis='y', alpha=0.3)
     
     plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, 'fio_bandwidth_comparison.png'), dpi=300)
+    plt.savefig(output_path, dpi=dpi)
     plt.close()
     
-    # График Latency
-    fig, ax = plt.subplots(figsize=(14, 8))
-    
-    for idx, (label, data) in enumerate(datasets.items()):
-        lat_values = []
-        lat_errors = []
-        for test in all_tests:
-            if test in data.get('fio', {}):
-                lat_values.append(data['fio'][test]['Latency_mean'])
-                lat_errors.append(data['fio'][test]['Latency_stdev'])
-            else:
-                lat_values.append(0)
-                lat_errors.append(0)
-        
-        offset = width * idx - width * (len(datasets) - 1) / 2
-        ax.bar([i + offset for i in x], lat_values, width,
-               label=label, yerr=lat_errors, capsize=5, alpha=0.8)
-    
-    ax.set_xlabel('Тип теста', fontsize=12)
-    ax.set_ylabel('Latency (ms)', fontsize=12)
-    ax.set_title('Сравнение задержки между конфигурациями', fontsize=14, fontweight='bold')
-    ax.set_xticks(x)
-    ax.set_xticklabels([t.replace(' ', '\n') for t in all_tests], rotation=0, ha='center')
-    ax.legend()
-    ax.grid(axis='y', alpha=0.3)
-    
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, 'fio_latency_comparison.png'), dpi=300)
-    plt.close()
-    
-    print("✅ Графики FIO созданы")
-
-def plot_pgbench_comparison(datasets, output_dir):
+def plot_pgbench_comparison(data, output_path, dpi):
     """Создает графики сравнения pgbench тестов"""
-    
-    # Фильтруем датасеты с данными pgbench
-    pgbench_data = {label: data for label, data in datasets.items() 
-                    if 'pgbench' in data and data['pgbench']}
-    
-    if not pgbench_data:
-        print("⚠️  Нет данных pgbench для визуализации")
-        return
-    
-    labels = list(pgbench_data.keys())
+    plt = pyplot()
+    labels = [label for label, _ in data]
     
     # График TPS
     fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(16, 6))
     
-    tps_values = [data['pgbench']['TPS_mean'] for data in pgbench_data.values()]
-    tps_errors = [data['pgbench']['TPS_stdev'] for data in pgbench_data.values()]
+    tps_values = [pgbench['TPS_mean'] for _, pgbench in data]
+    tps_errors = [pgbench['TPS_stdev'] for _, pgbench in data]
     
     bars1 = ax1.bar(range(len(labels)), tps_values, yerr=tps_errors, 
                     capsize=10, alpha=0.8, color='steelblue')
@@ -152,15 +97,15 @@ def plot_pgbench_comparison(datasets, output_dir):
     ax1.grid(axis='y', alpha=0.3)
     
     # Добавляем значения над столбцами
-    for i, (bar, val, err) in enumerate(zip(bars1, tps_values, tps_errors)):
+    for bar, val, err in zip(bars1, tps_values, tps_errors):
         height = bar.get_height()
         ax1.text(bar.get_x() + bar.get_width()/2., height + err,
                 f'{val:.0f}\n±{err:.0f}',
                 ha='center', va='bottom', fontsize=9)
     
     # График Latency
-    lat_values = [data['pgbench']['Latency_Avg_mean'] for data in pgbench_data.values()]
-    lat_errors = [data['pgbench']['Latency_Avg_stdev'] for data in pgbench_data.values()]
+    lat_values = [pgbench['Latency_Avg_mean'] for _, pgbench in data]
+    lat_errors = [pgbench['Latency_Avg_stdev'] for _, pgbench in data]
     
     bars2 = ax2.bar(range(len(labels)), lat_values, yerr=lat_errors,
                     capsize=10, alpha=0.8, color='coral')
@@ -172,55 +117,27 @@ def plot_pgbench_comparison(datasets, output_dir):
     ax2.grid(axis='y', alpha=0.3)
     
     # Добавляем значения над столбцами
-    for i, (bar, val, err) in enumerate(zip(bars2, lat_values, lat_errors)):
+    for bar, val, err in zip(bars2, lat_values, lat_errors):
         height = bar.get_height()
         ax2.text(bar.get_x() + bar.get_width()/2., height + err,
                 f'{val:.2f}\n±{err:.2f}',
                 ha='center', va='bottom', fontsize=9)
     
     plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, 'pgbench_comparison.png'), dpi=300)
+    plt.savefig(output_path, dpi=dpi)
     plt.close()
     
-    print("✅ Графики pgbench созданы")
-
-def plot_scalability(datasets, output_dir):
+def plot_scalability(data, output_path, dpi):
     """Создает графики масштабируемости (зависимость от количества ВМ)"""
-    
-    # Группируем по количеству ВМ
-    vm_groups = {}
-    for label, data in datasets.items():
-        num_vms = data.get('num_vms', 1)
-        if num_vms not in vm_groups:
-            vm_groups[num_vms] = []
-        vm_groups[num_vms].append((label, data))
-    
-    if len(vm_groups) < 2:
-        print("⚠️  Недостаточно данных для анализа масштабируемости")
-        return
-    
-    vm_counts = sorted(vm_groups.keys())
-    
-    # Выбираем несколько ключевых тестов для анализа
-    key_tests = ['Sequential Read', 'Sequential Write', 'Random Read', 'Random Write']
+    plt = pyplot()
+    vm_counts = data['vm_counts']
     
     fig, axes = plt.subplots(2, 2, figsize=(16, 12))
     axes = axes.flatten()
     
-    for idx, test_name in enumerate(key_tests):
+    for idx, test_name in enumerate(SCALABILITY_TESTS):
         ax = axes[idx]
-        
-        iops_by_vms = []
-        for vm_count in vm_counts:
-            # Берем среднее по всем датасетам с данным количеством ВМ
-            iops_values = []
-            for label, data in vm_groups[vm_count]:
-                if test_name in data.get('fio', {}):
-                    iops_values.append(data['fio'][test_name]['IOPS_mean'])
-            if iops_values:
-                iops_by_vms.append(sum(iops_values) / len(iops_values))
-            else:
-                iops_by_vms.append(0)
+        iops_by_vms = data['iops'][test_name]
         
         ax.plot(vm_counts, iops_by_vms, marker='o', linewidth=2, markersize=10)
         ax.set_xlabel('Количество ВМ', fontsize=11)
@@ -234,22 +151,188 @@ def plot_scalability(datasets, output_dir):
                        xytext=(0,10), ha='center', fontsize=9)
     
     plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, 'scalability_analysis.png'), dpi=300)
+    plt.savefig(output_path, dpi=dpi)
+    plt.close()
+    
+def plot_openloop_curve(data, output_path, dpi):
+    """Создает график зависимости задержки от предлагаемой нагрузки (open-loop)"""
+    plt = pyplot()
+    
+    fig, ax = plt.subplots(figsize=(14, 8))
+    
+    for label, openloop in data:
+        levels = sorted(openloop.values(), key=lambda level: level['Target_mean'])
+        achieved = [level['Achieved_mean'] for level in levels]
+        
+        line, = ax.plot(achieved, [level['P99_mean'] for level in levels],
+                        marker='o', linewidth=2, label=f'{label} p99')
+        color = line.get_color()
+        ax.plot(achieved, [level['P50_mean'] for level in levels],
+                marker='.', linestyle='--', color=color, alpha=0.7, label=f'{label} p50')
+        ax.plot(achieved, [level['P99_9_mean'] for level in levels],
+                marker='^', linestyle=':', color=color, alpha=0.7, label=f'{label} p99.9')
+        
+        # Ступени, на которых целевая нагрузка не была достигнута, отмечаем крестиком
+        missed = [level for level in levels if level['Met_ratio'] < 1]
+        if missed:
+            ax.scatter([level['Achieved_mean'] for level in missed],
+                       [level['P99_mean'] for level in missed],
+                       marker='x', s=120, color='red', zorder=5)
+    
+    ax.set_xlabel('Достигнутые IOPS', fontsize=12)
+    ax.set_ylabel('Задержка (ms)', fontsize=12)
+    ax.set_yscale('log')
+    ax.set_title('Задержка в зависимости от нагрузки (open-loop)', fontsize=14, fontweight='bold')
+    ax.legend()
+    ax.grid(True, which='both', alpha=0.3)
+    
+    plt.tight_layout()
+    plt.savefig(output_path, dpi=dpi)
     plt.close()
     
-    print("✅ График масштабируемости создан")
+def fio_figures(datasets):
+    """Графики FIO: для каждой метрики средние и отклонения по всем тестам и конфигурациям"""
+    all_tests = sorted({test for data in datasets.values() for test in data.get('fio', {})})
+    if not all_tests:
+        print("⚠️  Нет данных FIO для визуализации")
+        return []
+
+    figures = []
+    for metric, name, ylabel, title in FIO_METRICS:
+        series = []
+        for label, data in datasets.items():
+            fio = data.get('fio', {})
+            series.append([label, [[fio[test][f'{metric}_mean'], fio[test][f'{metric}_stdev']]
+                                   if test in fio else [0, 0] for test in all_tests]])
+        figures.append((name, plot_fio_metric,
+                        {'tests': all_tests, 'series': series, 'ylabel': ylabel, 'title': title}))
+    return figures
+
+def pgbench_figures(datasets):
+    """График pgbench по конфигурациям с данными pgbench"""
+    metrics = ['TPS_mean', 'TPS_stdev', 'Latency_Avg_mean', 'Latency_Avg_stdev']
+    pgbench_data = [[label, {metric: data['pgbench'][metric] for metric in metrics}]
+                    for label, data in datasets.items() if data.get('pgbench')]
+
+    if not pgbench_data:
+        print("⚠️  Нет данных pgbench для визуализации")
+        return []
+    return [('pgbench_comparison', plot_pgbench_comparison, pgbench_data)]
+
+def scalability_figures(datasets):
+    """График масштабируемости: IOPS ключевых тестов по количеству ВМ"""
+    # Группируем по количеству ВМ
+    vm_groups = {}
+    for data in datasets.values():
+        vm_groups.setdefault(data.get('num_vms', 1), []).append(data.get('fio', {}))
+
+    if len(vm_groups) < 2:
+        print("⚠️  Недостаточно данных для анализа масштабируемости")
+        return []
+
+    vm_counts = sorted(vm_groups.keys())
+    iops = {}
+    for test_name in SCALABILITY_TESTS:
+        iops[test_name] = []
+        for vm_count in vm_counts:
+            # Берем среднее по всем датасетам с данным количеством ВМ
+            iops_values = [fio[test_name]['IOPS_mean'] for fio in vm_groups[vm_count] if test_name in fio]
+            iops[test_name].append(sum(iops_values) / len(iops_values) if iops_values else 0)
+    return [('scalability_analysis', plot_scalability, {'vm_counts': vm_counts, 'iops': iops})]
+
+def openloop_figures(datasets):
+    """График задержки от нагрузки по конфигурациям с данными open-loop"""
+    openloop_data = [[label, data['openloop']] for label, data in datasets.items() if data.get('openloop')]
+
+    if not openloop_data:
+        print("⚠️  Нет данных открытой нагрузки для визуализации")
+        return []
+    return [('openloop_latency_curve', plot_openloop_curve, openloop_data)]
+
+def figure_fingerprint(name, data, options):
+    """Отпечаток входных данных графика и параметров вывода"""
+    payload = json.dumps({'figure': name, 'data': data, 'options': options}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def load_render_cache(output_dir):
+    """Отпечатки ранее построенных графиков: {файл: отпечаток}"""
+    try:
+        with open(os.path.join(output_dir, RENDER_CACHE_FILE), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_render_cache(output_dir, cache):
+    with open(os.path.join(output_dir, RENDER_CACHE_FILE), 'w') as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+
+def render_figure(render, data, output_path, dpi):
+    """Строит один график (выполняется в процессе пула)"""
+    started = time.perf_counter()
+    render(data, output_path, dpi)
+    return time.perf_counter() - started
+
+def render_figures(figures, output_dir, options, jobs, force=False):
+    """Строит графики с устаревшим кэшем; возвращает (перерисовано, без изменений, ошибок)"""
+    cache = load_render_cache(output_dir)
+    pending = []
+    skipped = 0
+    for name, render, data in figures:
+        filename = f"{name}.{options['format']}"
+        fingerprint = figure_fingerprint(name, data, options)
+        if not force and cache.get(filename) == fingerprint and os.path.exists(os.path.join(output_dir, filename)):
+            print(f"  ⏭️  {filename}: данные не изменились")
+            skipped += 1
+            continue
+        pending.append((filename, fingerprint, render, data))
+
+    failed = 0
+    if pending:
+        workers = max(1, min(jobs, len(pending)))
+        # Один график быстрее построить в текущем процессе, без запуска пула
+        executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        try:
+            futures = []
+            for filename, fingerprint, render, data in pending:
+                args = (render, data, os.path.join(output_dir, filename), options['dpi'])
+                futures.append((filename, fingerprint,
+                                executor.submit(render_figure, *args) if executor else None, args))
+            for filename, fingerprint, future, args in futures:
+                try:
+                    elapsed = future.result() if future else render_figure(*args)
+                except Exception as e:
+                    print(f"  ❌ {filename}: {e}")
+                    cache.pop(filename, None)
+                    failed += 1
+                    continue
+                cache[filename] = fingerprint
+                print(f"  ✅ {filename} ({elapsed:.1f} сек)")
+        finally:
+            if executor:
+                executor.shutdown()
+        save_render_cache(output_dir, cache)
+    return len(pending) - failed, skipped, failed
 
 def main():
-    if len(sys.argv) < 2:
-        print("Использование: python3 visualize_results.py <json_файл1> [json_файл2] ...")
-        print("\nПример:")
-        print("  python3 visualize_results.py results/*/aggregated_report.json")
-        print("  python3 visualize_results.py storage1.json storage2.json")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(
+        description="Графики сравнения результатов между конфигурациями",
+        epilog="Пример: python3 visualize_results.py results/*/aggregated_report.json")
+    parser.add_argument('json_files', nargs='+', metavar='JSON', help="Файлы aggregated_report.json")
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR,
+                        help=f"Каталог для графиков (по умолчанию {DEFAULT_OUTPUT_DIR})")
+    parser.add_argument('--mode', choices=list(RENDER_MODES), default='publication',
+                        help="preview - быстрый просмотр (100 dpi), publication - для публикации (300 dpi); "
+                             "по умолчанию publication")
+    parser.add_argument('--format', choices=['png', 'svg', 'pdf'],
+                        help="Формат файлов (по умолчанию png; svg удобен для быстрого просмотра)")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1,
+                        help="Число процессов для построения графиков (по умолчанию - число CPU)")
+    parser.add_argument('--force', action='store_true', help="Перерисовать все графики, не используя кэш")
+    args = parser.parse_args()
     
     # Загружаем все JSON файлы
     datasets = {}
-    for json_path in sys.argv[1:]:
+    for json_path in args.json_files:
         if not os.path.exists(json_path):
             print(f"⚠️  Файл не найден: {json_path}")
             continue
@@ -268,23 +351,31 @@ def main():
         print("❌ Не удалось загрузить данные")
         sys.exit(1)
     
+    options = dict(RENDER_MODES[args.mode])
+    if args.format:
+        options['format'] = args.format
+    # Изменение самого скрипта (оформление графиков) делает кэш недействительным
+    options['script'] = hashlib.sha256(Path(__file__).read_bytes()).hexdigest()
+
     # Создаем директорию для графиков
-    output_dir = "visualization_output"
+    output_dir = args.output_dir
     os.makedirs(output_dir, exist_ok=True)
     
-    print(f"\n📊 Создание графиков в: {output_dir}/")
+    print(f"\n📊 Создание графиков в: {output_dir}/ (режим {args.mode}, {options['format']}, {options['dpi']} dpi)")
     
-    # Создаем графики
-    plot_fio_comparison(datasets, output_dir)
-    plot_pgbench_comparison(datasets, output_dir)
-    plot_scalability(datasets, output_dir)
+    started = time.perf_counter()
+    figures = (fio_figures(datasets) + pgbench_figures(datasets) +
+               scalability_figures(datasets) + openloop_figures(datasets))
+    rendered, skipped, failed = render_figures(figures, output_dir, options, args.jobs, args.force)
     
-    print(f"\n✅ Визуализация завершена!")
+    print(f"\n{'❌' if failed else '✅'} Визуализация завершена за {time.perf_counter() - started:.1f} сек: "
+          f"перерисовано {rendered}, без изменений {skipped}, ошибок {failed}")
     print(f"📁 Графики сохранены в: {output_dir}/")
-    print("\nСозданные файлы:")
-    for file in sorted(os.listdir(output_dir)):
-        if file.endswith('.png'):
-            print(f"  • {file}")
+    print("\nГрафики:")
+    for name, _, _ in figures:
+        print(f"  • {name}.{options['format']}")
+    if failed:
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Проверка разборщиков вывода fio, pgbench и results_sheet на эталонном наборе выводов
+(parser_corpus/: разные версии fio и PostgreSQL, единицы задержки nsec/usec/msec,
+чистые и смешанные нагрузки), а также сводки трасс blktrace и fio iolog для режима replay.
+Ожидаемые значения - parser_corpus/expected.json.
+
+С --bench дополнительно измеряются скорость разбора и пиковая память на больших
+синтетических входах (вывод fio без group_reporting, журнал задержки, results_sheet,
+трасса blktrace).
+Код возврата 1, если хотя бы одно значение разобрано неверно.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import struct
+import argparse
+import tempfile
+import tracemalloc
+import contextlib
+import io
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+CORPUS_DIR = os.path.join(SCRIPT_DIR, "parser_corpus")
+sys.path.insert(0, SCRIPT_DIR)
+sys.path.insert(0, os.path.join(SCRIPT_DIR, "..", "control"))
+
+import test_fio_7
+import aggregate_results
+
+FLOAT_TOLERANCE = 1e-6
+BENCH_FIO_JOBS = 2000
+BENCH_LAT_LOG_LINES = 1_000_000
+BENCH_SHEET_ROWS = 20000
+BENCH_TRACE_EVENTS = 1_000_000
+
+def parse_corpus_file(name, case):
+    """Разбирает файл набора разборщиком, указанным в описании случая"""
+    path = os.path.join(CORPUS_DIR, name)
+    parser = case["parser"]
+    if parser == "fio":
+        return test_fio_7.parse_fio_results(path, is_mixed=case.get("mixed", False))
+    if parser == "fio_jobs":
+        return test_fio_7.parse_fio_jobs(path)
+    if parser == "sync":
+        return test_fio_7.parse_sync_latency(path, case["method"])
+    if parser == "pgbench":
+        with open(path, 'r') as f:
+            return test_fio_7.parse_pgbench_output(f.read())
+    if parser == "results_sheet":
+        return aggregate_results.parse_results_sheet(path)
+    if parser == "trace":
+        return test_fio_7.summarize_trace(path)
+    raise ValueError(f"неизвестный разборщик: {parser}")
+
+def compare(expected, actual, path=""):
+    """Сравнивает ожидаемые значения с разобранными; возвращает список расхождений.
+
+    Сравниваются только ключи из expected; числа - с допуском, строки - точно.
+    """
+    if isinstance(expected, dict):
+        if not isinstance(actual, dict):
+            return [f"{path}: ожидался словарь, получено {actual!r}"]
+        mismatches = []
+        for key, value in expected.items():
+            if key not in actual:
+                mismatches.append(f"{path}/{key}: нет в результате")
+                continue
+            mismatches.extend(compare(value, actual[key], f"{path}/{key}"))
+        return mismatches
+    if isinstance(expected, (int, float)) and not isinstance(expected, bool) and isinstance(actual, (int, float)):
+        if abs(expected - actual) > FLOAT_TOLERANCE * max(1.0, abs(expected)):
+            return [f"{path}: ожидалось {expected}, получено {actual}"]
+        return []
+    if expected != actual:
+        return [f"{path}: ожидалось {expected!r}, получено {actual!r}"]
+    return []
+
+def check_corpus(verbose=False):
+    """Проверяет все файлы набора; возвращает число файлов с расхождениями"""
+    with open(os.path.join(CORPUS_DIR, "expected.json"), 'r') as f:
+        cases = json.load(f)
+
+    unlisted = sorted(set(os.listdir(CORPUS_DIR)) - set(cases) - {"expected.json"})
+    for name in unlisted:
+        print(f"⚠️  {name}: нет ожидаемых значений в expected.json")
+
+    failed = 0
+    for name, case in cases.items():
+        # Разборщики сообщают об ошибках через print; сообщения показываются только при расхождении
+        messages = io.StringIO()
+        with contextlib.redirect_stdout(messages):
+            actual = parse_corpus_file(name, case)
+        mismatches = compare(case["expected"], actual)
+        for key in case.get("exact_keys", []):
+            extra = sorted(set(actual.get(key, {})) - set(case["expected"].get(key, {})))
+            if extra:
+                mismatches.append(f"/{key}: лишние записи {extra}")
+        if mismatches:
+            failed += 1
+            print(f"❌ {name}")
+            for mismatch in mismatches:
+                print(f"     {mismatch}")
+            if messages.getvalue():
+                print(f"     вывод разборщика: {messages.getvalue().strip()}")
+        elif verbose:
+            print(f"✅ {name}")
+
+    print(f"\nПроверено файлов: {len(cases)}, с расхождениями: {failed}")
+    return failed
+
+def measure(label, func, path):
+    """Выполняет func(path), выводит скорость разбора (MiB/s) и пиковую память.
+
+    Время и память измеряются отдельными прогонами: tracemalloc замедляет разбор в разы.
+    """
+    size = os.path.getsize(path)
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        func(path)
+        elapsed = time.perf_counter() - started
+        tracemalloc.start()
+        func(path)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    print("{:<34} {:>10.1f} {:>10.2f} {:>12.1f} {:>14.1f}".format(
+        label, size / 1024 ** 2, elapsed, size / 1024 ** 2 / elapsed, peak / 1024 ** 2))
+
+def write_fio_jobs_file(path, jobs):
+    """Вывод fio без group_reporting с jobs секциями заданий (из секции pg_data набора)"""
+    with open(os.path.join(CORPUS_DIR, "fio-3.33_no_group_pg_profile.txt"), 'r') as f:
+        content = f.read()
+    section = content[content.index("pg_data: (groupid="):content.index("pg_wal: (groupid=")]
+    with open(path, 'w') as f:
+        f.write("fio-3.33\nStarting %d processes\n\n" % jobs)
+        for job in range(jobs):
+            f.write(section.replace("pg_data:", f"job_{job}:", 1))
+        f.write(content[content.index("Run status group"):])
+
+def write_latency_log(path, lines):
+    """Журнал задержки fio (время, мс; задержка, нс; направление; размер блока; смещение)"""
+    rng = random.Random(1)
+    with open(path, 'w') as f:
+        for line in range(lines):
+            f.write(f"{line // 50}, {int(rng.lognormvariate(12, 0.6))}, {line % 2}, 4096, 0\n")
+
+def write_results_sheet(path, rows):
+    """results_sheet с rows строками основной таблицы, сформированный print_results_table"""
+    parsed = test_fio_7.parse_fio_results(os.path.join(CORPUS_DIR, "fio-3.33_randread_4k_usec.txt"))
+    results = [test_fio_7.result_row(row + 1, f"Random Read 4K job {row}", parsed) for row in range(rows)]
+    test_params = {"start_time": "2025-11-11 14:00:02", "test_name": "bench", "size": 100, "bs": "4k",
+                   "mix": 40, "io_depth": 64, "runtime": 60}
+    with contextlib.redirect_stdout(io.StringIO()):
+        test_fio_7.print_results_table(results, test_params, output_file=path)
+
+def write_blktrace(path, events):
+    """Трасса blktrace: на каждую операцию события Q, D и C, как у реального устройства"""
+    event = struct.Struct("<" + test_fio_7.BLKTRACE_EVENT)
+    magic = test_fio_7.BLKTRACE_MAGIC | 7
+    rng = random.Random(1)
+    with open(path, 'wb') as f:
+        for index in range(0, events, 3):
+            action = rng.choice([1, 2]) << test_fio_7.BLK_TC_SHIFT
+            sector = rng.randrange(0, 2 ** 24) * 16
+            for offset, kind in enumerate((test_fio_7.BLK_TA_QUEUE, 7, 8)):
+                f.write(event.pack(magic, index + offset, index * 1000 + offset, sector, 8192,
+                                   action | kind, 1, 0, 0, 0, 0))
+
+def run_benchmarks(jobs=BENCH_FIO_JOBS, log_lines=BENCH_LAT_LOG_LINES, sheet_rows=BENCH_SHEET_ROWS,
+                   trace_events=BENCH_TRACE_EVENTS):
+    """Скорость и память разбора больших входов"""
+    print("\nСкорость разбора больших входов:")
+    columns = "{:<40} {:>10} {:>10} {:>12} {:>14}".format(
+        "Parser", "Size (MiB)", "Time (s)", "Speed (MiB/s)", "Peak Mem (MiB)")
+    print("=" * len(columns))
+    print(columns)
+    print("_" * len(columns))
+    with tempfile.TemporaryDirectory() as tmp:
+        fio_path = os.path.join(tmp, "fio_jobs.txt")
+        write_fio_jobs_file(fio_path, jobs)
+        measure(f"parse_fio_jobs ({jobs} заданий)", test_fio_7.parse_fio_jobs, fio_path)
+
+        log_path = os.path.join(tmp, "lat_log.log")
+        write_latency_log(log_path, log_lines)
+        measure(f"summarize_latency_log ({log_lines} строк)", test_fio_7.summarize_latency_log, log_path)
+
+        sheet_path = os.path.join(tmp, "results_sheet.txt")
+        write_results_sheet(sheet_path, sheet_rows)
+        measure(f"parse_results_sheet ({sheet_rows} строк)", aggregate_results.parse_results_sheet, sheet_path)
+
+        trace_path = os.path.join(tmp, "trace.bin")
+        write_blktrace(trace_path, trace_events)
+        measure(f"summarize_trace ({trace_events} событий)", test_fio_7.summarize_trace, trace_path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка разборщиков на эталонном наборе выводов fio и pgbench")
+    parser.add_argument('--bench', action='store_true', help="Измерить скорость и память разбора больших входов")
+    parser.add_argument('--verbose', action='store_true', help="Выводить также успешно проверенные файлы")
+    args = parser.parse_args()
+
+    failed = check_corpus(args.verbose)
+    if args.bench:
+        run_benchmarks()
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
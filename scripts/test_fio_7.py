@@ -1,18 +1,183 @@
 #!/usr/bin/env python3
 
+import hashlib
+import io
+import json
+import math
+import mmap
 import re
+import shlex
 import subprocess
 import os
 import time
+import urllib.parse
 from datetime import datetime
 import argparse
+import collections
+import socket
+import stat
+import struct
 import sys
+import tarfile
+import threading
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
 # Параметры тестирования по умолчанию
 DEFAULT_SIZE = "10G"
 DEFAULT_BS = "4k"
 DEFAULT_MIX = "60"
 DEFAULT_IO_DEPTH = 64
+DEFAULT_NUMJOBS = 4
+DEFAULT_IO_ENGINE = "libaio"
+CPU_PINNING_POLICIES = ["none", "spread", "compact", "numa"]
+
+# Шаблоны данных для СХД с inline-компрессией и дедупликацией.
+# random - поведение fio по умолчанию (случайные данные, scramble_buffers), худший случай для СХД.
+DEFAULT_DATA_PATTERN = "random"
+DATA_PATTERNS = {
+    "random": {},
+    "zero": {"zero_buffers": 1},
+    "compress50": {"buffer_compress_percentage": 50, "buffer_compress_chunk": 4096, "refill_buffers": 1},
+    "compress75": {"buffer_compress_percentage": 75, "buffer_compress_chunk": 4096, "refill_buffers": 1},
+    "dedupe50": {"dedupe_percentage": 50, "refill_buffers": 1},
+    "reducible": {"buffer_compress_percentage": 50, "buffer_compress_chunk": 4096,
+                  "dedupe_percentage": 30, "refill_buffers": 1},
+    # Параметры профиля postgres вычисляются по реальному каталогу данных (calibrate_data_pattern)
+    "postgres": None,
+}
+DEFAULT_CALIBRATION_BLOCKS = 20000
+
+# Движки ввода-вывода fio и их варианты (параметры передаются в fio как есть)
+IO_ENGINES = {
+    "libaio": {"ioengine": "libaio"},
+    "io_uring": {"ioengine": "io_uring"},
+    "io_uring-fixedbufs": {"ioengine": "io_uring", "fixedbufs": 1},
+    "io_uring-registerfiles": {"ioengine": "io_uring", "registerfiles": 1},
+    "io_uring-sqpoll": {"ioengine": "io_uring", "sqthread_poll": 1},
+    "io_uring-hipri": {"ioengine": "io_uring", "hipri": 1},
+    "psync": {"ioengine": "psync"},
+    "pvsync2": {"ioengine": "pvsync2"},
+}
+
+# Параметры профиля "postgres" по умолчанию
+DEFAULT_PG_RUNTIME = 120
+DEFAULT_PG_READ_PCT = "70"
+DEFAULT_PG_WAL_SIZE = "1G"
+DEFAULT_PG_COMMIT_GROUP = 4
+DEFAULT_PG_CHECKPOINT_INTERVAL = 30
+DEFAULT_PG_CHECKPOINT_MB = 128
+PG_BLOCK_SIZE = "8k"
+
+# Параметры pgbench по умолчанию
+DEFAULT_PGBENCH_SCALE = 100
+DEFAULT_PGBENCH_CLIENTS = 32
+DEFAULT_PGBENCH_JOBS = 4
+DEFAULT_PGBENCH_DURATION = 600
+PG_STAT_TOP_STATEMENTS = 5
+
+# Параметры фоновой нагрузки fio в режиме interference
+DEFAULT_BG_RW = "randread"
+DEFAULT_BG_BS = "4k"
+DEFAULT_BG_RATE = 5000
+DEFAULT_BG_IO_DEPTH = 16
+DEFAULT_BG_WARMUP = 10
+
+# Параметры открытой (open-loop) нагрузки: уровни в процентах от пиковых IOPS
+DEFAULT_OPENLOOP_LEVELS = "10,20,30,40,50,60,70,80,90"
+DEFAULT_OPENLOOP_RUNTIME = 60
+OPENLOOP_TOLERANCE = 0.95
+
+# Параметры поиска максимальных IOPS при ограничении задержки (SLO)
+DEFAULT_SLO_PERCENTILE = 99.0
+DEFAULT_SLO_LATENCY_MS = 2.0
+DEFAULT_SLO_STEPS = 6
+DEFAULT_SLO_RUNTIME = 60
+SLO_LATENCY_WINDOW_USEC = 5_000_000
+
+# Параметры предкондиционирования (SNIA PTS) и прохода по размеру рабочего набора
+DEFAULT_PRECONDITION_ROUND = 60
+DEFAULT_PRECONDITION_MAX_ROUNDS = 25
+PRECONDITION_WINDOW = 5
+DEFAULT_SWEEP_SIZES = "1G,2G,4G,8G,16G,32G,64G,128G"
+DEFAULT_SWEEP_PHASES = "randread,randwrite"
+SWEEP_CLIFF_DROP = 0.3
+SWEEP_CLIFF_LATENCY = 2.0
+
+# Длительная нагрузка (soak): fio выводит накопленную гистограмму задержки (json+) каждые
+# DEFAULT_SOAK_INTERVAL сек, скрипт хранит только гистограммы фиксированного размера
+DEFAULT_SOAK_HOURS = 24
+DEFAULT_SOAK_PHASE = "randrw"
+DEFAULT_SOAK_INTERVAL = 10
+DEFAULT_SOAK_WINDOW = 300
+DEFAULT_SOAK_SUMMARY_INTERVAL = 3600
+DEFAULT_SOAK_KEEP = 24
+SOAK_PERCENTILES = [50, 99, 99.9]
+
+# Буферизованный ввод-вывод (direct=0) и управление состоянием кэша страниц перед этапом:
+# cold - сброс кэша, warm - сброс и прогрев заданной доли тестового файла
+IO_MODES = {"direct": 1, "buffered": 0}
+CACHE_STATES = ["cold", "warm"]
+DEFAULT_PREWARM_PCT = 100
+PREWARM_CHUNK = 1024 * 1024
+VMSTAT_SAMPLE_INTERVAL = 1.0
+
+# Журналы задержки fio (каталог внутри results/) и их сводка на ВМ перед сбором
+LATENCY_LOG_DIR = "logs"
+LATENCY_LOG_MODES = {
+    "off": None,
+    "avg": {"log_avg_msec": 1000},  # посекундные средние
+    "raw": {"log_avg_msec": 0},     # каждая операция ввода-вывода
+}
+LATENCY_BUCKETS_PER_OCTAVE = 8
+LATENCY_SUMMARY_PERCENTILES = [50, 90, 99, 99.9, 99.99]
+
+# Цели ввода-вывода (--target имя=путь): каталог, файл или блочное устройство.
+# Цели data и wal занимают профиль postgres (файлы данных и WAL), wal - также тест синхронной записи
+PG_DATA_TARGET = "data"
+PG_WAL_TARGET = "wal"
+
+# Запись и воспроизведение трасс блочного ввода-вывода (режимы capture и replay).
+# capture записывает blktrace устройства в каталог трассы, объединенную трассу fio
+# воспроизводит через read_iolog; replay принимает также журналы fio (iolog v2/v3)
+DEFAULT_CAPTURE_SECONDS = 300
+TRACE_DIR = "traces"
+TRACE_NAME = "trace"
+TRACE_FILE = "trace.bin"
+TRACE_INFO_FILE = "trace.json"
+DEFAULT_REPLAY_SPEED = "1"
+SECTOR_SIZE = 512
+# Уменьшенные смещения выравниваются для direct=1 на устройствах с сектором 4k
+REPLAY_ALIGN = 4096
+# Формат событий blktrace (struct blk_io_trace) и коды действий из linux/blktrace_api.h
+BLKTRACE_MAGIC = 0x65617400
+BLKTRACE_EVENT = "IIQQIIIIIHH"
+BLK_TC_SHIFT = 16
+BLK_TC_WRITE = 1 << 1
+BLK_TC_DISCARD = 1 << 13
+BLK_TC_NOTIFY = 1 << 10
+BLK_TA_QUEUE = 1
+
+# Параметры агента (постоянный HTTP-сервис на ВМ, принимающий задания)
+DEFAULT_AGENT_BIND = "127.0.0.1"
+DEFAULT_AGENT_PORT = 8765
+AGENT_MAX_START_DELAY = 600
+AGENT_LOOPBACK = ("127.0.0.1", "localhost", "::1")
+# Параметры, недопустимые в заданиях агента: запуск произвольных команд (--capture-command, --bg-host),
+# вывод архива вместо теста (--pack-*) и настройки самого агента (--agent*)
+AGENT_FORBIDDEN_ARGS = ("--capture-command", "--bg-host")
+AGENT_FORBIDDEN_PREFIXES = ("--agent", "--pack-")
+
+# Параметры теста задержки синхронной записи (аналог pg_test_fsync)
+DEFAULT_SYNC_SIZES = "2k,4k,8k,16k,64k"
+DEFAULT_SYNC_METHOD = "fdatasync"
+DEFAULT_SYNC_RUNTIME = 30
+DEFAULT_SYNC_FILE_SIZE = "1G"
+SYNC_METHODS = {
+    "fdatasync": {"fdatasync": 1},
+    "fsync": {"fsync": 1},
+    "dsync": {"sync": "dsync"},
+}
 
 def convert_to_msec(value, unit):
     """Конвертирует значение в миллисекунды с проверкой единиц"""
@@ -59,19 +224,161 @@ def create_directory(directory):
         os.makedirs(directory)
         print(f"Создана директория: {directory}")
 
-def run_fio_test(test_name, filename, size, rw, bs, rwmixwrite=None, results_dir=None, 
-                io_depth=DEFAULT_IO_DEPTH, runtime=None, test_suite_name="default_test"):
-    # Обрабатываем названия для использования в имени файла
-    def sanitize_filename(name):
-        return re.sub(r'[^\w-]', '_', name).strip('_')[:50]
-    
-    test_suite_safe = sanitize_filename(test_suite_name)
-    test_name_safe = sanitize_filename(test_name)
-    
-    base_filename = f"{test_name_safe}_{test_suite_safe}"
-    output_file = os.path.join(results_dir, f"{base_filename}_results.txt")
-    latency_log = os.path.join(results_dir, f"{base_filename}_latency.log")
-    
+def sanitize_filename(name):
+    """Приводит название к виду, пригодному для имени файла"""
+    return re.sub(r'[^\w-]', '_', name).strip('_')[:50]
+
+def fio_output_file(test_name, results_dir, test_suite_name):
+    """Путь к файлу с выводом fio для указанного теста"""
+    base_filename = f"{sanitize_filename(test_name)}_{sanitize_filename(test_suite_name)}"
+    return os.path.join(results_dir, f"{base_filename}_results.txt")
+
+def fio_option_value(option, value, test_name):
+    """Значение общего параметра fio для этапа: каталог write_lat_log становится префиксом журналов этапа"""
+    if option == 'write_lat_log':
+        return os.path.join(value, sanitize_filename(test_name))
+    return value
+
+def cpu_pinning_options(policy, numjobs, cpus_allowed=None, numa_node=0):
+    """Параметры fio для привязки заданий к CPU.
+
+    - none: без привязки (планировщик ОС)
+    - spread: каждое задание на своем CPU из всех доступных (cpus_allowed_policy=split)
+    - compact: задания на первых numjobs CPU, по одному на CPU
+    - numa: задания ограничены CPU указанного NUMA-узла (numa_cpu_nodes, нужна поддержка libnuma в fio)
+    Явно заданный список cpus_allowed (например "0-3,8") имеет приоритет над spread/compact.
+    """
+    if policy == "numa":
+        return {"numa_cpu_nodes": numa_node}
+    if policy == "none" and not cpus_allowed:
+        return {}
+    if not cpus_allowed:
+        cpu_count = os.cpu_count() or 1
+        last_cpu = cpu_count - 1 if policy == "spread" else min(numjobs, cpu_count) - 1
+        cpus_allowed = f"0-{last_cpu}"
+    return {"cpus_allowed": cpus_allowed, "cpus_allowed_policy": "split"}
+
+def parse_targets(specs, home_dir):
+    """Разбирает значения --target имя=путь в список целей {"name", "path", "kind"}.
+
+    kind: dir (тестовые файлы создаются в каталоге), file (заданный файл) или device (блочное
+    устройство). Путь без имени получает имя по порядку (t1, t2, ...). Без --target
+    единственная цель - каталог home_dir.
+    """
+    if not specs:
+        return [{"name": "home", "path": home_dir, "kind": "dir"}]
+    targets = []
+    for index, spec in enumerate(specs, start=1):
+        name, separator, path = spec.partition('=')
+        if not separator:
+            name, path = f"t{index}", spec
+        name, path = name.strip(), os.path.expanduser(path.strip())
+        if not re.fullmatch(r'[\w-]+', name) or not path:
+            raise ValueError(f"некорректная цель {spec!r} (ожидается имя=путь)")
+        if any(target['name'] == name for target in targets):
+            raise ValueError(f"цель {name} задана несколько раз")
+        if os.path.isdir(path):
+            kind = "dir"
+        elif os.path.exists(path) and stat.S_ISBLK(os.stat(path).st_mode):
+            kind = "device"
+        elif os.path.isdir(os.path.dirname(os.path.abspath(path))):
+            kind = "file"
+        else:
+            raise ValueError(f"цель {name}: каталог {os.path.dirname(os.path.abspath(path))} не существует")
+        targets.append({"name": name, "path": path, "kind": kind})
+    return targets
+
+def target_file(target, filename='testfile'):
+    """Путь для fio: файл filename в каталоге цели, либо сам файл или устройство цели"""
+    return os.path.join(target['path'], filename) if target['kind'] == 'dir' else target['path']
+
+def block_device_bytes(device):
+    """Размер блочного устройства в байтах по /sys/class/block или None"""
+    name = os.path.basename(os.path.realpath(device))
+    try:
+        with open(os.path.join('/sys/class/block', name, 'size'), 'r') as f:
+            return int(f.read()) * SECTOR_SIZE
+    except (OSError, ValueError):
+        return None
+
+def raw_device_problems(device, size):
+    """Проверки перед записью на блочное устройство: список причин, по которым запись небезопасна.
+
+    Устройство и его разделы не должны быть смонтированы, использоваться как swap или входить
+    в LVM/md/dm; на устройстве не должно быть разделов и сигнатур файловых систем;
+    тестовая область не должна превышать размер устройства.
+    """
+    name = os.path.basename(os.path.realpath(device))
+    sys_dir = os.path.join('/sys/class/block', name)
+    try:
+        partitions = sorted(entry for entry in os.listdir(sys_dir)
+                            if os.path.exists(os.path.join(sys_dir, entry, 'partition')))
+    except OSError:
+        return [f"нет сведений об устройстве в {sys_dir}"]
+
+    problems = []
+    names = {name, *partitions}
+    if partitions:
+        problems.append(f"на устройстве есть разделы: {', '.join(partitions)}")
+    for table, usage in (('/proc/mounts', "смонтирован в"), ('/proc/swaps', "используется как swap")):
+        try:
+            with open(table, 'r') as f:
+                for line in f:
+                    fields = line.split()
+                    if fields and fields[0].startswith('/dev/') \
+                            and os.path.basename(os.path.realpath(fields[0])) in names:
+                        where = f" {fields[1]}" if table == '/proc/mounts' else ""
+                        problems.append(f"{fields[0]} {usage}{where}")
+        except OSError:
+            pass
+    for part in sorted(names):
+        holders_dir = os.path.join('/sys/class/block', part, 'holders')
+        holders = os.listdir(holders_dir) if os.path.isdir(holders_dir) else []
+        if holders:
+            problems.append(f"{part} используется устройствами {', '.join(holders)} (LVM/md/dm)")
+
+    # blkid -p читает сигнатуры с самого устройства (код 2 - сигнатур нет)
+    try:
+        result = subprocess.run(['blkid', '-p', '-o', 'export', device], capture_output=True, text=True)
+        found = dict(line.split('=', 1) for line in result.stdout.splitlines() if '=' in line)
+        signature = found.get("TYPE") or found.get("PTTYPE")
+        if result.returncode == 0 and signature:
+            problems.append(f"найдена сигнатура {signature} (если данные не нужны: wipefs -a {device})")
+    except FileNotFoundError:
+        print("⚠️  blkid не найден, сигнатуры файловых систем на устройстве не проверены")
+
+    device_bytes = block_device_bytes(device)
+    try:
+        if device_bytes is not None and parse_size(size) > device_bytes:
+            problems.append(f"размер теста {size} больше размера устройства ({device_bytes / 1024 ** 3:.1f} GiB)")
+    except ValueError:
+        pass
+    return problems
+
+def check_targets(targets, size, allow_raw_device=False):
+    """Проверяет цели перед запуском; False, если запись хотя бы на одну цель небезопасна"""
+    ok = True
+    for target in targets:
+        if target['kind'] != 'device':
+            continue
+        if not allow_raw_device:
+            print(f"❌ Цель {target['name']}: {target['path']} - блочное устройство, данные на нем будут "
+                  f"перезаписаны. Для подтверждения укажите --allow-raw-device")
+            ok = False
+            continue
+        for problem in raw_device_problems(target['path'], size):
+            print(f"❌ Цель {target['name']} ({target['path']}): {problem}")
+            ok = False
+    return ok
+
+def build_fio_command(test_name, filename, size, rw, bs, output_file=None, rwmixwrite=None,
+                      io_depth=DEFAULT_IO_DEPTH, runtime=None, ioengine=DEFAULT_IO_ENGINE,
+                      extra_options=None, numjobs=DEFAULT_NUMJOBS, job_options=None,
+                      group_reporting=True, output_format="normal"):
+    """Формирует командную строку fio для одного этапа.
+
+    Без output_file fio выводит результаты в stdout (используется для фоновой нагрузки и режима soak).
+    """
     command = [
         'fio',
         '--name=' + test_name,
@@ -79,24 +386,119 @@ def run_fio_test(test_name, filename, size, rw, bs, rwmixwrite=None, results_dir
         '--size=' + size,
         '--rw=' + rw,
         '--bs=' + bs,
-        '--direct=1',
-        '--ioengine=libaio',
+        # Буферизованный режим задается через job_options (direct=0)
+        *([] if 'direct' in (job_options or {}) else ['--direct=1']),
+        *[f'--{option}={value}' for option, value in IO_ENGINES[ioengine].items()],
         '--iodepth=' + str(io_depth),
-        '--numjobs=4',
-        '--group_reporting',
-        '--output=' + output_file,
-        '--output-format=normal',
+        '--numjobs=' + str(numjobs),
+        *(['--output=' + output_file] if output_file else []),
+        '--output-format=' + output_format,
         '--lat_percentiles=1',
-#        '--write_lat_log=' + os.path.join(results_dir, f"{test_name_safe}_latency.log"),
         '--log_avg_msec=1000',
         '--disable_clat=0'
     ]
     
+    # Без group_reporting fio выводит результаты каждого задания отдельно
+    if group_reporting:
+        command.append('--group_reporting')
+
     if runtime is not None:
         command.extend(['--runtime=' + str(runtime), '--time_based'])
     
+    # Общие параметры заданий: привязка к CPU / NUMA-узлам, шаблон данных
+    for option, value in (job_options or {}).items():
+        command.append(f'--{option}={fio_option_value(option, value, test_name)}')
+
     if rwmixwrite is not None:
         command.append('--rwmixwrite=' + str(rwmixwrite))
+
+    # Дополнительные параметры fio для специальных режимов (ограничение скорости и т.п.)
+    for option, value in (extra_options or {}).items():
+        command.append(f'--{option}={value}')
+
+    return command
+
+def calibrate_data_pattern(pgdata, max_blocks=DEFAULT_CALIBRATION_BLOCKS, block_size=8192):
+    """Оценивает сжимаемость и дедуплицируемость каталога данных PostgreSQL.
+
+    Из файлов каталога равномерно выбирается до max_blocks страниц по 8k. Сжимаемость - средняя
+    экономия zlib по страницам, дедупликация - доля страниц, совпадающих с уже встреченными
+    (включая пустые). Возвращает параметры fio для шаблона данных и сводку или (None, None).
+    """
+    files = []
+    for root, _, names in os.walk(pgdata):
+        for name in names:
+            path = os.path.join(root, name)
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                continue
+            if size >= block_size:
+                files.append((path, size // block_size))
+
+    total_blocks = sum(blocks for _, blocks in files)
+    if not total_blocks:
+        print(f"❌ В каталоге {pgdata} нет доступных для чтения файлов данных")
+        return None, None
+
+    step = max(1, total_blocks // max_blocks)
+    savings = []
+    seen = set()
+    duplicates = 0
+    unreadable = 0
+    position = 0
+    for path, blocks in files:
+        try:
+            with open(path, 'rb') as file:
+                # Номер первой выбираемой страницы в файле с учетом сквозного шага выборки
+                for block in range((-position) % step, blocks, step):
+                    file.seek(block * block_size)
+                    data = file.read(block_size)
+                    savings.append(max(0.0, 1 - len(zlib.compress(data, 1)) / len(data)))
+                    digest = hashlib.sha1(data).digest()
+                    if digest in seen:
+                        duplicates += 1
+                    else:
+                        seen.add(digest)
+        except OSError:
+            unreadable += 1
+        position += blocks
+
+    if not savings:
+        print(f"❌ Не удалось прочитать страницы из {pgdata} (запустите от пользователя с правами на чтение)")
+        return None, None
+    if unreadable:
+        print(f"⚠️  Пропущено недоступных для чтения файлов: {unreadable}")
+
+    compress_pct = round(sum(savings) / len(savings) * 100)
+    dedupe_pct = round(duplicates / len(savings) * 100)
+    options = {
+        "buffer_compress_percentage": compress_pct,
+        "buffer_compress_chunk": block_size,
+        "dedupe_percentage": dedupe_pct,
+        "refill_buffers": 1,
+    }
+    summary = f"compress={compress_pct}%, dedupe={dedupe_pct}%, страниц в выборке: {len(savings)}"
+    print(f"Калибровка по {pgdata}: {summary}")
+    return options, summary
+
+def run_fio_test(test_name, filename, size, rw, bs, rwmixwrite=None, results_dir=None, 
+                io_depth=DEFAULT_IO_DEPTH, runtime=None, test_suite_name="default_test",
+                ioengine=DEFAULT_IO_ENGINE, extra_options=None, numjobs=DEFAULT_NUMJOBS,
+                job_options=None, group_reporting=True):
+    output_file = fio_output_file(test_name, results_dir, test_suite_name)
+    command = build_fio_command(
+        test_name, filename, size, rw, bs,
+        output_file=output_file,
+        rwmixwrite=rwmixwrite,
+        io_depth=io_depth,
+        runtime=runtime,
+        ioengine=ioengine,
+        extra_options=extra_options,
+        numjobs=numjobs,
+        job_options=job_options,
+        group_reporting=group_reporting
+    )
     
     print(f"Запуск теста: {test_name}...")
     result = subprocess.run(command, stderr=subprocess.PIPE)
@@ -114,74 +516,109 @@ def extract_latency(section):
         "lat_min": "N/A",
         "lat_max": "N/A",
         "lat_avg": "N/A",
+        "lat_50th": "N/A",
         "lat_95th": "N/A",
-        "lat_99th": "N/A"
+        "lat_99th": "N/A",
+        "lat_99_9th": "N/A"
     }
 
     try:
         # Основные метрики из clat
+        # min и max fio сокращает до 6 знаков с суффиксом: max=1254k
         clat_match = re.search(
-            r'clat.*?min=([\d.]+)\D*max=([\d.]+)\D*avg=([\d.]+)',
-            section, 
-            re.DOTALL
+            r'clat\s*\((\w+)\):\s*min=([\d.]+[kKM]?),\s*max=([\d.]+[kKM]?),\s*avg=([\d.]+)',
+            section
         )
         if clat_match:
-            unit = re.search(r'clat\s*\((\w+)\)', section).group(1).lower()
+            unit = clat_match.group(1).lower()
             latencies.update({
-                "lat_min": f"{convert_to_msec(clat_match.group(1), unit):.2f}",
-                "lat_max": f"{convert_to_msec(clat_match.group(2), unit):.2f}",
-                "lat_avg": f"{convert_to_msec(clat_match.group(3), unit):.2f}"
+                "lat_min": f"{convert_to_msec(parse_iops(clat_match.group(2)), unit):.2f}",
+                "lat_max": f"{convert_to_msec(parse_iops(clat_match.group(3)), unit):.2f}",
+                "lat_avg": f"{convert_to_msec(clat_match.group(4), unit):.2f}"
             })
 
-        # Перцентили
-        perc_match = re.search(
-            r'95\.00th=\[\s*([\d.]+)\].*?99\.00th=\[\s*([\d.]+)\]',
-            section, 
-            re.DOTALL
-        )
-        if perc_match:
-            unit = 'usec'
-            latencies.update({
-                "lat_95th": f"{convert_to_msec(perc_match.group(1), unit):.2f}",
-                "lat_99th": f"{convert_to_msec(perc_match.group(2), unit):.2f}"
-            })
+        # Перцентили (единицы измерения берутся из заголовка блока перцентилей)
+        percentiles = extract_percentiles(section)
+        for key, pct in (("lat_50th", "50.00"), ("lat_95th", "95.00"),
+                         ("lat_99th", "99.00"), ("lat_99_9th", "99.90")):
+            if pct in percentiles:
+                latencies[key] = f"{percentiles[pct]:.2f}"
 
     except Exception as e:
         print(f"Ошибка парсинга задержек: {str(e)}")
 
     return latencies
 
+def extract_percentiles(section, kind=r'c?lat'):
+    """Извлекает блок перцентилей fio ("clat/lat/sync percentiles (unit)") в миллисекундах.
+
+    Возвращает словарь {"99.00": 1.23, ...}; единицы берутся из заголовка блока.
+    """
+    header = re.search(
+        rf'\b{kind} percentiles \((\w+)\):\s*\n((?:[ \t]*\|.*(?:\n|$))+)',
+        section
+    )
+    if not header:
+        return {}
+    unit = header.group(1)
+    return {
+        pct: convert_to_msec(value, unit)
+        for pct, value in re.findall(r'([\d.]+)th=\[\s*([\d.]+)\]', header.group(2))
+    }
+
+def parse_iops(value):
+    """Переводит число с суффиксом из вывода fio ("850", "12.3k", "1.1M") в абсолютное значение"""
+    match = re.match(r'([\d.]+)([kKmM]?)', value or "")
+    if not match:
+        return None
+    multiplier = {"": 1, "k": 1_000, "m": 1_000_000}[match.group(2).lower()]
+    return float(match.group(1)) * multiplier
+
+def fio_total_iops(file_path):
+    """Суммарные IOPS (чтение + запись) из файла вывода fio в абсолютных единицах"""
+    try:
+        with open(file_path, 'r') as file:
+            content = file.read()
+    except Exception as e:
+        print(f"Ошибка чтения файла {file_path}: {str(e)}")
+        return None
+
+    values = [parse_iops(value) for value in re.findall(r'(?:read|write): IOPS=([\d.]+[kKmM]?)', content)]
+    return sum(values) if values else None
+
 def parse_fio_results(file_path, is_mixed=False):
     try:
         with open(file_path, 'r') as file:
             content = file.read()
+    except Exception as e:
+        print(f"Ошибка чтения файла {file_path}: {str(e)}")
+        return error_result()
 
+    return parse_fio_content(content, is_mixed=is_mixed)
+
+def parse_fio_content(content, is_mixed=False):
+    """Разбирает текстовый вывод fio (одна группа или секция одного задания)"""
+    try:
         def extract_metrics(section, pattern, default="N/A"):
             match = re.search(pattern, section, re.IGNORECASE)
             return match.group(1) if match else default
 
         def convert_bandwidth(value, unit):
-            """Конвертирует bandwidth в MiB/s"""
-            try:
-                val = float(value)
-                unit = unit.lower()
-                if unit == 'kib/s':
-                    return val / 1024
-                elif unit == 'mib/s':
-                    return val
-                elif unit == 'gb/s':
-                    return val * 1024
-                else:
-                    return val  # Для неизвестных единиц возвращаем как есть
-            except:
-                return "N/A"
+            """Конвертирует bandwidth в MiB/s (fio выводит B/s, KiB/s, MiB/s, GiB/s, TiB/s)"""
+            multipliers = {'b/s': 1 / 1024 ** 2, 'kib/s': 1 / 1024, 'mib/s': 1, 'gib/s': 1024, 'tib/s': 1024 ** 2,
+                           'kb/s': 1e3 / 1024 ** 2, 'mb/s': 1e6 / 1024 ** 2, 'gb/s': 1e9 / 1024 ** 2}
+            return float(value) * multipliers[unit.lower()]
+
+        def kiops(value):
+            """IOPS из вывода fio ("850", "56.3k", "1.2M") в тысячах для столбца kIOPS"""
+            return f"{parse_iops(value) / 1000:g}" if value != "N/A" else value
 
         if is_mixed:
             results = {"write": {}, "read": {}}
             
             # Обработка записи
             write_bw_match = re.search(
-                r'WRITE.*?bw=([\d.]+)([KMGT]?iB/s)',
+                r'WRITE.*?bw=([\d.]+)([KMGT]?i?B/s)',
                 content, 
                 re.IGNORECASE | re.DOTALL
             )
@@ -192,7 +629,7 @@ def parse_fio_results(file_path, is_mixed=False):
 
             # Обработка чтения
             read_bw_match = re.search(
-                r'READ.*?bw=([\d.]+)([KMGT]?iB/s)',
+                r'READ.*?bw=([\d.]+)([KMGT]?i?B/s)',
                 content, 
                 re.IGNORECASE | re.DOTALL
             )
@@ -206,7 +643,7 @@ def parse_fio_results(file_path, is_mixed=False):
             if write_section:
                 write_content = write_section.group(0)
                 results["write"].update({
-                    "IOPS": extract_metrics(write_content, r'write: IOPS=([\d.]+)'),
+                    "IOPS": kiops(extract_metrics(write_content, r'write: IOPS=([\d.]+[kKmM]?)')),
                     "Latency Details": extract_latency(write_content)
                 })
                 results["write"]["Latency (ms)"] = results["write"]["Latency Details"].get("lat_avg", "N/A")
@@ -215,7 +652,7 @@ def parse_fio_results(file_path, is_mixed=False):
             if read_section:
                 read_content = read_section.group(0)
                 results["read"].update({
-                    "IOPS": extract_metrics(read_content, r'read: IOPS=([\d.]+)'),
+                    "IOPS": kiops(extract_metrics(read_content, r'read: IOPS=([\d.]+[kKmM]?)')),
                     "Latency Details": extract_latency(read_content)
                 })
                 results["read"]["Latency (ms)"] = results["read"]["Latency Details"].get("lat_avg", "N/A")
@@ -224,34 +661,1292 @@ def parse_fio_results(file_path, is_mixed=False):
 
         else:
             # Обработка обычных тестов
-            bw_match = re.search(r'BW=([\d.]+)([KMGT]?iB/s)', content, re.IGNORECASE)
+            bw_match = re.search(r'BW=([\d.]+)([KMGT]?i?B/s)', content, re.IGNORECASE)
             bandwidth = "N/A"
             if bw_match:
                 bandwidth = f"{convert_bandwidth(bw_match.group(1), bw_match.group(2).lower()):.1f}"
 
             return {
-                "IOPS": extract_metrics(content, r'IOPS=([\d.]+)'),
+                "IOPS": kiops(extract_metrics(content, r'IOPS=([\d.]+[kKmM]?)')),
                 "Bandwidth (MiB/s)": bandwidth,
                 "Latency (ms)": extract_latency(content).get("lat_avg", "N/A"),
                 "Latency Details": extract_latency(content)
             }
 
     except Exception as e:
-        print(f"Ошибка чтения файла {file_path}: {str(e)}")
+        print(f"Ошибка разбора вывода fio: {str(e)}")
         return error_result()
+
+def fio_job_sections(file_path):
+    """Делит вывод fio без group_reporting на секции заданий: список пар (имя задания, текст секции).
+
+    Задания с numjobs > 1 выводятся под одним и тем же именем, поэтому возвращается список, а не словарь.
+    """
+    try:
+        with open(file_path, 'r') as file:
+            content = file.read()
+    except Exception as e:
+        print(f"Ошибка чтения файла {file_path}: {str(e)}")
+        return []
+
+    # Секции заданий начинаются со строки вида "pg_wal: (groupid=0, jobs=1): err= 0: ..."
+    content = content.split("Run status group")[0]
+    parts = re.split(r'^(\S.*?): \(groupid=', content, flags=re.MULTILINE)
+    return list(zip(parts[1::2], parts[2::2]))
+
+def parse_fio_jobs(file_path):
+    """Разбирает вывод fio без group_reporting: возвращает результаты по каждому заданию"""
+    jobs = {}
+    for job_name, section in fio_job_sections(file_path):
+        is_mixed = bool(re.search(r'^\s*read:', section, re.MULTILINE)) and \
+                   bool(re.search(r'^\s*write:', section, re.MULTILINE))
+        jobs[job_name] = parse_fio_content(section, is_mixed=is_mixed)
+    return jobs
+
+def run_fio_jobs(test_name, jobs, results_dir, test_suite_name="default_test", global_options=None):
+    """Запускает несколько заданий fio одновременно в одном процессе fio.
+
+    jobs - список словарей с параметрами заданий, обязательно с ключом "name".
+    Отчет формируется по каждому заданию отдельно (без --group_reporting).
+    """
+    output_file = fio_output_file(test_name, results_dir, test_suite_name)
+
+    command = [
+        'fio',
+        '--output=' + output_file,
+        '--output-format=normal',
+        '--lat_percentiles=1',
+    ]
+    for option, value in (global_options or {}).items():
+        command.append(f'--{option}={fio_option_value(option, value, test_name)}')
+
+    # Параметры заданий следуют после --name и относятся только к этому заданию
+    for job in jobs:
+        command.append('--name=' + job['name'])
+        for option, value in job.items():
+            if option != 'name':
+                command.append(f'--{option}={value}')
+
+    print(f"Запуск теста: {test_name} ({', '.join(job['name'] for job in jobs)})...")
+    result = subprocess.run(command, stderr=subprocess.PIPE)
+
+    if result.returncode != 0:
+        print(f"Ошибка выполнения теста {test_name}:")
+        print(result.stderr.decode())
+        return None
+
+    print(f"Тест {test_name} завершен. Результаты сохранены в {output_file}")
+    return output_file
+
+def postgres_profile_jobs(data_file, wal_file, size, io_depth, read_pct=DEFAULT_PG_READ_PCT,
+                          wal_size=DEFAULT_PG_WAL_SIZE, commit_group=DEFAULT_PG_COMMIT_GROUP,
+                          checkpoint_interval=DEFAULT_PG_CHECKPOINT_INTERVAL,
+                          checkpoint_mb=DEFAULT_PG_CHECKPOINT_MB, ioengine=DEFAULT_IO_ENGINE,
+                          direct=IO_MODES['direct'], wal_offset=None):
+    """Набор заданий fio, моделирующий ввод-вывод PostgreSQL.
+
+    - pg_wal: последовательная запись 8k в WAL с fdatasync на каждую группу коммитов
+    - pg_data: случайные чтение/запись 8k по файлам данных
+    - pg_checkpoint: периодические всплески записи грязных страниц при контрольной точке
+
+    WAL всегда пишется через кэш страниц, direct задает режим заданий файлов данных.
+    wal_offset (байты) размещает WAL за областью данных, если они в одном файле или на одном устройстве.
+    """
+    checkpoint_blocks = int(checkpoint_mb) * 1024 // 8
+    jobs = [
+        {
+            "name": "pg_wal",
+            "filename": wal_file,
+            "size": wal_size,
+            "rw": "write",
+            "bs": PG_BLOCK_SIZE,
+            "ioengine": "sync",
+            "direct": 0,
+            "fdatasync": commit_group,
+        },
+        {
+            "name": "pg_data",
+            "filename": data_file,
+            "size": size,
+            "rw": "randrw",
+            "bs": PG_BLOCK_SIZE,
+            "rwmixread": read_pct,
+            **IO_ENGINES[ioengine],
+            "direct": direct,
+            "iodepth": io_depth,
+        },
+        {
+            "name": "pg_checkpoint",
+            "filename": data_file,
+            "size": size,
+            "rw": "randwrite",
+            "bs": PG_BLOCK_SIZE,
+            **IO_ENGINES[ioengine],
+            "direct": direct,
+            "iodepth": 32,
+            "thinktime": int(checkpoint_interval) * 1_000_000,
+            "thinktime_blocks": checkpoint_blocks,
+        },
+    ]
+    if wal_offset:
+        jobs[0]["offset"] = wal_offset
+    return jobs
+
+def run_postgres_profile(test_dir, results_dir, test_suite_name, size, io_depth, runtime,
+                         read_pct=DEFAULT_PG_READ_PCT, wal_size=DEFAULT_PG_WAL_SIZE,
+                         commit_group=DEFAULT_PG_COMMIT_GROUP,
+                         checkpoint_interval=DEFAULT_PG_CHECKPOINT_INTERVAL,
+                         checkpoint_mb=DEFAULT_PG_CHECKPOINT_MB, ioengine=DEFAULT_IO_ENGINE,
+                         job_options=None, data_file=None, wal_file=None, wal_offset=None):
+    """Профиль "postgres": одновременные задания WAL, файлов данных и контрольных точек.
+
+    data_file и wal_file (например, на разных виртуальных дисках) по умолчанию - файлы в test_dir.
+    direct в job_options (буферизованный режим) применяется к заданиям файлов данных.
+    Возвращает строки результатов в формате основной таблицы или None при ошибке.
+    """
+    jobs = postgres_profile_jobs(
+        data_file=data_file or os.path.join(test_dir, 'testfile_pgdata'),
+        wal_file=wal_file or os.path.join(test_dir, 'testfile_pgwal'),
+        size=size,
+        io_depth=io_depth,
+        read_pct=read_pct,
+        wal_size=wal_size,
+        commit_group=commit_group,
+        checkpoint_interval=checkpoint_interval,
+        checkpoint_mb=checkpoint_mb,
+        ioengine=ioengine,
+        direct=(job_options or {}).get("direct", IO_MODES['direct']),
+        wal_offset=wal_offset
+    )
+    output_file = run_fio_jobs(
+        "PostgreSQL Profile",
+        jobs,
+        results_dir,
+        test_suite_name=test_suite_name,
+        global_options={"runtime": runtime or DEFAULT_PG_RUNTIME, "time_based": 1, **(job_options or {})}
+    )
+    if output_file is None:
+        return None
+
+    job_results = parse_fio_jobs(output_file)
+    rows = []
+    labels = [("pg_wal", "PG WAL"), ("pg_data", "PG Data"), ("pg_checkpoint", "PG Checkpoint")]
+    for index, (job_name, label) in enumerate(labels, start=1):
+        rows.extend(job_result_rows(index, label, job_name, job_results))
+    return rows
+
+def job_result_rows(test_number, label, job_name, job_results):
+    """Строки основной таблицы для задания из результатов parse_fio_jobs (две строки для смешанного)"""
+    parsed = job_results.get(job_name)
+    if parsed is None:
+        print(f"⚠️  В выводе fio нет результатов задания {job_name}")
+        parsed = error_result()["write"]
+    if "read" in parsed and "write" in parsed:
+        return mixed_result_rows(test_number, label, parsed)
+    return [result_row(test_number, label, parsed)]
+
+def parse_sync_latency(file_path, method):
+    """Разбирает вывод fio теста синхронной записи.
+
+    Для fsync/fdatasync задержка берется из блока "sync" (время самого вызова синхронизации),
+    для O_DSYNC синхронной является сама запись, поэтому используется задержка записи.
+    """
+    result = {
+        "Syncs/s": "N/A",
+        "Sync Latency Details": {
+            "lat_avg": "N/A",
+            "lat_50th": "N/A",
+            "lat_99th": "N/A",
+            "lat_99_9th": "N/A",
+            "lat_max": "N/A"
+        }
+    }
+    try:
+        with open(file_path, 'r') as file:
+            content = file.read()
+    except Exception as e:
+        print(f"Ошибка чтения файла {file_path}: {str(e)}")
+        return result
+
+    # Каждой записи соответствует одна синхронизация, поэтому IOPS записи = синхронизаций в секунду
+    iops_match = re.search(r'write: IOPS=([\d.]+[kKmM]?)', content)
+    if iops_match:
+        result["Syncs/s"] = f"{parse_iops(iops_match.group(1)):.0f}"
+
+    kind = 'sync' if method in ('fsync', 'fdatasync') else r'c?lat'
+    stats_match = re.search(
+        rf'\b{kind} \((\w+)\):\s*min=([\d.]+[kKM]?),\s*max=([\d.]+[kKM]?),\s*avg=([\d.]+)',
+        content
+    )
+    details = result["Sync Latency Details"]
+    if stats_match:
+        unit = stats_match.group(1)
+        details["lat_max"] = f"{convert_to_msec(parse_iops(stats_match.group(3)), unit):.3f}"
+        details["lat_avg"] = f"{convert_to_msec(stats_match.group(4), unit):.3f}"
+
+    percentiles = extract_percentiles(content, kind=kind)
+    for key, pct in (("lat_50th", "50.00"), ("lat_99th", "99.00"), ("lat_99_9th", "99.90")):
+        if pct in percentiles:
+            details[key] = f"{percentiles[pct]:.3f}"
+
+    return result
+
+def run_sync_latency_test(test_dir, results_dir, test_suite_name, sizes=DEFAULT_SYNC_SIZES,
+                          method=DEFAULT_SYNC_METHOD, runtime=None, filename=None):
+    """Измеряет задержку синхронной записи при глубине очереди 1 (аналог pg_test_fsync).
+
+    Для каждого размера блока выполняется запись с fdatasync/fsync после каждой операции
+    или с O_DSYNC. Возвращает список результатов или None при ошибке.
+    """
+    sync_results = []
+    for bs in [format_block_size(size.strip()) for size in sizes.split(',') if size.strip()]:
+        job = {
+            "name": "sync_lat",
+            "filename": filename or os.path.join(test_dir, 'testfile_sync'),
+            "size": DEFAULT_SYNC_FILE_SIZE,
+            "rw": "write",
+            "bs": bs,
+            "ioengine": "psync",
+            "iodepth": 1,
+            "direct": 0,
+            "runtime": runtime or DEFAULT_SYNC_RUNTIME,
+            "time_based": 1,
+        }
+        job.update(SYNC_METHODS[method])
+
+        output_file = run_fio_jobs(f"Sync Latency {method} {bs}", [job], results_dir,
+                                   test_suite_name=test_suite_name)
+        if output_file is None:
+            return None
+
+        parsed = parse_sync_latency(output_file, method)
+        parsed.update({"Method": method, "Block Size": bs})
+        sync_results.append(parsed)
+
+    return sync_results
+
+def extract_cpu_usage(content):
+    """Возвращает загрузку CPU (usr, sys) в процентах из строки "cpu : usr=..%, sys=..%" вывода fio"""
+    match = re.search(r'cpu\s*:\s*usr=([\d.]+)%,\s*sys=([\d.]+)%', content)
+    if not match:
+        return None, None
+    return float(match.group(1)), float(match.group(2))
+
+def run_engine_comparison(test, engines, testfile_path, size, results_dir, io_depth, runtime, test_name,
+                          numjobs=DEFAULT_NUMJOBS, job_options=None):
+    """Выполняет один этап fio поочередно на каждом из движков ввода-вывода.
+
+    Возвращает строки основной таблицы, таблицу сравнения движков и признак успешного выполнения.
+    Затраты CPU на операцию оцениваются как (usr + sys) * numjobs / IOPS: fio при
+    group_reporting выводит загрузку CPU, усредненную по заданиям.
+    """
+    rows = []
+    comparison = []
+    all_tests_passed = True
+
+    for index, engine in enumerate(engines, start=1):
+        label = f"{test['name']} [{engine}]"
+        print(f"\nДвижок {index}/{len(engines)}: {engine}")
+        success = run_fio_test(
+            test_name=label,
+            filename=testfile_path,
+            size=size,
+            rw=test['rw'],
+            bs=test['bs'],
+            results_dir=results_dir,
+            io_depth=io_depth,
+            runtime=runtime,
+            test_suite_name=test_name,
+            ioengine=engine,
+            numjobs=numjobs,
+            job_options=job_options
+        )
+        if not success:
+            all_tests_passed = False
+            continue
+
+        output_file = fio_output_file(label, results_dir, test_name)
+        parsed = parse_fio_results(output_file)
+        rows.append(result_row(index, label, parsed))
+
+        try:
+            with open(output_file, 'r') as file:
+                content = file.read()
+        except Exception as e:
+            print(f"Ошибка чтения файла {output_file}: {str(e)}")
+            content = ""
+
+        usr, sys_cpu = extract_cpu_usage(content)
+        iops = fio_total_iops(output_file)
+        cpu_per_io = "N/A"
+        if iops and usr is not None:
+            cpu_per_io = f"{(usr + sys_cpu) / 100 * numjobs / iops * 1_000_000:.1f}"
+
+        comparison.append({
+            "Engine": engine,
+            "IOPS": f"{iops:.0f}" if iops else "N/A",
+            "Latency (ms)": parsed.get("Latency (ms)", "N/A"),
+            "99th (ms)": parsed.get("Latency Details", {}).get("lat_99th", "N/A"),
+            "CPU usr (%)": f"{usr:.1f}" if usr is not None else "N/A",
+            "CPU sys (%)": f"{sys_cpu:.1f}" if sys_cpu is not None else "N/A",
+            "CPU (us/IO)": cpu_per_io
+        })
+
+    return rows, comparison, all_tests_passed
+
+def run_openloop_test(test, testfile_path, size, results_dir, io_depth, runtime, test_name,
+                      ioengine=DEFAULT_IO_ENGINE, rates=None, levels=DEFAULT_OPENLOOP_LEVELS,
+                      numjobs=DEFAULT_NUMJOBS, job_options=None):
+    """Открытая нагрузка: этап fio с фиксированной предлагаемой интенсивностью (rate_iops, poisson).
+
+    Уровни задаются либо абсолютными IOPS (rates), либо процентами (levels) от пиковых IOPS,
+    измеренных предварительным прогоном этапа в закрытом цикле. Без runtime каждая ступень
+    длится DEFAULT_OPENLOOP_RUNTIME секунд (проход всего файла на низкой интенсивности занял бы минуты).
+    Возвращает строки основной таблицы, результаты по ступеням и признак успешного выполнения.
+    """
+    rows = []
+    steps = []
+    runtime = runtime or DEFAULT_OPENLOOP_RUNTIME
+
+    def run_step(label, options=None):
+        success = run_fio_test(
+            test_name=label,
+            filename=testfile_path,
+            size=size,
+            rw=test['rw'],
+            bs=test['bs'],
+            rwmixwrite=test.get("mix"),
+            results_dir=results_dir,
+            io_depth=io_depth,
+            runtime=runtime,
+            test_suite_name=test_name,
+            ioengine=ioengine,
+            extra_options=options,
+            numjobs=numjobs,
+            job_options=job_options
+        )
+        return fio_output_file(label, results_dir, test_name) if success else None
+
+    if rates:
+        targets = [(str(rate), float(rate)) for rate in rates.split(',') if rate.strip()]
+    else:
+        print(f"\nИзмерение пиковых IOPS этапа {test['name']} (закрытый цикл)...")
+        peak_file = run_step(f"{test['name']} [peak]")
+        peak_iops = fio_total_iops(peak_file) if peak_file else None
+        if not peak_iops:
+            print("❌ Не удалось измерить пиковые IOPS. Открытая нагрузка не выполнялась.")
+            return rows, steps, False
+        print(f"Пиковые IOPS: {peak_iops:.0f}")
+        targets = [(f"{level.strip()}%", peak_iops * float(level) / 100)
+                   for level in levels.split(',') if level.strip()]
+
+    all_tests_passed = True
+    for index, (level, target) in enumerate(targets, start=1):
+        label = f"{test['name']} @{level}"
+        # rate_iops задается на одно задание fio
+        per_job_rate = max(1, int(round(target / numjobs)))
+        print(f"\nСтупень {index}/{len(targets)}: {target:.0f} IOPS ({per_job_rate} на задание)")
+        output_file = run_step(label, {"rate_iops": per_job_rate, "rate_process": "poisson"})
+        if output_file is None:
+            all_tests_passed = False
+            continue
+
+        parsed = parse_fio_results(output_file)
+        rows.append(result_row(index, label, parsed))
+
+        achieved = fio_total_iops(output_file)
+        details = parsed.get("Latency Details", {})
+        steps.append({
+            "Level": level,
+            "Target IOPS": f"{per_job_rate * numjobs}",
+            "Achieved IOPS": f"{achieved:.0f}" if achieved else "N/A",
+            "50th (ms)": details.get("lat_50th", "N/A"),
+            "99th (ms)": details.get("lat_99th", "N/A"),
+            "99.9th (ms)": details.get("lat_99_9th", "N/A"),
+            "Met": "yes" if achieved and achieved >= per_job_rate * numjobs * OPENLOOP_TOLERANCE else "no"
+        })
+
+    return rows, steps, all_tests_passed
+
+def run_slo_search(test, testfile_path, size, results_dir, io_depth, runtime, test_name,
+                   ioengine=DEFAULT_IO_ENGINE, percentile=DEFAULT_SLO_PERCENTILE,
+                   latency_ms=DEFAULT_SLO_LATENCY_MS, steps=DEFAULT_SLO_STEPS,
+                   numjobs=DEFAULT_NUMJOBS, job_options=None):
+    """Поиск максимальных IOPS, при которых перцентиль задержки укладывается в SLO.
+
+    1. fio с latency_target/latency_window/latency_percentile сам подбирает глубину очереди,
+       при которой выполняется ограничение - это начальная оценка IOPS и глубины.
+    2. Уточнение: при найденной глубине очереди выполняется поиск по rate_iops
+       (удвоение шага, затем деление интервала пополам). Ступень успешна, если
+       перцентиль задержки не превышает цели и достигнуто не менее 95% предложенной нагрузки.
+
+    Без runtime каждый прогон длится DEFAULT_SLO_RUNTIME секунд.
+    Возвращает строки основной таблицы, результат поиска и признак успешного выполнения.
+    """
+    rows = []
+    runtime = runtime or DEFAULT_SLO_RUNTIME
+    pct_key = f"{percentile:.2f}"
+    percentile_list = ":".join(sorted({"50", "95", "99", "99.9", f"{percentile:g}"}, key=float))
+    slo_label = f"{test['rw']} p{percentile:g}<={latency_ms:g}ms"
+
+    def run_step(label, depth, options):
+        options = dict(options, percentile_list=percentile_list)
+        success = run_fio_test(
+            test_name=label,
+            filename=testfile_path,
+            size=size,
+            rw=test['rw'],
+            bs=test['bs'],
+            results_dir=results_dir,
+            io_depth=depth,
+            runtime=runtime,
+            test_suite_name=test_name,
+            ioengine=ioengine,
+            extra_options=options,
+            numjobs=numjobs,
+            job_options=job_options
+        )
+        if not success:
+            return None, None, None
+        output_file = fio_output_file(label, results_dir, test_name)
+        parsed = parse_fio_results(output_file)
+        rows.append(result_row(len(rows) + 1, label, parsed))
+        try:
+            with open(output_file, 'r') as file:
+                measured = extract_percentiles(file.read()).get(pct_key)
+        except Exception as e:
+            print(f"Ошибка чтения файла {output_file}: {str(e)}")
+            measured = None
+        return output_file, fio_total_iops(output_file), measured
+
+    # Этап 1: встроенный в fio поиск глубины очереди
+    print(f"\nSLO {slo_label}: поиск глубины очереди средствами fio (latency_target)...")
+    output_file, estimate, _ = run_step(f"{test['name']} [SLO target]", io_depth, {
+        "latency_target": int(latency_ms * 1000),
+        "latency_window": SLO_LATENCY_WINDOW_USEC,
+        "latency_percentile": f"{percentile:g}"
+    })
+    if output_file is None:
+        return rows, None, False
+
+    with open(output_file, 'r') as file:
+        depth_match = re.search(r'latency\s*:\s*target=\d+.*?depth=(\d+)', file.read())
+    depth = int(depth_match.group(1)) if depth_match else io_depth
+    print(f"Начальная оценка: {estimate or 0:.0f} IOPS при глубине очереди {depth}")
+
+    # Этап 2: уточнение по предлагаемой нагрузке при найденной глубине
+    low, high = 0.0, None
+    best_latency = None
+    candidate = estimate or 1000.0
+    for step in range(1, steps + 1):
+        per_job_rate = max(1, int(round(candidate / numjobs)))
+        offered = per_job_rate * numjobs
+        label = f"{test['name']} [SLO {offered}]"
+        print(f"Шаг {step}/{steps}: {offered} IOPS")
+        output_file, achieved, measured = run_step(label, depth, {
+            "rate_iops": per_job_rate, "rate_process": "poisson"
+        })
+        if output_file is None:
+            return rows, None, False
+
+        passed = (measured is not None and measured <= latency_ms
+                  and achieved is not None and achieved >= offered * OPENLOOP_TOLERANCE)
+        print(f"  p{percentile:g} = {measured if measured is not None else 'N/A'} ms, "
+              f"IOPS = {achieved or 0:.0f} -> {'SLO выполнен' if passed else 'SLO нарушен'}")
+        if passed:
+            low, best_latency = float(offered), measured
+            candidate = offered * 2 if high is None else (low + high) / 2
+        else:
+            high = float(offered)
+            candidate = (low + high) / 2
+        if high is not None and high - low < numjobs:
+            break
+
+    # Точность поиска - ширина интервала между подтвержденной и нарушившей SLO нагрузкой
+    if low and high:
+        precision = f"{(high - low) / low * 100:.1f}"
+    else:
+        precision = "N/A"
+    slo_result = {
+        "SLO": slo_label,
+        "Max IOPS": f"{low:.0f}" if low else "N/A",
+        "Queue Depth": depth,
+        f"Measured p{percentile:g} (ms)": f"{best_latency:.3f}" if best_latency is not None else "N/A",
+        "Upper Bound IOPS": f"{high:.0f}" if high else "N/A",
+        "Search Precision (%)": precision,
+        "Search Steps": len(rows) - 1
+    }
+    if not low:
+        print(f"⚠️  SLO {slo_label} не выполнен ни на одной ступени нагрузки")
+    return rows, slo_result, True
+
+def run_job_scaling(test, testfile_path, size, results_dir, io_depth, runtime, test_name,
+                    ioengine=DEFAULT_IO_ENGINE, job_counts=None, pinning="none",
+                    cpus_allowed=None, numa_node=0, job_options=None):
+    """Кривая масштабирования: этап fio при числе заданий от 1 до числа vCPU.
+
+    Каждая ступень выполняется без group_reporting, чтобы видеть IOPS каждого задания.
+    Эффективность масштабирования = IOPS(N) / (N * IOPS(1)), дисбаланс = (max - min) / среднее по заданиям;
+    без результата ступени numjobs=1 эффективность не рассчитывается.
+    Возвращает строки основной таблицы, результаты по ступеням и признак успешного выполнения.
+    """
+    rows = []
+    steps = []
+    all_tests_passed = True
+    single_job_iops = None
+    baseline_warned = False
+
+    for index, numjobs in enumerate(job_counts or range(1, (os.cpu_count() or 1) + 1), start=1):
+        label = f"{test['name']} x{numjobs} jobs"
+        print(f"\nСтупень {index}: numjobs={numjobs}")
+        success = run_fio_test(
+            test_name=label,
+            filename=testfile_path,
+            size=size,
+            rw=test['rw'],
+            bs=test['bs'],
+            rwmixwrite=test.get("mix"),
+            results_dir=results_dir,
+            io_depth=io_depth,
+            runtime=runtime,
+            test_suite_name=test_name,
+            ioengine=ioengine,
+            numjobs=numjobs,
+            job_options={**(job_options or {}), **cpu_pinning_options(pinning, numjobs, cpus_allowed, numa_node)},
+            group_reporting=False
+        )
+        if not success:
+            all_tests_passed = False
+            continue
+
+        output_file = fio_output_file(label, results_dir, test_name)
+        per_job_iops = []
+        bandwidth = 0.0
+        latencies = []
+        for _, section in fio_job_sections(output_file):
+            values = [parse_iops(value) for value in re.findall(r'(?:read|write): IOPS=([\d.]+[kKmM]?)', section)]
+            per_job_iops.append(sum(values))
+            parsed = parse_fio_content(section)
+            try:
+                bandwidth += float(parsed["Bandwidth (MiB/s)"])
+                latencies.append(float(parsed["Latency (ms)"]))
+            except (TypeError, ValueError):
+                pass
+
+        if not per_job_iops:
+            print(f"⚠️  В выводе fio нет результатов заданий: {output_file}")
+            all_tests_passed = False
+            continue
+
+        total_iops = sum(per_job_iops)
+        # Эффективность считается только относительно измеренной ступени numjobs=1
+        if numjobs == 1:
+            single_job_iops = total_iops
+        elif single_job_iops is None and not baseline_warned:
+            print("⚠️  Нет результата ступени numjobs=1: эффективность масштабирования не рассчитывается (N/A)")
+            baseline_warned = True
+        job_mean = total_iops / len(per_job_iops)
+
+        rows.append({
+            "Test Number": index,
+            "Test Name": label,
+            "IOPS": f"{total_iops / 1000:.1f}",
+            "Bandwidth (MiB/s)": f"{bandwidth:.1f}",
+            "Latency (ms)": f"{sum(latencies) / len(latencies):.2f}" if latencies else "N/A",
+            "Latency Details": {}
+        })
+        steps.append({
+            "Jobs": numjobs,
+            "IOPS": f"{total_iops:.0f}",
+            "IOPS/job": f"{job_mean:.0f}",
+            "Efficiency (%)": f"{total_iops / (numjobs * single_job_iops) * 100:.1f}" if single_job_iops else "N/A",
+            "Imbalance (%)": f"{(max(per_job_iops) - min(per_job_iops)) / job_mean * 100:.1f}" if job_mean else "N/A",
+            "Per-job IOPS": ",".join(f"{value:.0f}" for value in per_job_iops)
+        })
+
+    return rows, steps, all_tests_passed
+
+def parse_size(size):
+    """Переводит размер в формате fio ("512M", "10G", "1T") в байты"""
+    match = re.match(r'^\s*([\d.]+)\s*([KMGT]?)i?B?\s*$', str(size), re.IGNORECASE)
+    if not match:
+        raise ValueError(f"Некорректный размер: {size}")
+    power = " KMGT".index(match.group(2).upper() or " ")
+    return int(float(match.group(1)) * 1024 ** power)
+
+def is_steady_state(values, window=PRECONDITION_WINDOW):
+    """Критерий установившегося режима в стиле SNIA PTS по последним window замерам.
+
+    Разброс значений не более 20% от среднего, изменение по линейному тренду
+    на всем окне - не более 10% от среднего.
+    """
+    if len(values) < window:
+        return False
+    window_values = values[-window:]
+    average = sum(window_values) / window
+    if average <= 0:
+        return False
+    x_mean = (window - 1) / 2
+    slope = sum((x - x_mean) * (y - average) for x, y in enumerate(window_values)) / \
+        sum((x - x_mean) ** 2 for x in range(window))
+    return (max(window_values) - min(window_values) <= 0.2 * average
+            and abs(slope) * (window - 1) <= 0.1 * average)
+
+def run_precondition(testfile_path, size, results_dir, test_name, ioengine=DEFAULT_IO_ENGINE,
+                     numjobs=DEFAULT_NUMJOBS, job_options=None, round_time=DEFAULT_PRECONDITION_ROUND,
+                     max_rounds=DEFAULT_PRECONDITION_MAX_ROUNDS):
+    """Предкондиционирование: последовательное заполнение файла и случайная перезапись до установившегося режима.
+
+    Возвращает сводку для отчета или None при ошибке.
+    Повторные вызовы перезаписывают выходные файлы раундов предыдущего вызова.
+    """
+    print(f"\nПредкондиционирование: последовательное заполнение {size}...")
+    if not run_fio_test(
+        test_name="Precondition Fill",
+        filename=testfile_path,
+        size=size,
+        rw="write",
+        bs="128k",
+        results_dir=results_dir,
+        io_depth=32,
+        test_suite_name=test_name,
+        ioengine=ioengine,
+        numjobs=1,
+        job_options=job_options
+    ):
+        return None
+
+    round_iops = []
+    steady = False
+    for round_number in range(1, max_rounds + 1):
+        label = f"Precondition Round {round_number}"
+        print(f"Случайная перезапись, раунд {round_number}/{max_rounds} ({round_time} сек)...")
+        if not run_fio_test(
+            test_name=label,
+            filename=testfile_path,
+            size=size,
+            rw="randwrite",
+            bs="4k",
+            results_dir=results_dir,
+            io_depth=32,
+            runtime=round_time,
+            test_suite_name=test_name,
+            ioengine=ioengine,
+            numjobs=numjobs,
+            job_options=job_options
+        ):
+            return None
+        round_iops.append(fio_total_iops(fio_output_file(label, results_dir, test_name)) or 0)
+        if is_steady_state(round_iops):
+            steady = True
+            break
+
+    window = round_iops[-PRECONDITION_WINDOW:]
+    summary = {
+        "Rounds": len(round_iops),
+        "Steady State": "yes" if steady else "no",
+        "Steady IOPS": f"{sum(window) / len(window):.0f}",
+        "Round IOPS": "/".join(f"{value:.0f}" for value in round_iops)
+    }
+    if steady:
+        print(f"✓ Установившийся режим достигнут за {len(round_iops)} раундов: {summary['Steady IOPS']} IOPS")
+    else:
+        print(f"⚠️  Установившийся режим не достигнут за {max_rounds} раундов")
+    return summary
+
+def run_working_set_sweep(sweep_tests, sizes, testfile_path, results_dir, io_depth, runtime, test_name,
+                          ioengine=DEFAULT_IO_ENGINE, numjobs=DEFAULT_NUMJOBS, job_options=None,
+                          precondition=None, precondition_scope="once", precondition_results=None):
+    """Повторяет выбранные этапы при растущем размере рабочего набора.
+
+    Размер задает область файла, по которой работает fio, поэтому один и тот же файл
+    используется для всех ступеней (растет от меньшего размера к большему).
+    Обрыв - падение IOPS более чем на SWEEP_CLIFF_DROP или рост p99 более чем в SWEEP_CLIFF_LATENCY раз
+    относительно предыдущего размера.
+    precondition - параметры run_precondition; при scope "once" предкондиционируется каждая ступень
+    размера, при "each" - каждый этап. Сводки добавляются в precondition_results.
+    Возвращает строки основной таблицы, результаты по ступеням и признак успешного выполнения.
+    """
+    rows = []
+    steps = []
+    all_tests_passed = True
+    previous = {}
+
+    for size in sorted(sizes, key=parse_size):
+        for index, test in enumerate(sweep_tests):
+            label = f"{test['name']} @{size}"
+            if precondition is not None and (precondition_scope == "each" or index == 0):
+                summary = run_precondition(testfile_path, size, results_dir, test_name, ioengine=ioengine,
+                                           numjobs=numjobs, job_options=job_options, **precondition)
+                if summary is None:
+                    all_tests_passed = False
+                    continue
+                if precondition_results is not None:
+                    scope_label = label if precondition_scope == "each" else size
+                    precondition_results.append((scope_label, summary))
+            print(f"\nРабочий набор {size}: {test['name']}")
+            success = run_fio_test(
+                test_name=label,
+                filename=testfile_path,
+                size=size,
+                rw=test['rw'],
+                bs=test['bs'],
+                rwmixwrite=test.get("mix"),
+                results_dir=results_dir,
+                io_depth=io_depth,
+                runtime=runtime,
+                test_suite_name=test_name,
+                ioengine=ioengine,
+                numjobs=numjobs,
+                job_options=job_options
+            )
+            if not success:
+                all_tests_passed = False
+                continue
+
+            output_file = fio_output_file(label, results_dir, test_name)
+            parsed = parse_fio_results(output_file, is_mixed=test['rw'] == 'randrw')
+            if test['rw'] == 'randrw':
+                rows.extend(mixed_result_rows(len(rows) + 1, label, parsed))
+                p99_values = [parsed[direction]["Latency Details"].get("lat_99th", "N/A")
+                              for direction in ("read", "write")]
+            else:
+                rows.append(result_row(len(rows) + 1, label, parsed))
+                p99_values = [parsed["Latency Details"].get("lat_99th", "N/A")]
+
+            iops = fio_total_iops(output_file)
+            try:
+                p99 = max(float(value) for value in p99_values)
+            except ValueError:
+                p99 = None
+
+            change = "N/A"
+            cliff = False
+            if test['rw'] in previous and iops:
+                prev_iops, prev_p99 = previous[test['rw']]
+                if prev_iops:
+                    change = f"{(iops - prev_iops) / prev_iops * 100:+.1f}"
+                    cliff = iops < prev_iops * (1 - SWEEP_CLIFF_DROP)
+                if p99 and prev_p99:
+                    cliff = cliff or p99 > prev_p99 * SWEEP_CLIFF_LATENCY
+            previous[test['rw']] = (iops, p99)
+
+            steps.append({
+                "Size": size,
+                "Phase": test['rw'],
+                "IOPS": f"{iops:.0f}" if iops else "N/A",
+                "99th (ms)": f"{p99:.2f}" if p99 is not None else "N/A",
+                "Change (%)": change,
+                "Cliff": "CLIFF" if cliff else ""
+            })
+            if cliff:
+                print(f"⚠️  Обрыв производительности {test['name']} на размере {size}")
+
+    return rows, steps, all_tests_passed
+
+def fio_status_histogram(status):
+    """Накопленные показатели из статуса fio json+ по всем заданиям и направлениям.
+
+    Возвращает гистограмму задержки (интервалы latency_bucket), число операций, объем (байты),
+    суммарную задержку (нс, для средней) и время выполнения (сек).
+    """
+    histogram = {}
+    totals = {"ios": 0, "bytes": 0, "lat_ns_sum": 0.0, "elapsed": 0}
+    for job in status.get("jobs", []):
+        totals["elapsed"] = max(totals["elapsed"], job.get("elapsed", 0))
+        for direction in ("read", "write"):
+            stats = job.get(direction, {})
+            # С lat_percentiles=1 гистограмма общей задержки находится в lat_ns, иначе в clat_ns
+            latency = stats.get("lat_ns") if stats.get("lat_ns", {}).get("bins") else stats.get("clat_ns", {})
+            totals["ios"] += stats.get("total_ios", 0)
+            totals["bytes"] += stats.get("io_bytes", 0)
+            totals["lat_ns_sum"] += latency.get("mean", 0) * stats.get("total_ios", 0)
+            for value_ns, count in latency.get("bins", {}).items():
+                bucket = latency_bucket(int(value_ns) / 1000)
+                histogram[bucket] = histogram.get(bucket, 0) + count
+    return histogram, totals
+
+def merge_histograms(histograms):
+    """Суммирует гистограммы {интервал: количество}"""
+    merged = {}
+    for histogram in histograms:
+        for bucket, count in histogram.items():
+            merged[bucket] = merged.get(bucket, 0) + count
+    return merged
+
+def fio_status_stream(process):
+    """Последовательно возвращает статусы fio (--output-format=json+ --status-interval) из stdout процесса"""
+    lines = []
+    for line in process.stdout:
+        # Строки вне JSON (предупреждения fio) пропускаются
+        if not lines and not line.startswith("{"):
+            continue
+        lines.append(line)
+        if line.rstrip() == "}":
+            try:
+                yield json.loads("".join(lines))
+            except ValueError:
+                pass
+            lines = []
+
+def format_elapsed(seconds):
+    """Время от начала прогона в формате Ч:ММ"""
+    return f"{int(seconds) // 3600}:{int(seconds) % 3600 // 60:02d}"
+
+def soak_summary(label, histogram, ios, seconds, worst_window_p99=None):
+    """Сводка интервала soak: IOPS и перцентили задержки (мс)"""
+    percentiles = histogram_percentiles(histogram, SOAK_PERCENTILES)
+    summary = {"Period": label, "IOPS": f"{ios / seconds:.0f}" if seconds else "N/A"}
+    for percentile in SOAK_PERCENTILES:
+        value = percentiles.get(f"{percentile:g}")
+        summary[f"{percentile:g}th (ms)"] = f"{value / 1000:.3f}" if value is not None else "N/A"
+    summary["Worst Window 99th (ms)"] = (f"{worst_window_p99 / 1000:.3f}"
+                                         if worst_window_p99 is not None else "N/A")
+    return summary
+
+def read_stderr_file(path):
+    """Текст stderr процесса, сохраненного в файл (для сообщения об ошибке)"""
+    try:
+        with open(path, 'r', errors='replace') as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+def run_soak_test(test, testfile_path, size, results_dir, io_depth, test_name, hours=DEFAULT_SOAK_HOURS,
+                  interval=DEFAULT_SOAK_INTERVAL, window=DEFAULT_SOAK_WINDOW,
+                  summary_interval=DEFAULT_SOAK_SUMMARY_INTERVAL, keep=DEFAULT_SOAK_KEEP,
+                  ioengine=DEFAULT_IO_ENGINE, numjobs=DEFAULT_NUMJOBS, job_options=None):
+    """Длительная нагрузка с постоянным расходом памяти и диска.
+
+    fio каждые interval секунд выводит в stdout накопленный статус json+; разность гистограмм
+    соседних статусов дает гистограмму интервала. Хранятся только гистограммы с логарифмическими
+    интервалами (не более нескольких сотен значений): скользящее окно window секунд, текущий
+    период сводки и весь прогон. Записи по интервалам пишутся в файлы
+    soak_<тест>_intervals_<номер периода>.jsonl, из которых остаются последние keep;
+    сводки периодов (summary_interval, по умолчанию час) добавляются в soak_<тест>_summary.jsonl.
+    Возвращает строки основной таблицы, результат soak и признак успешного выполнения.
+    """
+    suite_safe = sanitize_filename(test_name)
+    runtime = int(hours * 3600)
+    summary_path = os.path.join(results_dir, f"soak_{suite_safe}_summary.jsonl")
+    command = build_fio_command(
+        f"Soak {test['name']}", testfile_path, size, test['rw'], test['bs'],
+        rwmixwrite=test.get("mix"), io_depth=io_depth, runtime=runtime, ioengine=ioengine,
+        extra_options={"status-interval": interval}, numjobs=numjobs, job_options=job_options,
+        output_format="json+"
+    )
+    print(f"Запуск длительной нагрузки: {test['name']}, {hours:g} ч, сводки каждые {summary_interval} сек...")
+
+    window_intervals = collections.deque(maxlen=max(1, window // interval))
+    run_histogram = {}
+    run_worst_p99 = None
+    period_histogram = {}
+    period_ios = 0
+    period_worst_p99 = None
+    period_index = 0
+    period_start = 0
+    previous_histogram = {}
+    totals = {"ios": 0, "bytes": 0, "lat_ns_sum": 0.0, "elapsed": 0}
+    summaries = []
+    intervals_file = None
+
+    def close_period():
+        nonlocal period_histogram, period_ios, period_worst_p99, period_index, period_start, intervals_file
+        elapsed = totals["elapsed"]
+        if period_ios:
+            summary = soak_summary(f"{format_elapsed(period_start)}-{format_elapsed(elapsed)}", period_histogram,
+                                   period_ios, elapsed - period_start, period_worst_p99)
+            summaries.append(summary)
+            with open(summary_path, 'a') as f:
+                f.write(json.dumps({**summary, "histogram": period_histogram}) + "\n")
+            print(f"📊 Soak {summary['Period']}: IOPS={summary['IOPS']}, 99th={summary['99th (ms)']} ms, "
+                  f"худшее окно 99th={summary['Worst Window 99th (ms)']} ms")
+        if intervals_file is not None:
+            intervals_file.close()
+            intervals_file = None
+        # Ротация: остаются файлы интервалов последних keep периодов
+        stale = os.path.join(results_dir, f"soak_{suite_safe}_intervals_{period_index - keep:04d}.jsonl")
+        if os.path.exists(stale):
+            os.remove(stale)
+        period_histogram, period_ios, period_worst_p99 = {}, 0, None
+        period_index += 1
+        period_start = elapsed
+
+    for name in os.listdir(results_dir):
+        if re.fullmatch(rf'soak_{re.escape(suite_safe)}_(summary|intervals_\d+)\.jsonl', name):
+            os.remove(os.path.join(results_dir, name))
+    # stderr многочасового fio пишется в файл: непрочитанный канал переполнится и остановит fio
+    stderr_path = os.path.join(results_dir, f"soak_{suite_safe}_stderr.txt")
+    with open(stderr_path, 'w') as stderr_file:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=stderr_file, text=True)
+    for status in fio_status_stream(process):
+        previous_ios = totals["ios"]
+        histogram, totals = fio_status_histogram(status)
+        delta = {bucket: count - previous_histogram.get(bucket, 0) for bucket, count in histogram.items()
+                 if count > previous_histogram.get(bucket, 0)}
+        delta_ios = totals["ios"] - previous_ios
+        previous_histogram = histogram
+        if not delta_ios:
+            continue
+
+        window_intervals.append(delta)
+        window_p99 = histogram_percentiles(merge_histograms(window_intervals), [99]).get("99")
+        if window_p99 is not None:
+            period_worst_p99 = max(period_worst_p99 or 0, window_p99)
+            run_worst_p99 = max(run_worst_p99 or 0, window_p99)
+        run_histogram = merge_histograms([run_histogram, delta])
+        period_histogram = merge_histograms([period_histogram, delta])
+        period_ios += delta_ios
+
+        if intervals_file is None:
+            intervals_path = os.path.join(results_dir, f"soak_{suite_safe}_intervals_{period_index:04d}.jsonl")
+            intervals_file = open(intervals_path, 'w')
+        intervals_file.write(json.dumps({"elapsed": totals["elapsed"], "ios": delta_ios,
+                                         "percentiles_usec": histogram_percentiles(delta, SOAK_PERCENTILES),
+                                         "window_p99_usec": window_p99}) + "\n")
+        intervals_file.flush()
+        # Последний период закрывается после итогового статуса fio
+        if summary_interval <= totals["elapsed"] - period_start and totals["elapsed"] < runtime:
+            close_period()
+
+    process.wait()
+    # Последний статус fio выводит при завершении; неполный период закрывается отдельно
+    close_period()
+    if process.returncode != 0:
+        print(f"Ошибка выполнения длительной нагрузки: {read_stderr_file(stderr_path)}")
+        return [], None, False
+    if not run_histogram or not totals["elapsed"]:
+        print("❌ fio не вывел ни одного статуса с задержками")
+        return [], None, False
+
+    elapsed = totals["elapsed"]
+    run_summary = soak_summary("whole run", run_histogram, totals["ios"], elapsed, run_worst_p99)
+    # Медленная деградация: изменение последнего периода относительно первого
+    drift = {}
+    if len(summaries) > 1:
+        first, last = summaries[0], summaries[-1]
+        for metric in ("IOPS", "99th (ms)"):
+            try:
+                drift[metric] = f"{(float(last[metric]) - float(first[metric])) / float(first[metric]) * 100:+.1f}"
+            except (ValueError, ZeroDivisionError):
+                drift[metric] = "N/A"
+
+    row = result_row(1, f"Soak {test['name']}", {
+        "IOPS": f"{totals['ios'] / elapsed / 1000:.1f}",
+        "Bandwidth (MiB/s)": f"{totals['bytes'] / elapsed / 1024 ** 2:.1f}",
+        "Latency (ms)": f"{totals['lat_ns_sum'] / totals['ios'] / 1e6:.2f}",
+        "Latency Details": {"lat_50th": run_summary["50th (ms)"], "lat_99th": run_summary["99th (ms)"],
+                            "lat_99_9th": run_summary["99.9th (ms)"]}
+    })
+    return [row], {"periods": summaries, "run": run_summary, "drift": drift,
+                   "phase": test['rw'], "hours": f"{elapsed / 3600:.1f}"}, True
+
+def empty_trace_summary(trace_format):
+    return {"format": trace_format, "reads": 0, "writes": 0, "trims": 0, "read_bytes": 0, "write_bytes": 0,
+            "max_end": 0, "max_length": 0, "duration": 0.0}
+
+def add_trace_io(summary, action, offset, length):
+    """Учитывает операцию трассы в сводке (action: read, write или trim)"""
+    summary[f"{action}s"] += 1
+    if action != "trim":
+        summary[f"{action}_bytes"] += length
+    summary["max_end"] = max(summary["max_end"], offset + length)
+    summary["max_length"] = max(summary["max_length"], length)
+
+def summarize_blktrace(path):
+    """Сводка двоичной трассы blktrace или None, если файл не является трассой blktrace.
+
+    Учитываются события постановки в очередь (Q) - их же воспроизводит fio. Трасса читается
+    через mmap, поэтому память не зависит от ее размера.
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size < struct.calcsize(BLKTRACE_EVENT):
+            return None
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    with data:
+        # Порядок байт трассы - порядок байт машины, на которой она записана
+        order = next((order for order in "<>"
+                      if struct.unpack_from(order + "I", data)[0] & 0xffffff00 == BLKTRACE_MAGIC), None)
+        if order is None:
+            return None
+        event = struct.Struct(order + BLKTRACE_EVENT)
+        summary = empty_trace_summary("blktrace")
+        first = last = None
+        offset = 0
+        while offset + event.size <= len(data):
+            magic, _, timestamp, sector, length, action, _, _, _, _, pdu_len = event.unpack_from(data, offset)
+            if magic & 0xffffff00 != BLKTRACE_MAGIC:
+                raise ValueError(f"{path}: поврежденное событие blktrace по смещению {offset}")
+            offset += event.size + pdu_len
+            if action & (BLK_TC_NOTIFY << BLK_TC_SHIFT) or action & 0xffff != BLK_TA_QUEUE or not length:
+                continue
+            if action & (BLK_TC_DISCARD << BLK_TC_SHIFT):
+                kind = "trim"
+            elif action & (BLK_TC_WRITE << BLK_TC_SHIFT):
+                kind = "write"
+            else:
+                kind = "read"
+            add_trace_io(summary, kind, sector * SECTOR_SIZE, length)
+            first = timestamp if first is None else first
+            last = timestamp
+    if first is not None:
+        summary["duration"] = (last - first) / 1e9
+    return summary
+
+def iolog_version(path):
+    """Версия журнала fio iolog (2 или 3) по заголовку или None"""
+    with open(path, 'r', errors='replace') as f:
+        match = re.fullmatch(r'fio version ([23]) iolog', f.readline().strip())
+    return int(match.group(1)) if match else None
+
+def iolog_entries(path, version):
+    """Строки журнала fio iolog: (метка времени в мс или None для v2, файл, действие, остальные поля)"""
+    with open(path, 'r', errors='replace') as f:
+        f.readline()
+        for line in f:
+            fields = line.split()
+            if version == 3 and len(fields) >= 3:
+                yield int(fields[0]), fields[1], fields[2], fields[3:]
+            elif version == 2 and len(fields) >= 2:
+                yield None, fields[0], fields[1], fields[2:]
+
+def summarize_iolog(path):
+    """Сводка журнала fio iolog v2/v3; длительность - по меткам времени (v3) или сумме wait (v2)"""
+    version = iolog_version(path)
+    if version is None:
+        raise ValueError(f"{path}: не трасса blktrace и не журнал fio iolog v2/v3")
+    summary = empty_trace_summary(f"fio iolog v{version}")
+    first = last = None
+    waited_usec = 0
+    for timestamp, _, action, values in iolog_entries(path, version):
+        if timestamp is not None:
+            first = timestamp if first is None else first
+            last = timestamp
+        if action == "wait" and values:
+            waited_usec += int(values[0])
+        elif action in ("read", "write", "trim") and len(values) >= 2:
+            add_trace_io(summary, action, int(values[0]), int(values[1]))
+    summary["duration"] = (last - first) / 1000 if first is not None else waited_usec / 1e6
+    return summary
+
+def summarize_trace(path):
+    """Сводка трассы blktrace или журнала fio: число и объем операций, длительность, максимальное смещение"""
+    summary = summarize_blktrace(path)
+    return summary if summary is not None else summarize_iolog(path)
+
+def trace_description(summary):
+    """Краткое описание трассы для отчета"""
+    ios = summary["reads"] + summary["writes"] + summary["trims"]
+    if not ios:
+        return f"{summary['format']}, операций нет"
+    description = (f"{summary['format']}, {ios} операций (чтение {summary['reads'] / ios * 100:.0f}%, "
+                   f"запись {summary['writes'] / ios * 100:.0f}%")
+    if summary["trims"]:
+        description += f", trim {summary['trims'] / ios * 100:.0f}%"
+    return (f"{description}), прочитано {summary['read_bytes'] / 1024 ** 3:.2f} GiB, записано "
+            f"{summary['write_bytes'] / 1024 ** 3:.2f} GiB, длительность {summary['duration']:.1f} сек")
+
+def run_trace_capture(device, trace_dir, seconds=DEFAULT_CAPTURE_SECONDS, command=None):
+    """Запись трассы блочного ввода-вывода устройства через blktrace (нужен sudo без пароля).
+
+    Трасса пишется seconds секунд, а если задана команда нагрузки - пока команда не завершится
+    (но не дольше seconds). Файлы blktrace по CPU объединяются blkparse в trace.bin, который fio
+    воспроизводит через read_iolog; сведения о записи и сводка трассы сохраняются в trace.json.
+    Возвращает сведения о трассе или None при ошибке.
+    """
+    if not os.path.exists(device) or not stat.S_ISBLK(os.stat(device).st_mode):
+        print(f"❌ {device} не является блочным устройством")
+        return None
+    create_directory(trace_dir)
+    capture = ["sudo", "-n", "blktrace", "-d", device, "-D", trace_dir, "-o", TRACE_NAME, "-w", str(seconds)]
+    print(f"Запись трассы {device} в {trace_dir} (не дольше {seconds} сек)...")
+    tracer = subprocess.Popen(capture, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    # Ошибки настройки (нет blktrace, debugfs или прав) blktrace сообщает сразу после запуска
+    time.sleep(1)
+    if tracer.poll() is not None and tracer.returncode != 0:
+        print(f"❌ Не удалось запустить blktrace: {tracer.stderr.read().strip()}")
+        return None
+
+    started = time.time()
+    workload_ok = True
+    if command:
+        print(f"Нагрузка: {command}")
+        workload_ok = subprocess.run(command, shell=True).returncode == 0
+        if not workload_ok:
+            print("⚠️  Команда нагрузки завершилась с ошибкой, трасса сохраняется")
+        if tracer.poll() is None:
+            # sudo передает сигнал blktrace, тот сбрасывает буферы и завершается
+            subprocess.run(["sudo", "-n", "kill", "-INT", str(tracer.pid)])
+    _, stderr = tracer.communicate()
+    elapsed = time.time() - started
+    if tracer.returncode != 0:
+        print(f"❌ blktrace завершился с ошибкой: {stderr.strip()}")
+        return None
+
+    trace_path = os.path.join(trace_dir, TRACE_FILE)
+    merge = ["sudo", "-n", "blkparse", "-i", TRACE_NAME, "-D", trace_dir, "-o", "/dev/null", "-d", trace_path]
+    result = subprocess.run(merge, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        print(f"❌ Не удалось объединить трассу (blkparse): {result.stderr.strip()}")
+        return None
+    # Файлы blktrace создаются от root
+    subprocess.run(["sudo", "-n", "chown", "-R", f"{os.getuid()}:{os.getgid()}", trace_dir])
+
+    summary = summarize_trace(trace_path)
+    info = {
+        "device": device,
+        "device_bytes": block_device_bytes(device),
+        "host": socket.gethostname(),
+        "captured": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "seconds": round(elapsed),
+        "command": command,
+        "workload_ok": workload_ok,
+        "summary": summary
+    }
+    with open(os.path.join(trace_dir, TRACE_INFO_FILE), 'w') as f:
+        json.dump(info, f, indent=2, ensure_ascii=False)
+    if summary["reads"] + summary["writes"] + summary["trims"] == 0:
+        print(f"⚠️  В трассе нет операций ввода-вывода: на {device} не было нагрузки")
+    print(f"✅ Трасса записана в {trace_path}: {trace_description(summary)}")
+    return info
+
+def load_trace(path):
+    """Файл трассы и сведения о ней: каталог записи (trace.bin и trace.json) или отдельный файл трассы"""
+    trace_path = os.path.join(path, TRACE_FILE) if os.path.isdir(path) else path
+    info_path = os.path.join(path, TRACE_INFO_FILE)
+    if os.path.isdir(path) and os.path.exists(info_path):
+        with open(info_path, 'r') as f:
+            return trace_path, json.load(f)
+    if not os.path.isfile(trace_path):
+        raise ValueError(f"трасса {trace_path} не найдена")
+    return trace_path, {"summary": summarize_trace(trace_path)}
+
+def replay_scale(summary, target_bytes):
+    """Во сколько раз уменьшить смещения трассы, чтобы все операции уместились в цель (None - не уместятся)"""
+    if summary["max_end"] <= target_bytes:
+        return 1
+    usable = target_bytes - summary["max_length"]
+    return math.ceil(summary["max_end"] / usable) if usable > 0 else None
+
+def replay_speed_options(speed):
+    """Параметры fio для скорости воспроизведения: множитель темпа трассы или max (без пауз)"""
+    if speed == "max":
+        return {"replay_no_stall": 1}
+    factor = float(speed)
+    if factor <= 0:
+        raise ValueError(f"скорость должна быть больше 0: {speed}")
+    # replay_time_scale - темп в процентах от исходного
+    return {"replay_time_scale": max(1, round(factor * 100))}
+
+def redirect_iolog(path, output_path, filename, scale=1):
+    """Копия журнала fio, в которой все операции идут в filename, а смещения уменьшены в scale раз.
+
+    Аналог replay_redirect и replay_scale для журналов iolog: файлы трассы объединяются в один,
+    поэтому он добавляется и открывается один раз, а закрывается самим fio в конце задания.
+    """
+    version = iolog_version(path)
+    declared = set()
+    with open(output_path, 'w') as out:
+        out.write(f"fio version {version} iolog\n")
+        for timestamp, _, action, values in iolog_entries(path, version):
+            if action == "close" or action in declared:
+                continue
+            if action in ("add", "open"):
+                declared.add(action)
+            elif action in ("read", "write", "trim") and len(values) >= 2 and scale > 1:
+                values = [str(int(values[0]) // scale // REPLAY_ALIGN * REPLAY_ALIGN), *values[1:]]
+            prefix = f"{timestamp} " if timestamp is not None else ""
+            out.write(f"{prefix}{filename} {action} {' '.join(values)}".rstrip() + "\n")
+
+def remote_command(host, command):
+    """Команда для выполнения на другой ВМ через ssh (доступ по ключу без пароля)"""
+    return ["ssh", "-o", "BatchMode=yes", "-o", "StrictHostKeyChecking=no", host, shlex.join(command)]
+
+def prepare_layout_file(path, size, host=None):
+    """Раскладывает тестовый файл (fio create_only), если его нет или он меньше size.
+
+    С host файл раскладывается на другой ВМ; fio сам пропускает раскладку файла достаточного размера.
+    """
+    if host is None and os.path.exists(path) and os.path.getsize(path) >= parse_size(size):
+        return True
+    print(f"Раскладка файла {path} ({size}){f' на {host}' if host else ''}...")
+    command = ['fio', '--name=layout', '--filename=' + path, '--size=' + size, '--create_only=1']
+    result = subprocess.run(remote_command(host, command) if host else command,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        print(f"❌ Не удалось разложить файл {path}: {result.stderr.strip()}")
+        return False
+    return True
+
+def run_trace_replay(trace_path, summary, replay_path, results_dir, test_name, speed=DEFAULT_REPLAY_SPEED,
+                     scale=1, io_depth=DEFAULT_IO_DEPTH, runtime=None, ioengine=DEFAULT_IO_ENGINE,
+                     job_options=None):
+    """Воспроизведение трассы на цели replay_path (файл или блочное устройство).
+
+    Трасса blktrace воспроизводится fio напрямую (replay_redirect, replay_scale), журнал iolog -
+    через копию с замененным файлом и смещениями. Интервалы между операциями сохраняются
+    с множителем speed. Возвращает строки основной таблицы и признак успешного выполнения.
+    """
+    label = f"Trace Replay x{speed}"
+    job = {"name": "replay", **IO_ENGINES[ioengine], "iodepth": io_depth, **replay_speed_options(speed)}
+    if 'direct' not in (job_options or {}):
+        job["direct"] = 1
+    if runtime is not None:
+        job["runtime"] = runtime
+
+    redirected = None
+    if summary["format"] == "blktrace":
+        job.update({"read_iolog": trace_path, "replay_redirect": replay_path})
+        if scale > 1:
+            job.update({"replay_scale": scale, "replay_align": REPLAY_ALIGN})
+    else:
+        redirected = os.path.join(results_dir, f"replay_{sanitize_filename(test_name)}.iolog")
+        redirect_iolog(trace_path, redirected, replay_path, scale)
+        job["read_iolog"] = redirected
+
+    print(f"\nВоспроизведение трассы {trace_path} на {replay_path} (скорость x{speed})")
+    try:
+        output_file = run_fio_jobs(label, [job], results_dir, test_name, global_options=job_options)
+    finally:
+        if redirected:
+            os.remove(redirected)
+    if output_file is None:
+        return [], False
+
+    parsed = parse_fio_jobs(output_file).get("replay")
+    if not parsed:
+        print(f"❌ В выводе fio нет результатов воспроизведения: {output_file}")
+        return [], False
+    if "read" in parsed:
+        return mixed_result_rows(1, label, parsed), True
+    direction = "Write" if summary["writes"] and not summary["reads"] else "Read"
+    return [result_row(1, f"{label} ({direction})", parsed)], True
+
+def result_row(test_number, test_name, parsed):
+    """Строка основной таблицы результатов"""
+    return {
+        "Test Number": test_number,
+        "Test Name": test_name,
+        "IOPS": parsed.get("IOPS", "N/A"),
+        "Bandwidth (MiB/s)": parsed.get("Bandwidth (MiB/s)", "N/A"),
+        "Latency (ms)": parsed.get("Latency (ms)", "N/A"),
+        "Latency Details": parsed.get("Latency Details", {})
+    }
+
+def mixed_result_rows(test_number, test_name, parsed):
+    """Две строки (запись и чтение) для смешанного теста"""
+    return [
+        result_row(test_number, test_name + " (Write)", parsed["write"]),
+        result_row(test_number, test_name + " (Read)", parsed["read"])
+    ]
     
-def run_pgbench_test():
-    """Запускает pgbench и возвращает результаты"""
-    print("\n" + "="*60)
-    print("=== Запуск pgbench (OLTP тест) ===")
-    print("="*60)
-    
-    # Проверка наличия pgbench
+def check_pgbench_available():
+    """Проверяет наличие pgbench и доступность PostgreSQL"""
     print("Проверка наличия pgbench...")
     which_result = subprocess.run(["which", "pgbench"], capture_output=True, text=True)
     if which_result.returncode != 0:
         print("❌ pgbench не установлен. Пропускаем тест.")
-        return None
+        return False
     print(f"✓ pgbench найден: {which_result.stdout.strip()}")
 
     # Проверка доступности БД (от имени postgres)
@@ -264,46 +1959,45 @@ def run_pgbench_test():
         print(f"   STDERR: {result.stderr}")
         if "sudo" in result.stderr.lower():
             print("   Подсказка: убедитесь, что у пользователя есть права sudo без пароля для postgres")
+        return False
+    print("✓ PostgreSQL доступен")
+    return True
+
+def pgbench_initialized_scale():
+    """Возвращает scale уже инициализированной базы pgbench (число строк pgbench_branches) или None"""
+    check_cmd = ["sudo", "-u", "postgres", "psql", "-tAc", "SELECT count(*) FROM pgbench_branches", "postgres"]
+    result = subprocess.run(check_cmd, capture_output=True, text=True)
+    if result.returncode != 0 or not result.stdout.strip().isdigit():
         return None
-    print("✓ PostgreSQL доступен")
-    
-    # Инициализация
-    print("Инициализация базы данных (scale=100)...")
+    return int(result.stdout.strip())
+
+def init_pgbench(scale=DEFAULT_PGBENCH_SCALE, reuse=False):
+    """Инициализирует тестовую базу pgbench.
+
+    При reuse=True инициализация пропускается, если база с тем же scale уже существует.
+    """
+    if reuse and pgbench_initialized_scale() == scale:
+        print(f"✓ База pgbench (scale={scale}) уже инициализирована, повторная инициализация пропущена")
+        return True
+    print(f"Инициализация базы данных (scale={scale})...")
     print("⚠️  Это может занять несколько минут...")
-    init_cmd = ["sudo", "-u", "postgres", "pgbench", "-i", "-s100", "postgres"]
+    init_cmd = ["sudo", "-u", "postgres", "pgbench", "-i", f"-s{scale}", "postgres"]
     result = subprocess.run(init_cmd, capture_output=True, text=True)
     if result.returncode != 0:
         print(f"❌ Ошибка инициализации pgbench:")
         print(f"   STDOUT: {result.stdout}")
         print(f"   STDERR: {result.stderr}")
-        return None
+        return False
     print("✓ Инициализация завершена")
     if result.stdout:
         print(f"   Вывод: {result.stdout.strip()}")
-    
-    # OLTP-тест
-    print("Запуск теста (clients=32, jobs=4, duration=600s)...")
-    print("⚠️  Тест будет выполняться 10 минут, прогресс каждые 30 секунд...")
-    test_cmd = ["sudo", "-u", "postgres", "pgbench", "-c32", "-j4", "-T600", "-P30", "postgres"]
-    result = subprocess.run(test_cmd, capture_output=True, text=True)
-    if result.returncode != 0:
-        print(f"❌ Ошибка выполнения pgbench:")
-        print(f"   STDOUT: {result.stdout}")
-        print(f"   STDERR: {result.stderr}")
-        return None
-    
-    # Вывод прогресса во время теста
-    if result.stdout:
-        print("\nПрогресс теста:")
-        for line in result.stdout.split('\n'):
-            if 'progress' in line.lower() or 'tps' in line.lower():
-                print(f"   {line}")
-    
-    # Парсинг
-    output = result.stdout
-    
+    return True
+
+def parse_pgbench_output(output):
+    """Разбирает вывод pgbench; возвращает словарь результатов или None"""
     # Основные метрики
-    tps = re.search(r'tps = ([\d.]+)', output)
+    # PostgreSQL 13 и старше выводят две строки tps: с учетом подключения (including) и без (excluding)
+    tps = re.search(r'tps = ([\d.]+) \((?:excluding|without)', output) or re.search(r'tps = ([\d.]+)', output)
     lat_avg = re.search(r'latency average = ([\d.]+) ms', output)
     lat_stddev = re.search(r'latency stddev = ([\d.]+) ms', output)
     
@@ -326,11 +2020,9 @@ def run_pgbench_test():
     conn_time = re.search(r'initial connection time = ([\d.]+) ms', output)
     
     if not tps or not lat_avg:
-        print("⚠️  Не удалось распарсить основные результаты pgbench")
-        print(f"Полный вывод:\n{output}")
         return None
     
-    pgbench_result = {
+    return {
         "TPS": tps.group(1) if tps else "N/A",
         "Latency Avg (ms)": lat_avg.group(1) if lat_avg else "N/A",
         "Latency Stddev (ms)": lat_stddev.group(1) if lat_stddev else "N/A",
@@ -341,6 +2033,193 @@ def run_pgbench_test():
         "Connection Time (ms)": conn_time.group(1) if conn_time else "N/A",
         "Percentiles": percentiles if percentiles else None
     }
+
+def pg_query_json(sql):
+    """Выполняет запрос от имени postgres, возвращающий одно значение JSON; None при ошибке"""
+    result = subprocess.run(["sudo", "-u", "postgres", "psql", "-tAc", sql, "postgres"],
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        return None
+    try:
+        return json.loads(result.stdout.strip() or "null")
+    except ValueError:
+        return None
+
+def pg_stat_queries(version):
+    """Запросы снимка pg_stat_* для версии сервера (server_version_num).
+
+    pg_stat_wal есть с PostgreSQL 14 (в 18 счетчики записи и синхронизации WAL перенесены в pg_stat_io),
+    pg_stat_io - с 16, счетчики контрольных точек в 17 перенесены из pg_stat_bgwriter в pg_stat_checkpointer.
+    """
+    queries = {
+        "database": "SELECT row_to_json(d) FROM (SELECT xact_commit, xact_rollback, blks_read, blks_hit, "
+                    "blk_read_time, blk_write_time, temp_bytes, deadlocks "
+                    "FROM pg_stat_database WHERE datname = current_database()) d",
+        "bgwriter": "SELECT row_to_json(b) FROM (SELECT buffers_clean, maxwritten_clean, buffers_alloc "
+                    "FROM pg_stat_bgwriter) b",
+        "settings": "SELECT json_build_object('track_io_timing', current_setting('track_io_timing'), "
+                    "'track_wal_io_timing', current_setting('track_wal_io_timing', true))",
+    }
+    if version >= 170000:
+        queries["checkpointer"] = (
+            "SELECT row_to_json(c) FROM (SELECT num_timed AS checkpoints_timed, num_requested AS checkpoints_req, "
+            "write_time AS checkpoint_write_time, sync_time AS checkpoint_sync_time, "
+            "buffers_written AS buffers_checkpoint FROM pg_stat_checkpointer) c")
+    else:
+        queries["checkpointer"] = (
+            "SELECT row_to_json(c) FROM (SELECT checkpoints_timed, checkpoints_req, checkpoint_write_time, "
+            "checkpoint_sync_time, buffers_checkpoint FROM pg_stat_bgwriter) c")
+    if version >= 180000:
+        queries["wal"] = (
+            "SELECT row_to_json(w) FROM (SELECT wal_records, wal_fpi, wal_bytes, wal_buffers_full, "
+            "(SELECT sum(writes) FROM pg_stat_io WHERE object = 'wal') AS wal_write, "
+            "(SELECT sum(fsyncs) FROM pg_stat_io WHERE object = 'wal') AS wal_sync, "
+            "(SELECT sum(write_time) FROM pg_stat_io WHERE object = 'wal') AS wal_write_time, "
+            "(SELECT sum(fsync_time) FROM pg_stat_io WHERE object = 'wal') AS wal_sync_time "
+            "FROM pg_stat_wal) w")
+    elif version >= 140000:
+        queries["wal"] = (
+            "SELECT row_to_json(w) FROM (SELECT wal_records, wal_fpi, wal_bytes, wal_buffers_full, wal_write, "
+            "wal_sync, wal_write_time, wal_sync_time FROM pg_stat_wal) w")
+    if version >= 160000:
+        queries["io"] = (
+            "SELECT json_object_agg(backend_type, json_build_object('reads', reads, 'writes', writes, "
+            "'extends', extends, 'fsyncs', fsyncs, 'read_time', read_time, 'write_time', write_time, "
+            "'fsync_time', fsync_time, 'hits', hits, 'evictions', evictions)) "
+            "FROM (SELECT backend_type, coalesce(sum(reads), 0) AS reads, coalesce(sum(writes), 0) AS writes, "
+            "coalesce(sum(extends), 0) AS extends, coalesce(sum(fsyncs), 0) AS fsyncs, "
+            "coalesce(sum(read_time), 0) AS read_time, coalesce(sum(write_time), 0) AS write_time, "
+            "coalesce(sum(fsync_time), 0) AS fsync_time, coalesce(sum(hits), 0) AS hits, "
+            "coalesce(sum(evictions), 0) AS evictions FROM pg_stat_io GROUP BY backend_type) s")
+    # pg_stat_statements доступен, только если расширение создано в базе postgres. Один queryid может
+    # иметь несколько строк (разные userid, toplevel в 14+), поэтому счетчики суммируются по queryid
+    total_time = "total_exec_time" if version >= 130000 else "total_time"
+    queries["statements"] = (
+        "SELECT json_object_agg(queryid, json_build_object('calls', calls, 'total_time', total_time, "
+        "'rows', rows, 'query', query)) "
+        f"FROM (SELECT queryid, sum(calls) AS calls, sum({total_time}) AS total_time, sum(rows) AS rows, "
+        "left(regexp_replace(min(query), '\\s+', ' ', 'g'), 80) AS query FROM pg_stat_statements "
+        "WHERE dbid = (SELECT oid FROM pg_database WHERE datname = current_database()) AND queryid IS NOT NULL "
+        "GROUP BY queryid) s")
+    return queries
+
+def pg_stats_snapshot():
+    """Снимок pg_stat_wal, pg_stat_io, pg_stat_bgwriter/pg_stat_checkpointer, pg_stat_database
+    и pg_stat_statements; представления, недоступные в этой версии, пропускаются. None, если сервер недоступен.
+    """
+    version = pg_query_json("SHOW server_version_num")
+    if not isinstance(version, int):
+        return None
+    snapshot = {"time": time.time(), "server_version_num": version}
+    for view, sql in pg_stat_queries(version).items():
+        result = pg_query_json(sql)
+        snapshot[view] = result if isinstance(result, dict) else None
+    return snapshot
+
+def pg_stats_delta(before, after):
+    """Разность снимков: числовые счетчики вычитаются, вложенные словари разбираются рекурсивно,
+    остальные значения (настройки, текст запроса) берутся из второго снимка
+    """
+    delta = {}
+    for key, value in after.items():
+        previous = before.get(key) if isinstance(before, dict) else None
+        if isinstance(value, dict):
+            delta[key] = pg_stats_delta(previous or {}, value)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            delta[key] = value - (previous if isinstance(previous, (int, float)) else 0)
+        else:
+            delta[key] = value
+    return delta
+
+def pg_stats_rates(delta, seconds):
+    """Производные показатели прогона pgbench по разности снимков pg_stat_*.
+
+    Времена WAL и чтения/записи блоков накапливаются только при track_wal_io_timing и track_io_timing,
+    без них соответствующие показатели - N/A.
+    """
+    database = delta.get("database") or {}
+    checkpointer = delta.get("checkpointer") or {}
+    wal = delta.get("wal") or {}
+    settings = delta.get("settings") or {}
+    commits = database.get("xact_commit") or 0
+
+    def ratio(numerator, denominator, fmt=".2f", scale=1):
+        if numerator is None or not denominator:
+            return "N/A"
+        return f"{numerator * scale / denominator:{fmt}}"
+
+    blocks = (database.get("blks_hit") or 0) + (database.get("blks_read") or 0)
+    wal_timing = settings.get("track_wal_io_timing") == "on"
+    io_timing = settings.get("track_io_timing") == "on"
+    client_io = (delta.get("io") or {}).get("client backend") or {}
+    return {
+        "WAL (MiB/s)": ratio(wal.get("wal_bytes"), seconds, scale=1 / 1024 ** 2),
+        "WAL per Commit (KiB)": ratio(wal.get("wal_bytes"), commits, scale=1 / 1024),
+        "WAL Syncs per Commit": ratio(wal.get("wal_sync"), commits, fmt=".3f"),
+        "WAL Sync Time per Commit (ms)": ratio(wal.get("wal_sync_time"), commits, fmt=".3f") if wal_timing else "N/A",
+        "Checkpoints": f"{checkpointer['checkpoints_timed'] + checkpointer['checkpoints_req']}"
+                       if "checkpoints_timed" in checkpointer else "N/A",
+        "Checkpoint Write Time (s)": ratio(checkpointer.get("checkpoint_write_time"), 1000),
+        "Checkpoint Sync Time (s)": ratio(checkpointer.get("checkpoint_sync_time"), 1000),
+        "Buffer Hit Ratio (%)": ratio(database.get("blks_hit"), blocks, scale=100),
+        "Disk Reads (blocks/s)": ratio(database.get("blks_read"), seconds, fmt=".0f"),
+        "Read Time per Block (ms)": ratio(database.get("blk_read_time"), database.get("blks_read"), fmt=".3f")
+                                    if io_timing else "N/A",
+        "Backend Writes (blocks/s)": ratio(client_io.get("writes"), seconds, fmt=".0f"),
+    }
+
+def pg_stats_report(before, after):
+    """Разность снимков, производные показатели и запросы с наибольшим суммарным временем за прогон"""
+    delta = pg_stats_delta(before, after)
+    seconds = delta.pop("time")
+    delta.pop("server_version_num")
+    statements = sorted(
+        ({"queryid": queryid, **stats} for queryid, stats in (delta.pop("statements", None) or {}).items()
+         if stats.get("calls")),
+        key=lambda stats: stats["total_time"], reverse=True
+    )
+    return {
+        "Server Version": after["server_version_num"],
+        "Seconds": round(seconds, 1),
+        "Rates": pg_stats_rates(delta, seconds),
+        "Delta": delta,
+        "Top Statements": [
+            {"queryid": stats["queryid"], "calls": stats["calls"], "total_time_ms": round(stats["total_time"], 1),
+             "mean_time_ms": round(stats["total_time"] / stats["calls"], 3), "query": stats["query"]}
+            for stats in statements[:PG_STAT_TOP_STATEMENTS]
+        ]
+    }
+
+def run_pgbench_benchmark(clients=DEFAULT_PGBENCH_CLIENTS, jobs=DEFAULT_PGBENCH_JOBS,
+                          duration=DEFAULT_PGBENCH_DURATION):
+    """Выполняет OLTP-тест pgbench на уже инициализированной базе"""
+    print(f"Запуск теста (clients={clients}, jobs={jobs}, duration={duration}s)...")
+    print(f"⚠️  Тест будет выполняться {duration} секунд, прогресс каждые 30 секунд...")
+    test_cmd = ["sudo", "-u", "postgres", "pgbench", f"-c{clients}", f"-j{jobs}", f"-T{duration}", "-P30", "postgres"]
+    stats_before = pg_stats_snapshot()
+    result = subprocess.run(test_cmd, capture_output=True, text=True)
+    stats_after = pg_stats_snapshot() if stats_before else None
+    if result.returncode != 0:
+        print(f"❌ Ошибка выполнения pgbench:")
+        print(f"   STDOUT: {result.stdout}")
+        print(f"   STDERR: {result.stderr}")
+        return None
+    
+    # Вывод прогресса во время теста (pgbench пишет прогресс в stderr)
+    progress = (result.stderr or "") + (result.stdout or "")
+    if progress:
+        print("\nПрогресс теста:")
+        for line in progress.split('\n'):
+            if 'progress' in line.lower() or 'tps' in line.lower():
+                print(f"   {line}")
+    
+    # Парсинг
+    output = result.stdout
+    pgbench_result = parse_pgbench_output(output)
+    if pgbench_result is None:
+        print("⚠️  Не удалось распарсить основные результаты pgbench")
+        print(f"Полный вывод:\n{output}")
+        return None
     
     print("\n✓ Тест pgbench завершен успешно")
     print(f"  TPS: {pgbench_result['TPS']}")
@@ -349,10 +2228,132 @@ def run_pgbench_test():
     print(f"  Обработано транзакций: {pgbench_result['Transactions Processed']}")
     if pgbench_result['Percentiles']:
         print(f"  Перцентили: {pgbench_result['Percentiles']}")
+
+    if stats_before and stats_after:
+        pgbench_result["PG Stats"] = pg_stats_report(stats_before, stats_after)
+        rates = pgbench_result["PG Stats"]["Rates"]
+        print(f"  WAL: {rates['WAL (MiB/s)']} MiB/s, контрольных точек: {rates['Checkpoints']}, "
+              f"попаданий в буферный кэш: {rates['Buffer Hit Ratio (%)']}%")
+    else:
+        print("⚠️  Снимки pg_stat_* не получены, внутренние показатели PostgreSQL не записаны")
     
     return pgbench_result
 
-def print_results_table(results, test_params, pgbench_result=None, output_file=None):
+def run_pgbench_test(scale=DEFAULT_PGBENCH_SCALE, clients=DEFAULT_PGBENCH_CLIENTS,
+                     jobs=DEFAULT_PGBENCH_JOBS, duration=DEFAULT_PGBENCH_DURATION, reuse=False):
+    """Запускает pgbench и возвращает результаты"""
+    print("\n" + "="*60)
+    print("=== Запуск pgbench (OLTP тест) ===")
+    print("="*60)
+    
+    if not check_pgbench_available():
+        return None
+    if not init_pgbench(scale, reuse=reuse):
+        return None
+    return run_pgbench_benchmark(clients, jobs, duration)
+
+def run_interference_test(test_dir, results_dir, test_suite_name, bg_rw=DEFAULT_BG_RW, bg_bs=DEFAULT_BG_BS,
+                          bg_rate=DEFAULT_BG_RATE, bg_size=DEFAULT_SIZE, bg_host=None,
+                          io_depth=DEFAULT_BG_IO_DEPTH, ioengine=DEFAULT_IO_ENGINE, numjobs=DEFAULT_NUMJOBS,
+                          scale=DEFAULT_PGBENCH_SCALE, clients=DEFAULT_PGBENCH_CLIENTS,
+                          jobs=DEFAULT_PGBENCH_JOBS, duration=DEFAULT_PGBENCH_DURATION, reuse=False):
+    """Влияние фоновой нагрузки fio на pgbench.
+
+    В рамках одного запуска выполняются два прогона pgbench на одной и той же инициализированной базе:
+    изолированный (базовая линия) и под фоновой нагрузкой fio. Фоновый fio запускается локально
+    или на другой ВМ того же хранилища через ssh (bg_host, нужен доступ по ключу без пароля).
+    Возвращает (результат pgbench под нагрузкой, сводка влияния) или (None, None) при ошибке.
+    """
+    print("\n" + "="*60)
+    print("=== Тест влияния фоновой нагрузки на pgbench ===")
+    print("="*60)
+
+    if not check_pgbench_available() or not init_pgbench(scale, reuse=reuse):
+        return None, None
+    # Файл фоновой нагрузки раскладывается заранее: иначе fio раскладывает его во время прогрева
+    # и нагруженного прогона, а отсчет runtime начинается только после раскладки
+    bg_file = 'testfile_bg' if bg_host else os.path.join(test_dir, 'testfile_bg')
+    if not prepare_layout_file(bg_file, bg_size, host=bg_host):
+        return None, None
+
+    print("\n--- Прогон 1: изолированный pgbench (базовая линия) ---")
+    baseline = run_pgbench_benchmark(clients, jobs, duration)
+    if baseline is None:
+        return None, None
+
+    # Фоновая нагрузка длится прогрев + весь прогон pgbench, затем fio завершается сам
+    bg_runtime = DEFAULT_BG_WARMUP + duration + 5
+    per_job_rate = max(1, int(round(bg_rate / numjobs))) if bg_rate else None
+    bg_command = build_fio_command(
+        "Background Load",
+        bg_file,
+        bg_size, bg_rw, bg_bs,
+        io_depth=io_depth,
+        runtime=bg_runtime,
+        ioengine=ioengine,
+        numjobs=numjobs,
+        extra_options={"rate_iops": per_job_rate, "rate_process": "poisson"} if per_job_rate else None
+    )
+    if bg_host:
+        bg_command = remote_command(bg_host, bg_command)
+
+    bg_description = f"{bg_rw} {bg_bs}, {f'{bg_rate} IOPS' if bg_rate else 'без ограничения'}, " \
+                     f"{bg_host or 'локально'}"
+    print(f"\n--- Прогон 2: pgbench под фоновой нагрузкой ({bg_description}) ---")
+    bg_output_file = fio_output_file("Background Load", results_dir, test_suite_name)
+    bg_stderr_path = re.sub(r'_results\.txt$', '_stderr.txt', bg_output_file)
+    with open(bg_output_file, 'w') as bg_output, open(bg_stderr_path, 'w') as bg_stderr:
+        bg_process = subprocess.Popen(bg_command, stdout=bg_output, stderr=bg_stderr)
+    print(f"Прогрев фоновой нагрузки {DEFAULT_BG_WARMUP} сек...")
+    time.sleep(DEFAULT_BG_WARMUP)
+    if bg_process.poll() is not None:
+        print("❌ Фоновый fio завершился раньше времени:")
+        print(read_stderr_file(bg_stderr_path))
+        return None, None
+
+    loaded = run_pgbench_benchmark(clients, jobs, duration)
+
+    # Не оставляем фоновую нагрузку работать после ошибки pgbench; на другой ВМ завершение ssh
+    # не останавливает fio, поэтому процесс завершается там отдельно
+    if loaded is None:
+        bg_process.terminate()
+        if bg_host:
+            subprocess.run(remote_command(bg_host, ['pkill', '-f', '--', '--filename=[t]estfile_bg']),
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    bg_process.wait()
+
+    if loaded is None:
+        return None, None
+    if bg_process.returncode != 0:
+        print("⚠️  Фоновый fio завершился с ошибкой:")
+        print(read_stderr_file(bg_stderr_path))
+
+    bg_iops = fio_total_iops(bg_output_file)
+
+    def change_pct(before, after):
+        try:
+            return f"{(float(after) - float(before)) / float(before) * 100:+.1f}"
+        except (TypeError, ValueError, ZeroDivisionError):
+            return "N/A"
+
+    interference = {
+        "Background Load": bg_description,
+        "Background IOPS": f"{bg_iops:.0f}" if bg_iops else "N/A",
+        "Baseline TPS": baseline["TPS"],
+        "Loaded TPS": loaded["TPS"],
+        "TPS Change (%)": change_pct(baseline["TPS"], loaded["TPS"]),
+        "Baseline Latency (ms)": baseline["Latency Avg (ms)"],
+        "Loaded Latency (ms)": loaded["Latency Avg (ms)"],
+        "Latency Change (%)": change_pct(baseline["Latency Avg (ms)"], loaded["Latency Avg (ms)"])
+    }
+    print(f"\nИзменение TPS под нагрузкой: {interference['TPS Change (%)']}%, "
+          f"задержки: {interference['Latency Change (%)']}%")
+    return loaded, interference
+
+def print_results_table(results, test_params, pgbench_result=None, output_file=None, sync_results=None,
+                        engine_results=None, openloop_results=None, slo_result=None,
+                        scaling_results=None, interference_result=None, precondition_results=None,
+                        sweep_results=None, missing_phases=None, page_cache_results=None, soak_result=None):
     date_header = f"Дата и время теста: {test_params['start_time']}\n\n"
     
     params_section = "Параметры теста:\n"
@@ -361,7 +2362,18 @@ def print_results_table(results, test_params, pgbench_result=None, output_file=N
     params_section += f"  • Размер блока данных, bytes: {test_params['bs']}\n"
     params_section += f"  • Процент операций записи в тесте RW: {test_params['mix']}%\n"
     params_section += f"  • Глубина очереди (IO depth): {test_params['io_depth']}\n"
-    params_section += f"  • Время выполнения тестов, сек: {test_params['runtime'] if test_params['runtime'] else 'Автоопределение'}\n\n"
+    params_section += f"  • Время выполнения тестов, сек: {test_params['runtime'] if test_params['runtime'] else 'Автоопределение'}\n"
+    params_section += f"  • Профиль нагрузки: {test_params.get('profile', 'standard')}\n"
+    params_section += f"  • Движок ввода-вывода: {test_params.get('ioengine', DEFAULT_IO_ENGINE)}\n"
+    params_section += f"  • Количество заданий (numjobs): {test_params.get('numjobs', DEFAULT_NUMJOBS)}\n"
+    params_section += f"  • Привязка к CPU: {test_params.get('cpu_pinning', 'none')}\n"
+    params_section += f"  • Шаблон данных: {test_params.get('data_pattern', DEFAULT_DATA_PATTERN)}\n"
+    params_section += f"  • Режим ввода-вывода: {test_params.get('io_mode', 'direct')}\n"
+    if test_params.get('targets'):
+        params_section += f"  • Цели ввода-вывода: {test_params['targets']}\n"
+    if test_params.get('trace'):
+        params_section += f"  • Трасса: {test_params['trace']}\n"
+    params_section += "\n"
     
     # Форматирование основной таблицы результатов
     main_header = f"Основные результаты тестов: {test_params['test_name']}\n"
@@ -427,6 +2439,190 @@ def print_results_table(results, test_params, pgbench_result=None, output_file=N
                 if avg_lat != "N/A":
                     result["Latency (ms)"] = avg_lat
 
+    # Таблица сравнения движков ввода-вывода
+    if engine_results:
+        engine_header = "\nСравнение движков ввода-вывода:"
+        engine_format = "{:<24} {:<12} {:<14} {:<12} {:<13} {:<13} {:<12}"
+        engine_columns = engine_format.format(
+            "Engine", "IOPS", "Latency (ms)", "99th (ms)", "CPU usr (%)", "CPU sys (%)", "CPU (us/IO)"
+        )
+        full_output += engine_header + "\n"
+        full_output += "=" * len(engine_columns) + "\n"
+        full_output += engine_columns + "\n"
+        full_output += "_" * len(engine_columns) + "\n"
+        for engine in engine_results:
+            full_output += engine_format.format(
+                engine["Engine"],
+                engine["IOPS"],
+                engine["Latency (ms)"],
+                engine["99th (ms)"],
+                engine["CPU usr (%)"],
+                engine["CPU sys (%)"],
+                engine["CPU (us/IO)"]
+            ) + "\n"
+
+    # Таблица открытой нагрузки (задержка в зависимости от предлагаемой нагрузки)
+    if openloop_results:
+        openloop_header = "\nЗадержка при фиксированной нагрузке (open-loop, poisson):"
+        openloop_format = "{:<10} {:<14} {:<15} {:<12} {:<12} {:<13} {:<6}"
+        openloop_columns = openloop_format.format(
+            "Level", "Target IOPS", "Achieved IOPS", "50th (ms)", "99th (ms)", "99.9th (ms)", "Met"
+        )
+        full_output += openloop_header + "\n"
+        full_output += "=" * len(openloop_columns) + "\n"
+        full_output += openloop_columns + "\n"
+        full_output += "_" * len(openloop_columns) + "\n"
+        for step in openloop_results:
+            full_output += openloop_format.format(
+                step["Level"],
+                step["Target IOPS"],
+                step["Achieved IOPS"],
+                step["50th (ms)"],
+                step["99th (ms)"],
+                step["99.9th (ms)"],
+                step["Met"]
+            ) + "\n"
+
+    # Показатели кэша страниц (буферизованный ввод-вывод)
+    if page_cache_results:
+        cache_header = "\nКэш страниц (буферизованный ввод-вывод, /proc/vmstat):"
+        cache_format = "{:<30} {:<10} {:<11} {:<16} {:<8} {:<14} {:<17} {:<17} {:<10}"
+        cache_columns = cache_format.format(
+            "Test Name", "Cache", "Read (MiB)", "Disk Read (MiB)", "Hit (%)", "Written (MiB)",
+            "Disk Write (MiB)", "Dirty Peak (MiB)", "WB Peak (MiB)"
+        )
+        full_output += cache_header + "\n"
+        full_output += "=" * len(cache_columns) + "\n"
+        full_output += cache_columns + "\n"
+        full_output += "_" * len(cache_columns) + "\n"
+        for stats in page_cache_results:
+            full_output += cache_format.format(
+                stats["Test Name"],
+                stats["Cache"],
+                stats["Read (MiB)"],
+                stats["Disk Read (MiB)"],
+                stats["Hit (%)"],
+                stats["Written (MiB)"],
+                stats["Disk Write (MiB)"],
+                stats["Dirty Peak (MiB)"],
+                stats["Writeback Peak (MiB)"]
+            ) + "\n"
+
+    # Предкондиционирование
+    if precondition_results:
+        full_output += "\nПредкондиционирование (заполнение + случайная перезапись до установившегося режима):\n"
+        for label, summary in precondition_results:
+            full_output += f"  • {label}: " + ", ".join(f"{key}={value}" for key, value in summary.items()) + "\n"
+
+    # Таблица зависимости от размера рабочего набора
+    if sweep_results:
+        sweep_header = "\nЗависимость от размера рабочего набора:"
+        sweep_format = "{:<10} {:<12} {:<12} {:<12} {:<12} {:<6}"
+        sweep_columns = sweep_format.format("Size", "Phase", "IOPS", "99th (ms)", "Change (%)", "Cliff")
+        full_output += sweep_header + "\n"
+        full_output += "=" * len(sweep_columns) + "\n"
+        full_output += sweep_columns + "\n"
+        full_output += "_" * len(sweep_columns) + "\n"
+        for step in sweep_results:
+            full_output += sweep_format.format(
+                step["Size"],
+                step["Phase"],
+                step["IOPS"],
+                step["99th (ms)"],
+                step["Change (%)"],
+                step["Cliff"]
+            ) + "\n"
+
+    # Длительная нагрузка: сводки по периодам и по всему прогону
+    if soak_result:
+        soak_header = f"\nДлительная нагрузка (soak, {soak_result['phase']}, {soak_result['hours']} ч):"
+        soak_format = "{:<14} {:<10} {:<11} {:<11} {:<13} {:<22}"
+        soak_columns = soak_format.format(
+            "Period", "IOPS", "50th (ms)", "99th (ms)", "99.9th (ms)", "Worst Window 99th (ms)"
+        )
+        full_output += soak_header + "\n"
+        full_output += "=" * len(soak_columns) + "\n"
+        full_output += soak_columns + "\n"
+        full_output += "_" * len(soak_columns) + "\n"
+        for summary in [*soak_result["periods"], soak_result["run"]]:
+            full_output += soak_format.format(
+                summary["Period"],
+                summary["IOPS"],
+                summary["50th (ms)"],
+                summary["99th (ms)"],
+                summary["99.9th (ms)"],
+                summary["Worst Window 99th (ms)"]
+            ) + "\n"
+        if soak_result["drift"]:
+            full_output += "Изменение за прогон (последний период к первому): " + ", ".join(
+                f"{metric} {value}" + ("%" if value != "N/A" else "") for metric, value in soak_result["drift"].items()
+            ) + "\n"
+
+    # Таблица масштабирования по числу заданий
+    if scaling_results:
+        scaling_header = "\nМасштабирование по числу заданий (numjobs):"
+        scaling_format = "{:<6} {:<12} {:<12} {:<16} {:<15} {}"
+        scaling_columns = scaling_format.format(
+            "Jobs", "IOPS", "IOPS/job", "Efficiency (%)", "Imbalance (%)", "Per-job IOPS"
+        )
+        full_output += scaling_header + "\n"
+        full_output += "=" * len(scaling_columns) + "\n"
+        full_output += scaling_columns + "\n"
+        full_output += "_" * len(scaling_columns) + "\n"
+        for step in scaling_results:
+            full_output += scaling_format.format(
+                step["Jobs"],
+                step["IOPS"],
+                step["IOPS/job"],
+                step["Efficiency (%)"],
+                step["Imbalance (%)"],
+                step["Per-job IOPS"]
+            ) + "\n"
+
+    # Результат поиска по SLO
+    if slo_result:
+        full_output += "\nМаксимальные IOPS при ограничении задержки (SLO):\n"
+        for key, value in slo_result.items():
+            full_output += f"  • {key}: {value}\n"
+
+    # Таблица задержки синхронной записи
+    if sync_results:
+        sync_header = "\nЗадержка синхронной записи (QD=1, одна синхронизация на запись):"
+        sync_format = "{:<12} {:<8} {:<12} {:<12} {:<12} {:<12} {:<12} {:<12}"
+        sync_columns = sync_format.format(
+            "Method", "BS", "Syncs/s", "Avg (ms)", "50th (ms)", "99th (ms)", "99.9th (ms)", "Max (ms)"
+        )
+        full_output += sync_header + "\n"
+        full_output += "=" * len(sync_columns) + "\n"
+        full_output += sync_columns + "\n"
+        full_output += "_" * len(sync_columns) + "\n"
+        for sync in sync_results:
+            details = sync["Sync Latency Details"]
+            full_output += sync_format.format(
+                sync["Method"],
+                sync["Block Size"],
+                sync["Syncs/s"],
+                details["lat_avg"],
+                details["lat_50th"],
+                details["lat_99th"],
+                details["lat_99_9th"],
+                details["lat_max"]
+            ) + "\n"
+
+    # Влияние фоновой нагрузки на pgbench
+    if interference_result:
+        full_output += "\n" + "="*60 + "\n"
+        full_output += "Влияние фоновой нагрузки на pgbench:\n"
+        full_output += "="*60 + "\n"
+        for key, value in interference_result.items():
+            full_output += f"{key}: {value}\n"
+
+    # Пропущенные этапы (отчет по частичным результатам)
+    if missing_phases:
+        full_output += "\nПропущенные этапы (частичные результаты):\n"
+        for phase in missing_phases:
+            full_output += f"  • {phase}\n"
+
     # Вывод результатов pgbench
     if pgbench_result:
         full_output += "\n" + "="*60 + "\n"
@@ -445,6 +2641,17 @@ def print_results_table(results, test_params, pgbench_result=None, output_file=N
             full_output += "\nПерцентили задержки:\n"
             for percentile, value in pgbench_result['Percentiles'].items():
                 full_output += f"  {percentile}: {value} ms\n"
+
+        pg_stats = pgbench_result.get('PG Stats')
+        if pg_stats:
+            full_output += f"\nВнутренние показатели PostgreSQL за прогон (pg_stat_*, {pg_stats['Seconds']} сек):\n"
+            for metric, value in pg_stats['Rates'].items():
+                full_output += f"  {metric}: {value}\n"
+            if pg_stats['Top Statements']:
+                full_output += "\nЗапросы с наибольшим суммарным временем (pg_stat_statements):\n"
+                for statement in pg_stats['Top Statements']:
+                    full_output += (f"  {statement['total_time_ms']:>12.1f} ms  {statement['calls']:>10} вызовов  "
+                                    f"{statement['query']}\n")
     else:
         full_output += "\n" + "="*60 + "\n"
         full_output += "pgbench: Тест не запускался или завершился с ошибкой\n"
@@ -460,7 +2667,595 @@ def print_results_table(results, test_params, pgbench_result=None, output_file=N
         except Exception as e:
             print(f"Ошибка при сохранении отчета: {str(e)}")
 
-def main():
+def fio_io_bytes(file_path):
+    """Объем прочитанных и записанных данных (байты) из файла вывода fio, по всем заданиям"""
+    totals = {"read": 0, "write": 0}
+    try:
+        with open(file_path, 'r') as file:
+            content = file.read()
+    except OSError:
+        return totals
+    for direction, amount in re.findall(r'(read|write): IOPS=.*?\(([\d.]+[KMGTP]?i?B)/\d+msec\)', content):
+        totals[direction] += parse_size(amount)
+    return totals
+
+def read_vmstat():
+    """Счетчики /proc/vmstat (пустой словарь, если недоступны)"""
+    try:
+        with open('/proc/vmstat', 'r') as f:
+            return {name: int(value) for name, value in (line.split() for line in f)}
+    except (OSError, ValueError):
+        return {}
+
+def sample_dirty_pages(stop_event, peaks):
+    """Фиксирует максимумы nr_dirty и nr_writeback, пока не установлен stop_event"""
+    while True:
+        vmstat = read_vmstat()
+        for counter in ("nr_dirty", "nr_writeback"):
+            peaks[counter] = max(peaks.get(counter, 0), vmstat.get(counter, 0))
+        if stop_event.wait(VMSTAT_SAMPLE_INTERVAL):
+            return
+
+def drop_page_cache():
+    """Сбрасывает грязные страницы на диск и очищает кэш страниц (нужен sudo без пароля)"""
+    subprocess.run(["sync"])
+    result = subprocess.run(["sudo", "-n", "sh", "-c", "echo 3 > /proc/sys/vm/drop_caches"],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        print(f"⚠️  Не удалось сбросить кэш страниц: {result.stderr.strip()}")
+        return False
+    return True
+
+def prewarm_page_cache(path, size, prewarm_pct=DEFAULT_PREWARM_PCT):
+    """Читает первые prewarm_pct% тестового файла через кэш страниц; возвращает объем в байтах"""
+    try:
+        target = min(os.path.getsize(path), parse_size(size)) * prewarm_pct // 100
+    except OSError:
+        print(f"⚠️  Тестовый файл {path} еще не создан, прогрев кэша пропущен")
+        return 0
+    warmed = 0
+    with open(path, 'rb') as f:
+        while warmed < target:
+            chunk = f.read(min(PREWARM_CHUNK, target - warmed))
+            if not chunk:
+                break
+            warmed += len(chunk)
+    return warmed
+
+def prepare_page_cache(testfile_path, size, cache_state="cold", prewarm_pct=DEFAULT_PREWARM_PCT):
+    """Приводит кэш страниц в заданное состояние перед этапом; возвращает метку состояния"""
+    dropped = drop_page_cache()
+    label = "cold" if dropped else "as-is"
+    if cache_state == "warm":
+        warmed = prewarm_page_cache(testfile_path, size, prewarm_pct)
+        label = f"warm {prewarm_pct}%"
+        print(f"Кэш страниц прогрет: {warmed / 1024 ** 2:.0f} MiB")
+    return label
+
+def page_cache_stats(before, after, peaks, io_bytes):
+    """Показатели кэша страниц за этап по разности /proc/vmstat и объему ввода-вывода fio.
+
+    Доля попаданий при чтении - 1 - (прочитано с блочных устройств / прочитано fio); pgpgin
+    учитывает всю систему и упреждающее чтение, поэтому оценка консервативна.
+    """
+    mib = 1024 ** 2
+    page_size = os.sysconf('SC_PAGE_SIZE')
+    disk_read = (after.get("pgpgin", 0) - before.get("pgpgin", 0)) * 1024
+    disk_write = (after.get("pgpgout", 0) - before.get("pgpgout", 0)) * 1024
+    hit = max(0.0, 1 - disk_read / io_bytes["read"]) * 100 if io_bytes["read"] else None
+    return {
+        "Read (MiB)": f"{io_bytes['read'] / mib:.0f}",
+        "Disk Read (MiB)": f"{disk_read / mib:.0f}",
+        "Hit (%)": f"{hit:.1f}" if hit is not None else "N/A",
+        "Written (MiB)": f"{io_bytes['write'] / mib:.0f}",
+        "Disk Write (MiB)": f"{disk_write / mib:.0f}",
+        "Dirty Peak (MiB)": f"{peaks.get('nr_dirty', 0) * page_size / mib:.0f}",
+        "Writeback Peak (MiB)": f"{peaks.get('nr_writeback', 0) * page_size / mib:.0f}"
+    }
+
+def page_cache_stats_file(output_file):
+    """Файл показателей кэша страниц рядом с выводом fio этапа (для --resume)"""
+    return re.sub(r'_results\.txt$', '_page_cache.json', output_file)
+
+def run_params_file(output_file):
+    """Файл параметров запуска рядом с выводом этапа (для проверки при --resume)"""
+    return re.sub(r'_(results\.txt|result\.json)$', '_params.json', output_file)
+
+def save_run_params(output_file, params):
+    """Сохраняет параметры, с которыми получен вывод этапа"""
+    with open(run_params_file(output_file), 'w') as f:
+        json.dump(params, f, ensure_ascii=False, indent=1, sort_keys=True)
+
+def saved_output_matches(output_file, params):
+    """Проверяет, что сохраненный вывод этапа получен с теми же параметрами запуска.
+
+    Вывод без файла параметров (прежняя версия скрипта) или с другими параметрами
+    (другая кампания с тем же названием теста) повторно не используется.
+    """
+    params_file = run_params_file(output_file)
+    saved = None
+    if os.path.exists(params_file):
+        try:
+            with open(params_file, 'r') as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            pass
+    if saved == json.loads(json.dumps(params)):
+        return True
+    print(f"\n⚠️  {output_file} получен с другими параметрами запуска, этап выполняется заново")
+    return False
+
+def run_standard_suite(tests, testfile_path, size, results_dir, io_depth, runtime, test_name,
+                       ioengine=DEFAULT_IO_ENGINE, numjobs=DEFAULT_NUMJOBS, job_options=None,
+                       precondition=None, precondition_results=None, resume=False,
+                       page_cache=None, page_cache_results=None, targets=None):
+    """Последовательно выполняет этапы стандартного набора fio.
+
+    Если заданы параметры precondition, перед каждым этапом выполняется предкондиционирование,
+    сводки добавляются в precondition_results. Если задан page_cache (буферизованный режим),
+    перед этапом кэш страниц приводится в заданное состояние, показатели кэша добавляются
+    в page_cache_results. При resume этапы, для которых в results_dir уже есть корректный
+    вывод fio предыдущей попытки с тем же названием теста и теми же параметрами запуска,
+    не повторяются.
+    Если заданы targets (несколько целей), каждый этап выполняется на всех целях одновременно,
+    строки результатов выводятся по каждой цели ("Random Read [wal]").
+    Возвращает строки основной таблицы и список названий этапов, завершившихся с ошибкой.
+    """
+    results = []
+    failed_phases = []
+
+    for index, test in enumerate(tests, start=1):
+        output_file = fio_output_file(test['name'], results_dir, test_name)
+        params = {"rw": test['rw'], "bs": test['bs'], "mix": test.get("mix"), "size": size,
+                  "io_depth": io_depth, "runtime": runtime, "ioengine": ioengine, "numjobs": numjobs,
+                  "job_options": job_options or {}, "precondition": precondition, "page_cache": page_cache,
+                  "targets": [target_file(target) for target in targets] if targets else [testfile_path]}
+        if (resume and os.path.exists(output_file) and fio_total_iops(output_file)
+                and saved_output_matches(output_file, params)):
+            print(f"\n⏭️  Тест {index}: {test['name']} уже выполнен, используется {output_file}")
+            stats_file = page_cache_stats_file(output_file)
+            if page_cache_results is not None and os.path.exists(stats_file):
+                with open(stats_file, 'r') as f:
+                    page_cache_results.append(json.load(f))
+        elif run_suite_phase(index, test, testfile_path, size, results_dir, io_depth, runtime, test_name,
+                             ioengine, numjobs, job_options, precondition, precondition_results,
+                             page_cache, page_cache_results, targets):
+            save_run_params(output_file, params)
+        else:
+            failed_phases.append(test['name'])
+            continue
+
+        if targets:
+            job_results = parse_fio_jobs(output_file)
+            for target in targets:
+                results.extend(job_result_rows(index, f"{test['name']} [{target['name']}]",
+                                               target['name'], job_results))
+        elif test['rw'] == 'randrw':
+            mixed_results = parse_fio_results(output_file, is_mixed=True)
+            results.extend(mixed_result_rows(index, test['name'], mixed_results))
+        else:
+            test_results = parse_fio_results(output_file)
+            results.append(result_row(index, test['name'], test_results))
+
+    return results, failed_phases
+
+def run_suite_phase(index, test, testfile_path, size, results_dir, io_depth, runtime, test_name,
+                    ioengine=DEFAULT_IO_ENGINE, numjobs=DEFAULT_NUMJOBS, job_options=None,
+                    precondition=None, precondition_results=None, page_cache=None, page_cache_results=None,
+                    targets=None):
+    """Выполняет один этап стандартного набора (с предкондиционированием и подготовкой кэша, если они заданы)"""
+    if precondition is not None:
+        for target in targets or [None]:
+            summary = run_precondition(target_file(target) if target else testfile_path, size, results_dir,
+                                       test_name, ioengine=ioengine, numjobs=numjobs, job_options=job_options,
+                                       **precondition)
+            if summary is None:
+                return False
+            if precondition_results is not None:
+                label = f"{test['name']} [{target['name']}]" if target else test['name']
+                precondition_results.append((label, summary))
+    print(f"\nТест {index}: {test['name']}")
+    if targets:
+        return run_targets_fio(test, targets, size, results_dir, io_depth, runtime, test_name,
+                               ioengine, numjobs, job_options)
+    if page_cache is None:
+        return run_phase_fio(test, testfile_path, size, results_dir, io_depth, runtime, test_name,
+                             ioengine, numjobs, job_options)
+
+    cache_label = prepare_page_cache(testfile_path, size, **page_cache)
+    before = read_vmstat()
+    peaks = {}
+    stop_sampling = threading.Event()
+    sampler = threading.Thread(target=sample_dirty_pages, args=(stop_sampling, peaks), daemon=True)
+    sampler.start()
+    ok = run_phase_fio(test, testfile_path, size, results_dir, io_depth, runtime, test_name,
+                       ioengine, numjobs, job_options)
+    stop_sampling.set()
+    sampler.join()
+    if not ok or not before:
+        return ok
+
+    output_file = fio_output_file(test['name'], results_dir, test_name)
+    stats = {"Test Name": test['name'], "Cache": cache_label,
+             **page_cache_stats(before, read_vmstat(), peaks, fio_io_bytes(output_file))}
+    with open(page_cache_stats_file(output_file), 'w') as f:
+        json.dump(stats, f, ensure_ascii=False, indent=1)
+    if page_cache_results is not None:
+        page_cache_results.append(stats)
+    return ok
+
+def run_phase_fio(test, testfile_path, size, results_dir, io_depth, runtime, test_name,
+                  ioengine=DEFAULT_IO_ENGINE, numjobs=DEFAULT_NUMJOBS, job_options=None):
+    """Запуск fio для этапа стандартного набора"""
+    return run_fio_test(
+        test_name=test['name'],
+        filename=testfile_path,
+        size=size,
+        rw=test['rw'],
+        bs=test['bs'],
+        rwmixwrite=test.get("mix"),
+        results_dir=results_dir,
+        io_depth=io_depth,
+        runtime=runtime,
+        test_suite_name=test_name,
+        ioengine=ioengine,
+        numjobs=numjobs,
+        job_options=job_options
+    )
+
+def run_targets_fio(test, targets, size, results_dir, io_depth, runtime, test_name,
+                    ioengine=DEFAULT_IO_ENGINE, numjobs=DEFAULT_NUMJOBS, job_options=None):
+    """Этап стандартного набора одновременно на нескольких целях: по заданию fio на цель.
+
+    Задания одного процесса fio стартуют вместе; каждое задание - отдельная группа отчета
+    (new_group), поэтому клоны numjobs суммируются в пределах цели, а цели выводятся раздельно.
+    """
+    jobs = []
+    for target in targets:
+        job = {
+            "name": target['name'],
+            "filename": target_file(target),
+            "size": size,
+            "rw": test['rw'],
+            "bs": test['bs'],
+            **IO_ENGINES[ioengine],
+            "iodepth": io_depth,
+            "numjobs": numjobs,
+            "new_group": 1,
+        }
+        if test.get("mix") is not None:
+            job["rwmixwrite"] = test["mix"]
+        jobs.append(job)
+    global_options = {"direct": 1, "group_reporting": 1, "disable_clat": 0, "log_avg_msec": 1000}
+    if runtime is not None:
+        global_options.update({"runtime": runtime, "time_based": 1})
+    global_options.update(job_options or {})
+    return run_fio_jobs(test['name'], jobs, results_dir, test_suite_name=test_name,
+                        global_options=global_options) is not None
+
+def run_pgbench_resumable(results_dir, test_suite_name, resume=False, **pgbench_args):
+    """Запускает pgbench, сохраняя результат в results_dir.
+
+    При resume берет сохраненный результат, если он получен с теми же параметрами pgbench.
+    """
+    result_file = os.path.join(results_dir, f"pgbench_{sanitize_filename(test_suite_name)}_result.json")
+    params = {key: value for key, value in pgbench_args.items() if key != "reuse"}
+    if resume and os.path.exists(result_file) and saved_output_matches(result_file, params):
+        with open(result_file, 'r') as f:
+            print(f"\n⏭️  pgbench уже выполнен, используется {result_file}")
+            return json.load(f)
+    pgbench_result = run_pgbench_test(**pgbench_args)
+    if pgbench_result is not None:
+        with open(result_file, 'w') as f:
+            json.dump(pgbench_result, f, ensure_ascii=False, indent=1)
+        save_run_params(result_file, params)
+    return pgbench_result
+
+def latency_bucket(value_usec):
+    """Номер логарифмического интервала гистограммы задержки (LATENCY_BUCKETS_PER_OCTAVE на удвоение)"""
+    return int(math.floor(math.log2(max(value_usec, 1.0)) * LATENCY_BUCKETS_PER_OCTAVE))
+
+def latency_bucket_upper(bucket):
+    """Верхняя граница интервала гистограммы, мкс"""
+    return 2 ** ((bucket + 1) / LATENCY_BUCKETS_PER_OCTAVE)
+
+def histogram_percentiles(histogram, percentiles=LATENCY_SUMMARY_PERCENTILES):
+    """Перцентили задержки (мкс, по верхней границе интервала) по гистограмме {интервал: количество}"""
+    total = sum(histogram.values())
+    result = {}
+    if not total:
+        return result
+    buckets = sorted(histogram.items())
+    for percentile in percentiles:
+        threshold = total * percentile / 100
+        cumulative = 0
+        for bucket, count in buckets:
+            cumulative += count
+            if cumulative >= threshold:
+                result[f"{percentile:g}"] = round(latency_bucket_upper(bucket), 1)
+                break
+    return result
+
+def summarize_latency_log(path):
+    """Сводка журнала задержки fio: гистограмма, перцентили и посекундные агрегаты.
+
+    Строка журнала: время (мс), значение (нс), направление, размер блока, ...
+    Файл читается построчно, память не зависит от размера журнала.
+    """
+    histogram = {}
+    per_second = {}
+    count = 0
+    total = 0.0
+    maximum = 0.0
+    with open(path, 'r', errors='replace') as f:
+        for line in f:
+            fields = line.split(',')
+            if len(fields) < 2:
+                continue
+            try:
+                time_ms = int(fields[0])
+                value_usec = int(fields[1]) / 1000
+            except ValueError:
+                continue
+            bucket = latency_bucket(value_usec)
+            histogram[bucket] = histogram.get(bucket, 0) + 1
+            count += 1
+            total += value_usec
+            maximum = max(maximum, value_usec)
+            second = per_second.setdefault(time_ms // 1000, [0, 0.0, 0.0])
+            second[0] += 1
+            second[1] += value_usec
+            second[2] = max(second[2], value_usec)
+
+    return {
+        "bytes": os.path.getsize(path),
+        "samples": count,
+        "mean_usec": round(total / count, 1) if count else None,
+        "max_usec": round(maximum, 1),
+        "percentiles_usec": histogram_percentiles(histogram),
+        "histogram": {str(bucket): histogram[bucket] for bucket in sorted(histogram)},
+        # [секунда, число записей, средняя задержка, максимальная задержка]
+        "per_second": [[second, values[0], round(values[1] / values[0], 1), round(values[2], 1)]
+                       for second, values in sorted(per_second.items())]
+    }
+
+def write_results_archive(stream, results_dir, include_raw=False, since=None):
+    """Пишет в поток tar.gz с результатами, сводкой журналов задержки и контрольными суммами.
+
+    Архив формируется потоково (без временного файла). Сырые журналы fio (каталог logs/)
+    попадают в архив только при include_raw, сводка по ним (latency_summary.json) - всегда.
+    since - unix-время: учитываются только файлы, измененные не раньше него.
+    Последним в архив записывается SHA256SUMS (формат sha256sum -c).
+    """
+    logs_dir = os.path.join(results_dir, LATENCY_LOG_DIR)
+    checksums = []
+    summary = {"raw_included": include_raw, "logs": {}}
+
+    def add_bytes(tar, name, data):
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = int(time.time())
+        tar.addfile(info, io.BytesIO(data))
+        checksums.append(f"{hashlib.sha256(data).hexdigest()}  {name}")
+
+    with tarfile.open(fileobj=stream, mode='w|gz') as tar:
+        for root, _, files in os.walk(results_dir):
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                if since is not None and os.path.getmtime(path) < since:
+                    continue
+                arcname = os.path.relpath(path, results_dir)
+                is_raw_log = os.path.commonpath([path, logs_dir]) == logs_dir
+                if is_raw_log:
+                    summary["logs"][arcname] = summarize_latency_log(path)
+                    if not include_raw:
+                        continue
+                digest = hashlib.sha256()
+                with open(path, 'rb') as f:
+                    for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                        digest.update(chunk)
+                tar.add(path, arcname=arcname)
+                checksums.append(f"{digest.hexdigest()}  {arcname}")
+
+        if summary["logs"]:
+            add_bytes(tar, "latency_summary.json", json.dumps(summary, indent=1).encode())
+        manifest = ("\n".join(checksums) + "\n").encode()
+        info = tarfile.TarInfo("SHA256SUMS")
+        info.size = len(manifest)
+        info.mtime = int(time.time())
+        tar.addfile(info, io.BytesIO(manifest))
+
+def agent_job_options():
+    """Параметры командной строки, разрешенные в заданиях агента"""
+    return {option for action in build_arg_parser()._actions for option in action.option_strings
+            if option.startswith("--") and option != "--help" and option not in AGENT_FORBIDDEN_ARGS
+            and not option.startswith(AGENT_FORBIDDEN_PREFIXES)}
+
+def agent_job_problem(job_args, allowed):
+    """Причина отказа в задании агента или None.
+
+    Каждый параметр задания должен быть полным именем из разрешенного списка (сокращения argparse
+    не принимаются); значения, начинающиеся с "-", допускаются только числовые.
+    """
+    for arg in job_args:
+        if not arg.startswith("-") or re.fullmatch(r'-\d+(\.\d+)?', arg):
+            continue
+        option = arg.split("=", 1)[0]
+        if option not in allowed:
+            return f"параметр {option} в задании агента недопустим"
+    return None
+
+def run_agent(bind=DEFAULT_AGENT_BIND, port=DEFAULT_AGENT_PORT, home=None, token=None):
+    """Режим агента: HTTP-сервер, принимающий задания на запуск этого скрипта.
+
+    Агент работает на ВМ все время кампании, поэтому тестовый файл и база pgbench
+    сохраняются между итерациями. Эндпоинты:
+      GET  /status - состояние агента (JSON);
+      POST /run    - задание {"args": [...], "start_at": unix-время}; ответ - поток NDJSON-записей
+                     started, progress (строка вывода) и result (код возврата и содержимое results_sheet);
+      GET  /collect?raw=1&since=<unix-время> - архив результатов tar.gz (см. write_results_archive).
+    Одновременно выполняется одно задание, на занятом агенте /run возвращает 409.
+    Задание может содержать только параметры из agent_job_options(); на сетевом адресе
+    агент без токена не запускается.
+    """
+    if not token and bind not in AGENT_LOOPBACK:
+        print(f"❌ Агент на адресе {bind} доступен по сети: задайте токен (--agent-token-file)")
+        sys.exit(1)
+    allowed_options = agent_job_options()
+    home = os.path.abspath(home or os.getenv("HOME"))
+    results_dir = os.path.join(home, 'results')
+    create_directory(results_dir)
+    script_path = os.path.abspath(__file__)
+    lock = threading.Lock()
+    state = {
+        "host": socket.gethostname(),
+        "home": home,
+        "busy": False,
+        "job": None,
+        "jobs_completed": 0,
+        "last_returncode": None
+    }
+
+    class AgentHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            print(f"[агент] {self.address_string()} {format % args}")
+
+        def send_json(self, code, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def authorized(self):
+            if token and self.headers.get("X-Agent-Token") != token:
+                self.send_json(403, {"error": "неверный токен агента"})
+                return False
+            return True
+
+        def do_GET(self):
+            if not self.authorized():
+                return
+            path, _, query = self.path.partition("?")
+            if path == "/collect":
+                params = urllib.parse.parse_qs(query)
+                try:
+                    since = float(params["since"][0]) if "since" in params else None
+                except ValueError:
+                    self.send_json(400, {"error": "некорректный параметр since"})
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/gzip")
+                self.end_headers()
+                write_results_archive(self.wfile, results_dir, include_raw=params.get("raw") == ["1"], since=since)
+                return
+            if path != "/status":
+                self.send_json(404, {"error": f"неизвестный путь {self.path}"})
+                return
+            with lock:
+                status = dict(state)
+            testfile = os.path.join(home, 'testfile')
+            status["testfile_bytes"] = os.path.getsize(testfile) if os.path.exists(testfile) else 0
+            self.send_json(200, status)
+
+        def do_POST(self):
+            if not self.authorized():
+                return
+            if self.path != "/run":
+                self.send_json(404, {"error": f"неизвестный путь {self.path}"})
+                return
+            try:
+                job = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                job_args = [str(arg) for arg in job.get("args", [])]
+                start_at = float(job["start_at"]) if job.get("start_at") is not None else None
+            except (ValueError, TypeError, AttributeError):
+                self.send_json(400, {"error": "некорректное задание"})
+                return
+            problem = agent_job_problem(job_args, allowed_options)
+            if problem:
+                self.send_json(400, {"error": problem})
+                return
+
+            with lock:
+                if state["busy"]:
+                    self.send_json(409, {"error": "агент занят", "job": state["job"]})
+                    return
+                state["busy"] = True
+                state["job"] = " ".join(job_args)
+            try:
+                returncode = self.stream_job(job_args, start_at)
+            finally:
+                with lock:
+                    state["busy"] = False
+                    state["job"] = None
+            with lock:
+                state["jobs_completed"] += 1
+                state["last_returncode"] = returncode
+
+        def stream_job(self, job_args, start_at):
+            """Выполняет задание, передавая вывод клиенту по мере появления"""
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.end_headers()
+            connected = True
+
+            def emit(record):
+                nonlocal connected
+                if not connected:
+                    return
+                try:
+                    self.wfile.write((json.dumps(record, ensure_ascii=False) + "\n").encode())
+                    self.wfile.flush()
+                except OSError:
+                    # Клиент отключился - задание выполняется до конца, результаты остаются на ВМ
+                    connected = False
+
+            # Общее время старта выравнивает начало заданий на всех ВМ (часы ВМ синхронизированы по NTP)
+            if start_at is not None:
+                delay = start_at - time.time()
+                if 0 < delay <= AGENT_MAX_START_DELAY:
+                    emit({"type": "waiting", "delay": round(delay, 3)})
+                    time.sleep(delay)
+
+            command = [sys.executable, script_path, *job_args]
+            if "--reuse-pgbench" not in job_args:
+                command.append("--reuse-pgbench")
+            env = dict(os.environ, HOME=home, PYTHONUNBUFFERED="1", PYTHONIOENCODING="utf-8")
+            started = time.time()
+            emit({"type": "started", "host": state["host"], "time": started})
+            process = subprocess.Popen(command, cwd=home, env=env, stdin=subprocess.DEVNULL,
+                                       stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                       text=True, encoding="utf-8", errors="replace")
+            for line in process.stdout:
+                emit({"type": "progress", "line": line.rstrip("\n")})
+            returncode = process.wait()
+
+            sheets = {}
+            for name in sorted(os.listdir(results_dir)):
+                path = os.path.join(results_dir, name)
+                if name.startswith("results_sheet_") and os.path.getmtime(path) >= started:
+                    with open(path, 'r', encoding="utf-8", errors="replace") as f:
+                        sheets[name] = f.read()
+            emit({
+                "type": "result",
+                "returncode": returncode,
+                "elapsed": round(time.time() - started, 2),
+                "results_sheets": sheets
+            })
+            return returncode
+
+    server = ThreadingHTTPServer((bind, port), AgentHandler)
+    print(f"🤖 Агент запущен на {bind}:{port}, рабочий каталог {home}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nАгент остановлен")
+    finally:
+        server.server_close()
+
+def build_arg_parser():
+    """Параметры командной строки (используются также планировщиком кампаний campaign_plan.py)"""
     parser = argparse.ArgumentParser(description="fio тестирование дисковой подсистемы")
     parser.add_argument('--test-name', type=str, default=None, help="Название теста")
     parser.add_argument('--size', type=str, default=DEFAULT_SIZE, help=f"Размер файла (по умолчанию {DEFAULT_SIZE})")
@@ -469,11 +3264,235 @@ def main():
     parser.add_argument('--io-depth', type=int, default=DEFAULT_IO_DEPTH, help=f"Глубина очереди (по умолчанию {DEFAULT_IO_DEPTH})")
     parser.add_argument('--runtime', type=int, default=None, help="Время выполнения в секундах (опционально)")
     parser.add_argument('--run-pgbench', action='store_true', help="Запустить pgbench после fio")
-    args = parser.parse_args()
+    parser.add_argument('--target', action='append', default=None, metavar='ИМЯ=ПУТЬ',
+                        help="Цель ввода-вывода вместо $HOME/testfile: каталог, файл или блочное устройство "
+                             "(можно несколько: этапы стандартного набора идут на всех целях одновременно, "
+                             f"профиль postgres размещает файлы данных на цели {PG_DATA_TARGET}, WAL - на цели {PG_WAL_TARGET})")
+    parser.add_argument('--allow-raw-device', action='store_true',
+                        help="Разрешить запись на блочные устройства из --target (данные на них будут уничтожены)")
+    parser.add_argument('--profile', choices=['standard', 'postgres'], default='standard',
+                        help="Профиль нагрузки fio: standard (5 этапов) или postgres (WAL + данные + контрольные точки)")
+    parser.add_argument('--pg-read-pct', type=str, default=DEFAULT_PG_READ_PCT,
+                        help=f"Профиль postgres: процент чтения по файлам данных (по умолчанию {DEFAULT_PG_READ_PCT})")
+    parser.add_argument('--pg-wal-size', type=str, default=DEFAULT_PG_WAL_SIZE,
+                        help=f"Профиль postgres: размер файла WAL (по умолчанию {DEFAULT_PG_WAL_SIZE})")
+    parser.add_argument('--pg-commit-group', type=int, default=DEFAULT_PG_COMMIT_GROUP,
+                        help=f"Профиль postgres: fdatasync после каждых N записей WAL (по умолчанию {DEFAULT_PG_COMMIT_GROUP})")
+    parser.add_argument('--pg-checkpoint-interval', type=int, default=DEFAULT_PG_CHECKPOINT_INTERVAL,
+                        help=f"Профиль postgres: интервал между контрольными точками, сек (по умолчанию {DEFAULT_PG_CHECKPOINT_INTERVAL})")
+    parser.add_argument('--pg-checkpoint-mb', type=int, default=DEFAULT_PG_CHECKPOINT_MB,
+                        help=f"Профиль postgres: объем записи одной контрольной точки, MiB (по умолчанию {DEFAULT_PG_CHECKPOINT_MB})")
+    parser.add_argument('--ioengine', choices=list(IO_ENGINES), default=DEFAULT_IO_ENGINE,
+                        help=f"Движок ввода-вывода fio (по умолчанию {DEFAULT_IO_ENGINE})")
+    parser.add_argument('--numjobs', type=int, default=DEFAULT_NUMJOBS,
+                        help=f"Количество заданий fio (по умолчанию {DEFAULT_NUMJOBS})")
+    parser.add_argument('--cpu-pinning', choices=CPU_PINNING_POLICIES, default='none',
+                        help="Привязка заданий к CPU: none, spread (по одному CPU из всех), "
+                             "compact (первые numjobs CPU), numa (CPU узла --numa-node)")
+    parser.add_argument('--cpus-allowed', type=str, default=None,
+                        help="Явный список CPU для заданий fio, например 0-3,8 (каждое задание на своем CPU)")
+    parser.add_argument('--numa-node', type=int, default=0,
+                        help="NUMA-узел для --cpu-pinning numa (по умолчанию 0)")
+    parser.add_argument('--pgbench-scale', type=int, default=DEFAULT_PGBENCH_SCALE,
+                        help=f"pgbench: масштаб базы (по умолчанию {DEFAULT_PGBENCH_SCALE})")
+    parser.add_argument('--pgbench-clients', type=int, default=DEFAULT_PGBENCH_CLIENTS,
+                        help=f"pgbench: количество клиентов (по умолчанию {DEFAULT_PGBENCH_CLIENTS})")
+    parser.add_argument('--pgbench-jobs', type=int, default=DEFAULT_PGBENCH_JOBS,
+                        help=f"pgbench: количество потоков (по умолчанию {DEFAULT_PGBENCH_JOBS})")
+    parser.add_argument('--pgbench-duration', type=int, default=DEFAULT_PGBENCH_DURATION,
+                        help=f"pgbench: длительность теста, сек (по умолчанию {DEFAULT_PGBENCH_DURATION})")
+    parser.add_argument('--data-pattern', choices=list(DATA_PATTERNS), default=DEFAULT_DATA_PATTERN,
+                        help="Шаблон данных: random (несжимаемые, по умолчанию), zero, compress50, compress75, "
+                             "dedupe50, reducible, postgres (калибровка по каталогу --pgdata)")
+    parser.add_argument('--pgdata', type=str, default='/mnt/pgdata',
+                        help="Каталог данных PostgreSQL для калибровки шаблона postgres (по умолчанию /mnt/pgdata)")
+    parser.add_argument('--precondition', choices=['none', 'once', 'each'], default='none',
+                        help="Предкондиционирование (заполнение + случайная перезапись до установившегося режима): "
+                             "none, once (перед всеми этапами), each (перед каждым этапом)")
+    parser.add_argument('--precondition-round', type=int, default=DEFAULT_PRECONDITION_ROUND,
+                        help=f"Длительность раунда случайной перезаписи, сек (по умолчанию {DEFAULT_PRECONDITION_ROUND})")
+    parser.add_argument('--precondition-max-rounds', type=int, default=DEFAULT_PRECONDITION_MAX_ROUNDS,
+                        help=f"Максимум раундов перезаписи (по умолчанию {DEFAULT_PRECONDITION_MAX_ROUNDS})")
+    parser.add_argument('--mode', choices=['suite', 'engines', 'openloop', 'slo', 'scaling', 'interference', 'sweep', 'soak',
+                                           'capture', 'replay'], default='suite',
+                        help="Режим: suite (этапы профиля), engines (сравнение движков ввода-вывода на одном этапе), "
+                             "openloop (задержка при фиксированной предлагаемой нагрузке), "
+                             "slo (максимальные IOPS при ограничении задержки), "
+                             "scaling (кривая масштабирования по числу заданий), "
+                             "interference (pgbench изолированно и под фоновой нагрузкой fio), "
+                             "sweep (этапы при растущем размере рабочего набора), "
+                             "soak (длительная нагрузка со сводками по периодам), "
+                             "capture (запись трассы блочного ввода-вывода реальной нагрузки), "
+                             "replay (воспроизведение трассы на цели)")
+    parser.add_argument('--scaling-phase', choices=['write', 'read', 'randwrite', 'randread', 'randrw'], default='randread',
+                        help="Режим scaling: этап (по умолчанию randread)")
+    parser.add_argument('--scaling-jobs', type=str, default=None,
+                        help="Режим scaling: числа заданий через запятую (по умолчанию от 1 до числа vCPU)")
+    parser.add_argument('--compare-phase', choices=['write', 'read', 'randwrite', 'randread'], default='randread',
+                        help="Режим engines: этап для сравнения (по умолчанию randread)")
+    parser.add_argument('--compare-engines', type=str, default=','.join(IO_ENGINES),
+                        help="Режим engines: движки через запятую (по умолчанию все)")
+    parser.add_argument('--openloop-phase', choices=['write', 'read', 'randwrite', 'randread', 'randrw'], default='randread',
+                        help="Режим openloop: этап (по умолчанию randread)")
+    parser.add_argument('--openloop-levels', type=str, default=DEFAULT_OPENLOOP_LEVELS,
+                        help=f"Режим openloop: уровни нагрузки в %% от пиковых IOPS (по умолчанию {DEFAULT_OPENLOOP_LEVELS})")
+    parser.add_argument('--openloop-rates', type=str, default=None,
+                        help="Режим openloop: уровни нагрузки в абсолютных IOPS через запятую (вместо --openloop-levels)")
+    parser.add_argument('--slo-phase', choices=['write', 'read', 'randwrite', 'randread'], default='randread',
+                        help="Режим slo: этап (по умолчанию randread)")
+    parser.add_argument('--slo-percentile', type=float, default=DEFAULT_SLO_PERCENTILE,
+                        help=f"Режим slo: перцентиль задержки (по умолчанию {DEFAULT_SLO_PERCENTILE:g})")
+    parser.add_argument('--slo-latency-ms', type=float, default=DEFAULT_SLO_LATENCY_MS,
+                        help=f"Режим slo: допустимая задержка, мс (по умолчанию {DEFAULT_SLO_LATENCY_MS:g})")
+    parser.add_argument('--slo-steps', type=int, default=DEFAULT_SLO_STEPS,
+                        help=f"Режим slo: максимальное число шагов уточнения (по умолчанию {DEFAULT_SLO_STEPS})")
+    parser.add_argument('--sweep-sizes', type=str, default=DEFAULT_SWEEP_SIZES,
+                        help=f"Режим sweep: размеры рабочего набора через запятую (по умолчанию {DEFAULT_SWEEP_SIZES})")
+    parser.add_argument('--sweep-phases', type=str, default=DEFAULT_SWEEP_PHASES,
+                        help=f"Режим sweep: этапы через запятую (по умолчанию {DEFAULT_SWEEP_PHASES})")
+    parser.add_argument('--soak-phase', choices=['write', 'read', 'randwrite', 'randread', 'randrw'], default=DEFAULT_SOAK_PHASE,
+                        help=f"Режим soak: этап (по умолчанию {DEFAULT_SOAK_PHASE})")
+    parser.add_argument('--soak-hours', type=float, default=DEFAULT_SOAK_HOURS,
+                        help=f"Режим soak: длительность, ч (по умолчанию {DEFAULT_SOAK_HOURS})")
+    parser.add_argument('--soak-interval', type=int, default=DEFAULT_SOAK_INTERVAL,
+                        help=f"Режим soak: интервал статусов fio, сек (по умолчанию {DEFAULT_SOAK_INTERVAL})")
+    parser.add_argument('--soak-window', type=int, default=DEFAULT_SOAK_WINDOW,
+                        help=f"Режим soak: скользящее окно для p99, сек (по умолчанию {DEFAULT_SOAK_WINDOW})")
+    parser.add_argument('--soak-summary-interval', type=int, default=DEFAULT_SOAK_SUMMARY_INTERVAL,
+                        help=f"Режим soak: период сводок и ротации файлов, сек (по умолчанию {DEFAULT_SOAK_SUMMARY_INTERVAL})")
+    parser.add_argument('--soak-keep', type=int, default=DEFAULT_SOAK_KEEP,
+                        help=f"Режим soak: сколько последних файлов интервалов хранить (по умолчанию {DEFAULT_SOAK_KEEP})")
+    parser.add_argument('--trace', type=str, default=None,
+                        help=f"Режим capture: каталог для трассы (по умолчанию $HOME/{TRACE_DIR}/<test-name>); "
+                             "режим replay: каталог записанной трассы или файл трассы (blktrace или fio iolog v2/v3)")
+    parser.add_argument('--trace-device', type=str, default=None,
+                        help="Режим capture: блочное устройство, ввод-вывод которого записывается (например /dev/vdb)")
+    parser.add_argument('--capture-seconds', type=int, default=DEFAULT_CAPTURE_SECONDS,
+                        help=f"Режим capture: длительность записи, сек (по умолчанию {DEFAULT_CAPTURE_SECONDS})")
+    parser.add_argument('--capture-command', type=str, default=None,
+                        help="Режим capture: команда нагрузки; запись идет, пока команда не завершится "
+                             "(но не дольше --capture-seconds)")
+    parser.add_argument('--replay-speed', type=str, default=DEFAULT_REPLAY_SPEED,
+                        help=f"Режим replay: темп относительно записи (2 - вдвое быстрее, 0.5 - вдвое медленнее) "
+                             f"или max - без пауз между операциями (по умолчанию {DEFAULT_REPLAY_SPEED})")
+    parser.add_argument('--bg-rw', choices=['write', 'read', 'randwrite', 'randread', 'randrw'], default=DEFAULT_BG_RW,
+                        help=f"Режим interference: тип фоновой нагрузки fio (по умолчанию {DEFAULT_BG_RW})")
+    parser.add_argument('--bg-bs', type=str, default=DEFAULT_BG_BS,
+                        help=f"Режим interference: размер блока фоновой нагрузки (по умолчанию {DEFAULT_BG_BS})")
+    parser.add_argument('--bg-rate', type=int, default=DEFAULT_BG_RATE,
+                        help=f"Режим interference: интенсивность фоновой нагрузки, IOPS; 0 - без ограничения (по умолчанию {DEFAULT_BG_RATE})")
+    parser.add_argument('--bg-host', type=str, default=None,
+                        help="Режим interference: запускать фоновую нагрузку на другой ВМ (user@ip, доступ по ssh-ключу)")
+    parser.add_argument('--sync-latency', action='store_true',
+                        help="Добавить тест задержки синхронной записи (fsync/fdatasync/O_DSYNC, QD=1)")
+    parser.add_argument('--sync-method', choices=sorted(SYNC_METHODS), default=DEFAULT_SYNC_METHOD,
+                        help=f"Способ синхронизации в тесте задержки (по умолчанию {DEFAULT_SYNC_METHOD})")
+    parser.add_argument('--sync-sizes', type=str, default=DEFAULT_SYNC_SIZES,
+                        help=f"Размеры блоков для теста задержки через запятую (по умолчанию {DEFAULT_SYNC_SIZES})")
+    parser.add_argument('--resume', action='store_true',
+                        help="Продолжить прерванный запуск с тем же названием теста: этапы стандартного набора "
+                             "и pgbench с сохраненными результатами не повторяются")
+    parser.add_argument('--reuse-pgbench', action='store_true',
+                        help="Не инициализировать базу pgbench повторно, если база с тем же scale уже существует")
+    parser.add_argument('--agent', action='store_true',
+                        help="Режим агента: HTTP-сервис, принимающий задания на запуск тестов (см. control/agent_client.py)")
+    parser.add_argument('--agent-bind', type=str, default=DEFAULT_AGENT_BIND,
+                        help=f"Агент: адрес для прослушивания (по умолчанию {DEFAULT_AGENT_BIND})")
+    parser.add_argument('--agent-port', type=int, default=DEFAULT_AGENT_PORT,
+                        help=f"Агент: порт (по умолчанию {DEFAULT_AGENT_PORT})")
+    parser.add_argument('--agent-home', type=str, default=None,
+                        help="Агент: рабочий каталог заданий (тестовый файл и results/), по умолчанию $HOME")
+    parser.add_argument('--agent-token', type=str, default=None,
+                        help="Агент: токен, который клиент передает в заголовке X-Agent-Token "
+                             "(виден в списке процессов, на ВМ используйте --agent-token-file)")
+    parser.add_argument('--agent-token-file', type=str, default=None,
+                        help="Агент: файл с токеном (первая строка)")
+    parser.add_argument('--io-mode', choices=list(IO_MODES), default='direct',
+                        help="Режим ввода-вывода fio: direct (direct=1, по умолчанию) или buffered (direct=0, через кэш страниц)")
+    parser.add_argument('--cache-state', choices=CACHE_STATES, default='cold',
+                        help="Состояние кэша страниц перед этапом в режиме buffered: cold - сброс кэша (по умолчанию), "
+                             "warm - сброс и прогрев доли файла --prewarm-pct")
+    parser.add_argument('--prewarm-pct', type=int, default=DEFAULT_PREWARM_PCT,
+                        help=f"Доля тестового файла для прогрева кэша, % (по умолчанию {DEFAULT_PREWARM_PCT})")
+    parser.add_argument('--latency-log', choices=list(LATENCY_LOG_MODES), default='off',
+                        help="Журналы задержки fio в results/logs: off (по умолчанию), avg (посекундные средние), "
+                             "raw (каждая операция)")
+    parser.add_argument('--pack-results', action='store_true',
+                        help="Вывести в stdout архив tar.gz с результатами, сводкой журналов задержки и "
+                             "контрольными суммами (для collect_results.py) и завершиться")
+    parser.add_argument('--pack-raw', action='store_true',
+                        help="Включить в архив сырые журналы задержки")
+    parser.add_argument('--pack-since', type=float, default=None,
+                        help="Упаковывать только файлы, измененные не раньше указанного unix-времени")
+    return parser
+
+def main():
+    args = build_arg_parser().parse_args()
+
+    if args.pack_results:
+        write_results_archive(sys.stdout.buffer, os.path.join(os.getenv("HOME"), 'results'),
+                              include_raw=args.pack_raw, since=args.pack_since)
+        return
+
+    if args.agent:
+        token = args.agent_token
+        if args.agent_token_file:
+            try:
+                with open(args.agent_token_file, 'r') as f:
+                    token = f.readline().strip() or None
+            except OSError as e:
+                print(f"❌ Не удалось прочитать токен агента: {e}")
+                sys.exit(1)
+        run_agent(args.agent_bind, args.agent_port, args.agent_home, token)
+        return
 
     start_time_test = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     home_dir = os.getenv("HOME")
-    testfile_path = os.path.join(home_dir, 'testfile')
+
+    # Запись трассы не запускает fio и не формирует отчет
+    if args.mode == 'capture':
+        if not args.trace_device:
+            print("❌ Для режима capture укажите устройство: --trace-device /dev/...")
+            sys.exit(1)
+        trace_dir = args.trace or os.path.join(home_dir, TRACE_DIR, sanitize_filename(args.test_name or TRACE_NAME))
+        info = run_trace_capture(args.trace_device, trace_dir, args.capture_seconds, args.capture_command)
+        sys.exit(0 if info else 1)
+
+    try:
+        targets = parse_targets(args.target, home_dir)
+    except ValueError as e:
+        print(f"❌ --target: {e}")
+        sys.exit(1)
+    # Несколько целей - одновременные задания на всех целях, поддерживается только в режиме suite
+    multi_targets = targets if len(targets) > 1 else None
+    if multi_targets and args.mode != 'suite':
+        print(f"❌ Несколько целей (--target) поддерживаются только в режиме suite, режим {args.mode} использует одну цель")
+        sys.exit(1)
+    if args.target and args.mode == 'interference':
+        print("⚠️  Режим interference использует файлы в $HOME, --target не применяется")
+    target_size = max(args.sweep_sizes.split(','), key=parse_size) if args.mode == 'sweep' else args.size
+    if not check_targets(targets, target_size, args.allow_raw_device):
+        sys.exit(1)
+    testfile_path = target_file(targets[0])
+    # Профиль postgres и тест синхронной записи: цели data и wal, иначе первая и вторая цели по порядку
+    named = {target['name']: target for target in targets}
+    data_target = named.get(PG_DATA_TARGET, targets[0])
+    wal_target = named.get(PG_WAL_TARGET, targets[1] if len(targets) > 1 else data_target)
+    # Данные и WAL профиля postgres в одном файле или на одном устройстве: WAL пишется за областью данных
+    wal_offset = None
+    if args.profile == 'postgres' and args.mode == 'suite' and wal_target is data_target \
+            and data_target['kind'] != 'dir':
+        try:
+            wal_offset = parse_size(args.size)
+            wal_end = wal_offset + parse_size(args.pg_wal_size)
+        except ValueError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        device_bytes = block_device_bytes(data_target['path']) if data_target['kind'] == 'device' else None
+        if device_bytes is not None and wal_end > device_bytes:
+            print(f"❌ Цель {data_target['name']}: данные ({args.size}) и WAL ({args.pg_wal_size}) не помещаются "
+                  f"на устройство ({device_bytes / 1024 ** 3:.1f} GiB). Уменьшите --size или укажите цель wal=")
+            sys.exit(1)
     results_dir = os.path.join(home_dir, 'results')
     create_directory(results_dir)
 
@@ -506,6 +3525,16 @@ def main():
         {"name": "Mixed RW", "rw": "randrw", "bs": bs, "mix": mix}
     ]
 
+    # Шаблон данных (для профиля postgres - калибровка по реальному каталогу данных)
+    data_pattern = args.data_pattern
+    if data_pattern == 'postgres':
+        data_options, calibration = calibrate_data_pattern(args.pgdata)
+        if data_options is None:
+            sys.exit(1)
+        data_pattern = f"postgres ({calibration})"
+    else:
+        data_options = DATA_PATTERNS[data_pattern]
+
     test_params = {
         "start_time": start_time_test,
         "test_name": test_name,
@@ -513,88 +3542,308 @@ def main():
         "bs": bs,
         "mix": mix,
         "io_depth": io_depth,
-        "runtime": runtime
+        "runtime": runtime,
+        "profile": args.profile,
+        "ioengine": args.ioengine if args.mode != 'engines' else args.compare_engines,
+        "numjobs": args.numjobs if args.mode != 'scaling' else (args.scaling_jobs or f"1-{os.cpu_count()}"),
+        "cpu_pinning": args.cpu_pinning if not args.cpus_allowed else f"cpus_allowed={args.cpus_allowed}",
+        "data_pattern": data_pattern,
+        "io_mode": args.io_mode
     }
+    if args.target:
+        test_params["targets"] = ", ".join(f"{target['name']}={target_file(target)} ({target['kind']})"
+                                           for target in targets)
+
+    # Воспроизведение трассы: смещения уменьшаются, если трасса записана с устройства больше цели
+    if args.mode == 'replay':
+        if not args.trace:
+            print("❌ Для режима replay укажите трассу: --trace <каталог записи или файл трассы>")
+            sys.exit(1)
+        try:
+            trace_path, trace_info = load_trace(args.trace)
+        except (OSError, ValueError) as e:
+            print(f"❌ --trace: {e}")
+            sys.exit(1)
+        try:
+            replay_speed_options(args.replay_speed)
+        except ValueError as e:
+            print(f"❌ --replay-speed: {e}")
+            sys.exit(1)
+        trace_summary = trace_info["summary"]
+        target_bytes = block_device_bytes(testfile_path) if targets[0]['kind'] == 'device' else parse_size(size)
+        trace_scale = replay_scale(trace_summary, target_bytes) if target_bytes else None
+        if trace_scale is None:
+            print(f"❌ Цель {testfile_path} меньше наибольшей операции трассы")
+            sys.exit(1)
+        test_params["trace"] = f"{trace_path} ({trace_description(trace_summary)}), скорость x{args.replay_speed}"
+        if trace_scale > 1:
+            print(f"⚠️  Трасса ({trace_summary['max_end'] / 1024 ** 3:.1f} GiB) больше цели "
+                  f"({target_bytes / 1024 ** 3:.1f} GiB): смещения уменьшаются в {trace_scale} раз")
+            test_params["trace"] += f", смещения уменьшены в {trace_scale} раз"
 
     results = []
     all_tests_passed = True
     total_start_time = time.time()
 
-    for index, test in enumerate(tests, start=1):
-        print(f"\nТест {index}: {test['name']}")
-        success = run_fio_test(
-            test_name=test['name'],
-            filename=testfile_path,
-            size=size,
-            rw=test['rw'],
-            bs=test['bs'],
-            rwmixwrite=test.get("mix"),
+    numjobs = args.numjobs
+    # Журналы задержки: общий каталог, у каждого этапа свой префикс файлов (fio_option_value)
+    log_options = {}
+    if LATENCY_LOG_MODES[args.latency_log] is not None:
+        logs_dir = os.path.join(results_dir, LATENCY_LOG_DIR)
+        create_directory(logs_dir)
+        log_options = {"write_lat_log": logs_dir, **LATENCY_LOG_MODES[args.latency_log]}
+    # Буферизованный режим: direct=0 для всех заданий; состояние кэша перед этапом задается
+    # только в стандартном наборе, в остальных режимах кэш остается как есть
+    io_options = {}
+    page_cache = None
+    page_cache_results = []
+    if not 0 <= args.prewarm_pct <= 100:
+        print("❌ --prewarm-pct должен быть в диапазоне 0-100")
+        sys.exit(1)
+    if args.io_mode == 'buffered':
+        io_options = {"direct": IO_MODES['buffered']}
+        if args.mode == 'suite' and args.profile == 'standard' and not multi_targets:
+            page_cache = {"cache_state": args.cache_state, "prewarm_pct": args.prewarm_pct}
+            cache_label = f"warm {args.prewarm_pct}%" if args.cache_state == 'warm' else "cold"
+            test_params["io_mode"] = f"buffered ({cache_label})"
+        else:
+            print("⚠️  Состояние кэша страниц задается только в стандартном наборе на одной цели, здесь кэш не сбрасывается")
+    if args.profile == 'postgres' and args.mode == 'suite' and args.io_mode == 'direct':
+        # Задание WAL профиля postgres всегда пишет через кэш страниц
+        test_params["io_mode"] = "direct (WAL buffered)"
+    job_options = {**cpu_pinning_options(args.cpu_pinning, numjobs, args.cpus_allowed, args.numa_node),
+                   **data_options, **log_options, **io_options}
+    engine_results = None
+    openloop_results = None
+    slo_result = None
+    scaling_results = None
+    interference_result = None
+    pgbench_res = None
+    sweep_results = None
+    soak_result = None
+    missing_phases = []
+
+    # Предкондиционирование: once - один раз перед всеми этапами (в режиме sweep - перед каждой
+    # ступенью размера, т.к. меняется рабочая область), each - перед каждым этапом
+    # Режимы interference и профиль postgres работают со своими файлами - предкондиционирование к ним не применяется
+    precondition = None
+    precondition_results = []
+    precondition_ok = True
+    if args.precondition != 'none':
+        if args.mode == 'interference' or (args.mode == 'suite' and args.profile == 'postgres'):
+            print("⚠️  Предкондиционирование не применяется в режиме interference и профиле postgres")
+        else:
+            precondition = {"round_time": args.precondition_round, "max_rounds": args.precondition_max_rounds}
+    # each поддерживается стандартным набором и режимом sweep, в остальных режимах работает как once
+    each_precondition = precondition if args.precondition == 'each' and args.mode == 'suite' else None
+    if precondition is not None and each_precondition is None and args.mode != 'sweep':
+        for target in multi_targets or [None]:
+            summary = run_precondition(target_file(target) if target else testfile_path, size, results_dir,
+                                       test_name, ioengine=args.ioengine, numjobs=numjobs,
+                                       job_options=job_options, **precondition)
+            if summary is None:
+                precondition_ok = False
+                break
+            precondition_results.append((f"all phases [{target['name']}]" if target else "all phases", summary))
+
+    if args.mode == 'engines':
+        compare_test = next(test for test in tests if test['rw'] == args.compare_phase)
+        engines = [engine.strip() for engine in args.compare_engines.split(',') if engine.strip()]
+        unknown = [engine for engine in engines if engine not in IO_ENGINES]
+        if unknown:
+            print(f"❌ Неизвестные движки ввода-вывода: {', '.join(unknown)}")
+            print(f"   Доступные: {', '.join(IO_ENGINES)}")
+            sys.exit(1)
+        print(f"\nСравнение движков ввода-вывода на этапе {compare_test['name']}: {', '.join(engines)}")
+        results, engine_results, all_tests_passed = run_engine_comparison(
+            compare_test, engines, testfile_path, size, results_dir, io_depth, runtime, test_name,
+            numjobs=numjobs, job_options=job_options
+        )
+    elif args.mode == 'openloop':
+        openloop_test = next(test for test in tests if test['rw'] == args.openloop_phase)
+        print(f"\nОткрытая нагрузка на этапе {openloop_test['name']}")
+        results, openloop_results, all_tests_passed = run_openloop_test(
+            openloop_test, testfile_path, size, results_dir, io_depth, runtime, test_name,
+            ioengine=args.ioengine, rates=args.openloop_rates, levels=args.openloop_levels,
+            numjobs=numjobs, job_options=job_options
+        )
+    elif args.mode == 'slo':
+        slo_test = next(test for test in tests if test['rw'] == args.slo_phase)
+        results, slo_result, all_tests_passed = run_slo_search(
+            slo_test, testfile_path, size, results_dir, io_depth, runtime, test_name,
+            ioengine=args.ioengine, percentile=args.slo_percentile,
+            latency_ms=args.slo_latency_ms, steps=args.slo_steps,
+            numjobs=numjobs, job_options=job_options
+        )
+    elif args.mode == 'scaling':
+        scaling_test = next(test for test in tests if test['rw'] == args.scaling_phase)
+        job_counts = [int(count) for count in args.scaling_jobs.split(',')] if args.scaling_jobs else None
+        print(f"\nМасштабирование по числу заданий на этапе {scaling_test['name']} (vCPU: {os.cpu_count()})")
+        results, scaling_results, all_tests_passed = run_job_scaling(
+            scaling_test, testfile_path, size, results_dir, io_depth, runtime, test_name,
+            ioengine=args.ioengine, job_counts=job_counts, pinning=args.cpu_pinning,
+            cpus_allowed=args.cpus_allowed, numa_node=args.numa_node,
+            job_options={**data_options, **log_options, **io_options}
+        )
+    elif args.mode == 'sweep':
+        sweep_phases = [phase.strip() for phase in args.sweep_phases.split(',') if phase.strip()]
+        sweep_tests = [test for test in tests if test['rw'] in sweep_phases]
+        sweep_sizes = [sweep_size.strip() for sweep_size in args.sweep_sizes.split(',') if sweep_size.strip()]
+        print(f"\nПроход по размеру рабочего набора: {', '.join(sweep_sizes)}")
+        results, sweep_results, all_tests_passed = run_working_set_sweep(
+            sweep_tests, sweep_sizes, testfile_path, results_dir, io_depth, runtime, test_name,
+            ioengine=args.ioengine, numjobs=numjobs, job_options=job_options,
+            precondition=precondition, precondition_scope=args.precondition,
+            precondition_results=precondition_results
+        )
+    elif args.mode == 'soak':
+        soak_test = next(test for test in tests if test['rw'] == args.soak_phase)
+        # Журналы задержки fio копятся в памяти fio до конца задания, в режиме soak они не пишутся
+        soak_options = {option: value for option, value in job_options.items()
+                        if option not in ("write_lat_log", "log_avg_msec")}
+        results, soak_result, all_tests_passed = run_soak_test(
+            soak_test, testfile_path, size, results_dir, io_depth, test_name, hours=args.soak_hours,
+            interval=args.soak_interval, window=args.soak_window,
+            summary_interval=args.soak_summary_interval, keep=args.soak_keep,
+            ioengine=args.ioengine, numjobs=numjobs, job_options=soak_options
+        )
+    elif args.mode == 'replay':
+        if targets[0]['kind'] != 'device' and not prepare_layout_file(testfile_path, size):
+            all_tests_passed = False
+        else:
+            results, all_tests_passed = run_trace_replay(
+                trace_path, trace_summary, testfile_path, results_dir, test_name,
+                speed=args.replay_speed, scale=trace_scale, io_depth=io_depth, runtime=runtime,
+                ioengine=args.ioengine, job_options=job_options
+            )
+    elif args.mode == 'interference':
+        pgbench_res, interference_result = run_interference_test(
+            test_dir=home_dir,
+            results_dir=results_dir,
+            test_suite_name=test_name,
+            bg_rw=args.bg_rw,
+            bg_bs=format_block_size(args.bg_bs),
+            bg_rate=args.bg_rate,
+            bg_size=size,
+            bg_host=args.bg_host,
+            ioengine=args.ioengine,
+            numjobs=numjobs,
+            scale=args.pgbench_scale,
+            clients=args.pgbench_clients,
+            jobs=args.pgbench_jobs,
+            duration=args.pgbench_duration,
+            reuse=args.reuse_pgbench
+        )
+        if interference_result is None:
+            all_tests_passed = False
+    elif args.profile == 'postgres':
+        print("\nПрофиль postgres: WAL + файлы данных + контрольные точки")
+        print(f"  файлы данных: {target_file(data_target, 'testfile_pgdata')}, WAL: {target_file(wal_target, 'testfile_pgwal')}"
+              + (f" (со смещения {size})" if wal_offset else ""))
+        profile_rows = run_postgres_profile(
+            test_dir=home_dir,
             results_dir=results_dir,
+            test_suite_name=test_name,
+            size=size,
             io_depth=io_depth,
             runtime=runtime,
-            test_suite_name=test_name
+            read_pct=args.pg_read_pct,
+            wal_size=args.pg_wal_size,
+            commit_group=args.pg_commit_group,
+            checkpoint_interval=args.pg_checkpoint_interval,
+            checkpoint_mb=args.pg_checkpoint_mb,
+            ioengine=args.ioengine,
+            job_options=job_options,
+            data_file=target_file(data_target, 'testfile_pgdata'),
+            wal_file=target_file(wal_target, 'testfile_pgwal'),
+            wal_offset=wal_offset
         )
-        if not success:
+        if profile_rows is None:
             all_tests_passed = False
-            continue
+        else:
+            results.extend(profile_rows)
+    else:
+        results, failed_phases = run_standard_suite(
+            tests, testfile_path, size, results_dir, io_depth, runtime, test_name,
+            ioengine=args.ioengine, numjobs=numjobs, job_options=job_options,
+            precondition=each_precondition, precondition_results=precondition_results,
+            resume=args.resume, page_cache=page_cache, page_cache_results=page_cache_results,
+            targets=multi_targets
+        )
+        missing_phases.extend(failed_phases)
+        all_tests_passed = not failed_phases
 
-        test_name_safe = test['name'].replace(" ", "_")
-        output_file = os.path.join(results_dir, f"{test_name_safe}_{test_name}_results.txt")
+    # Этапы, не давшие результата, перечисляются в отчете как пробелы
+    if not precondition_ok:
+        missing_phases.append("Precondition")
+    if not all_tests_passed and args.mode != 'suite':
+        missing_phases.append(f"mode {args.mode}")
+    elif not all_tests_passed and args.profile == 'postgres':
+        missing_phases.append("postgres profile")
 
-        if test['rw'] == 'randrw':
-            mixed_results = parse_fio_results(output_file, is_mixed=True)
-            results.extend([
-                {
-                    "Test Number": index,
-                    "Test Name": test['name'] + " (Write)",
-                    "IOPS": mixed_results["write"]["IOPS"],
-                    "Bandwidth (MiB/s)": mixed_results["write"]["Bandwidth (MiB/s)"],
-                    "Latency (ms)": mixed_results["write"]["Latency (ms)"],
-                    "Latency Details": mixed_results["write"]["Latency Details"]
-                },
-                {
-                    "Test Number": index,
-                    "Test Name": test['name'] + " (Read)",
-                    "IOPS": mixed_results["read"]["IOPS"],
-                    "Bandwidth (MiB/s)": mixed_results["read"]["Bandwidth (MiB/s)"],
-                    "Latency (ms)": mixed_results["read"]["Latency (ms)"],
-                    "Latency Details": mixed_results["read"]["Latency Details"]
-                }
-            ])
-        else:
-            test_results = parse_fio_results(output_file)
-            results.append({
-                "Test Number": index,
-                "Test Name": test['name'],
-                "IOPS": test_results["IOPS"],
-                "Bandwidth (MiB/s)": test_results["Bandwidth (MiB/s)"],
-                "Latency (ms)": test_results["Latency (ms)"],
-                "Latency Details": test_results["Latency Details"]
-            })
+    sync_results = None
+    if args.sync_latency:
+        print(f"\nТест задержки синхронной записи ({args.sync_method}, размеры: {args.sync_sizes})")
+        sync_results = run_sync_latency_test(
+            test_dir=home_dir,
+            results_dir=results_dir,
+            test_suite_name=test_name,
+            sizes=args.sync_sizes,
+            method=args.sync_method,
+            runtime=runtime,
+            filename=target_file(wal_target, 'testfile_sync')
+        )
+        if sync_results is None:
+            missing_phases.append("Sync Latency")
 
     total_time = time.time() - total_start_time
 
     # === ИСПРАВЛЕННАЯ ЛОГИКА ЗАПУСКА PGBENCH ===
-    pgbench_res = None
-    if args.run_pgbench:
+    pgbench_args = {
+        "scale": args.pgbench_scale,
+        "clients": args.pgbench_clients,
+        "jobs": args.pgbench_jobs,
+        "duration": args.pgbench_duration,
+        "reuse": args.reuse_pgbench
+    }
+    if args.mode == 'interference':
+        # pgbench уже выполнен в режиме interference
+        pass
+    elif args.run_pgbench:
         # Автоматический запуск через --run-pgbench
-        pgbench_res = run_pgbench_test()
+        pgbench_res = run_pgbench_resumable(results_dir, test_name, args.resume, **pgbench_args)
+        if pgbench_res is None:
+            missing_phases.append("pgbench")
     else:
         # Интерактивный режим (только если есть TTY)
         if sys.stdin.isatty():
             response = input("\nЗапустить pgbench после fio? (y/N): ").strip().lower()
             if response in ('y', 'yes'):
-                pgbench_res = run_pgbench_test()
+                pgbench_res = run_pgbench_test(**pgbench_args)
 
     test_suite_safe = re.sub(r'[^\w-]', '_', test_name).strip('_')[:50]
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     results_sheet_path = os.path.join(results_dir, f"results_sheet_{test_suite_safe}_{timestamp}.txt")
-    if all_tests_passed:
-        print_results_table(results, test_params, pgbench_result=pgbench_res, output_file=results_sheet_path)
-        print(f"\nОбщее время выполнения всех тестов: {total_time:.2f} секунд.")
-    else:
-        print("\nНекоторые тесты завершились с ошибками. Итоговый отчет не сформирован.")
+    # Отчет формируется и по частичным результатам, пропущенные этапы в нем отмечаются
+    if results or pgbench_res or not missing_phases:
+        # При продолжении новый отчет заменяет отчеты предыдущих попыток
+        if args.resume:
+            for name in os.listdir(results_dir):
+                if re.fullmatch(rf'results_sheet_{re.escape(test_suite_safe)}_\d{{8}}_\d{{6}}\.txt', name):
+                    os.remove(os.path.join(results_dir, name))
+        print_results_table(results, test_params, pgbench_result=pgbench_res, output_file=results_sheet_path,
+                            sync_results=sync_results, engine_results=engine_results,
+                            openloop_results=openloop_results, slo_result=slo_result,
+                            scaling_results=scaling_results, interference_result=interference_result,
+                            precondition_results=precondition_results, sweep_results=sweep_results,
+                            missing_phases=missing_phases, page_cache_results=page_cache_results,
+                            soak_result=soak_result)
+    if missing_phases:
+        print(f"\nНекоторые тесты завершились с ошибками: {', '.join(missing_phases)}.")
+        print("Повторный запуск с тем же названием теста и --resume выполнит только их.")
         print(f"Общее время выполнения: {total_time:.2f} секунд.")
+        sys.exit(1)
+    print(f"\nОбщее время выполнения всех тестов: {total_time:.2f} секунд.")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file